@@ -0,0 +1,132 @@
+"""
+Description:
+-------------
+Batch preprocessing of NZEST scenario exports.
+
+Every raw scenario CSV in a directory is processed in parallel on a process
+pool with the Status-Quo or Net-Zero pipeline (picked from its header). Each
+scenario gets a post-processed CSV plus its Parquet companion, and a
+catalog.json index lists the outputs with per-file timings.
+
+Usage:
+    python Batch_Pre_Process.py RAW_DIR [OUT_DIR] [--workers N] [--chunksize N] [--incremental]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from SQ_Pre_Process import columnar_path, process_SQ
+from NZ_Pre_Process import process_NZ
+
+
+CATALOG_FILE = "catalog.json"
+OUTPUT_SUFFIX = "_Post_Process.csv"
+
+# Template name -> (processing function, header column identifying it)
+TEMPLATES = {
+    "Status-Quo": (process_SQ, "prov"),
+    "Net-Zero": (process_NZ, "Region"),
+}
+
+
+def detect_template(csv_path):
+    """Template name matching a raw CSV header, or None for files that are not scenario exports."""
+    columns = set(pd.read_csv(csv_path, nrows=0).columns.str.strip())
+    for name, (_, marker) in TEMPLATES.items():
+        if marker in columns:
+            return name
+    return None
+
+
+def output_path(csv_path, out_dir):
+    return os.path.join(out_dir, os.path.splitext(os.path.basename(csv_path))[0] + OUTPUT_SUFFIX)
+
+
+def process_file(csv_path, template, out_dir, chunksize=None, incremental=False):
+    """Run one scenario through its template; returns its catalog entry."""
+    process, _ = TEMPLATES[template]
+    output_csv = output_path(csv_path, out_dir)
+    start = time.perf_counter()
+    rebuilt = process(csv_path, output_csv, chunksize=chunksize, incremental=incremental)
+    entry = {
+        "scenario": os.path.splitext(os.path.basename(csv_path))[0],
+        "template": template,
+        "source": os.path.abspath(csv_path),
+        "csv": os.path.abspath(output_csv),
+        "parquet": os.path.abspath(columnar_path(output_csv)),
+        # The Parquet companion is a single file, or a directory of partitions when incremental
+        "rows": ds.dataset(columnar_path(output_csv), format="parquet").count_rows(),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if incremental:
+        entry["rebuilt_partitions"] = rebuilt
+    return entry
+
+
+def process_batch(raw_dir, out_dir=None, workers=None, chunksize=None, incremental=False):
+    """
+    Process every scenario CSV of raw_dir concurrently and write the catalog.
+    Failures are recorded in the catalog instead of stopping the batch.
+    chunksize and incremental are exclusive: partitions are rebuilt whole.
+    """
+    if chunksize is not None and incremental:
+        raise ValueError("chunksize and incremental cannot be combined")
+    out_dir = out_dir or raw_dir
+    os.makedirs(out_dir, exist_ok=True)
+
+    jobs = []
+    for name in sorted(os.listdir(raw_dir)):
+        path = os.path.join(raw_dir, name)
+        if not name.lower().endswith(".csv") or name.endswith(OUTPUT_SUFFIX):
+            continue
+        template = detect_template(path)
+        if template is None:
+            print(f"skip   {name} (not a scenario export)")
+            continue
+        jobs.append((path, template))
+
+    entries = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, path, template, out_dir, chunksize, incremental): (path, template)
+                   for path, template in jobs}
+        for future in as_completed(futures):
+            path, template = futures[future]
+            try:
+                entry = future.result()
+                print(f"done   {entry['scenario']} ({template}): {entry['rows']} rows in {entry['seconds']:.2f}s")
+            except Exception as exc:
+                entry = {"scenario": os.path.splitext(os.path.basename(path))[0], "template": template,
+                         "source": os.path.abspath(path), "error": repr(exc)}
+                print(f"failed {entry['scenario']} ({template}): {exc!r}")
+            entries.append(entry)
+
+    entries.sort(key=lambda e: e["scenario"])
+    catalog = {
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "scenarios": entries,
+    }
+    with open(os.path.join(out_dir, CATALOG_FILE), "w") as f:
+        json.dump(catalog, f, indent=2)
+    print(f"{len(entries)} scenario(s) in {catalog['wall_seconds']:.2f}s -> {os.path.join(out_dir, CATALOG_FILE)}")
+    return catalog
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess a directory of NZEST scenario CSVs in parallel.")
+    parser.add_argument("raw_dir", help="directory holding the raw scenario CSVs")
+    parser.add_argument("out_dir", nargs="?", help="output directory (defaults to raw_dir)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (defaults to the core count)")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream each input this many rows at a time")
+    parser.add_argument("--incremental", action="store_true", help="only re-process partitions whose raw rows changed")
+    args = parser.parse_args()
+    if args.chunksize is not None and args.incremental:
+        parser.error("--chunksize and --incremental cannot be combined (partitions are rebuilt whole)")
+    process_batch(args.raw_dir, args.out_dir, args.workers, args.chunksize, args.incremental)
@@ -17,177 +17,34 @@ If you have any questions, please contact the author at the email above.
 
 
 # Import required library
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# The code catalog (taxonomy.py) and the dashboard loader (load_csv.py) live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from load_csv import columnar_path  # noqa: E402
+from taxonomy import CATALOG  # noqa: E402
 
 
 MAX_LABEL_LEN = 20
 
+# Identifier columns stored as dictionary-encoded categoricals in the columnar output
+CATEGORICAL_COLUMNS = [
+    "prov", "Sector", "Subsector", "en_carrier", "tech",
+    "Carrier", "Tech_name", "Tech_subsector", "Province", "Region",
+]
 
-# === Define mapping dictionaries for translation of codes into descriptive names ===
-
-
-sector_activity_dict = {
-    "Mot": "Mot",
-    "Nmot": "Nmot",
-    "COth": "COth",
-    "CSH": "CSH",
-    "CWH": "CWH",
-    "Cement_fs": "Cement_fs",
-    "Cement_md": "Cement_md",
-    "Cement_op": "Cement_op",
-    "Cement_ph": "Cement_ph",
-    "Cement_tr": "Cement_tr",
-    "Chem_fs": "Chem_fs",
-    "Chem_md": "Chem_md",
-    "Chem_op": "Chem_op",
-    "Chem_pg": "Chem_pg",
-    "Chem_ph": "Chem_ph",
-    "Chem_tr": "Chem_tr",
-    "Const_pg": "Const_pg",
-    "Const_ph": "Const_ph",
-    "Const_tr": "Const_tr",
-    "Cu mine_fs": "Cu mine_fs",
-    "Cu mine_md": "Cu mine_md",
-    "Cu mine_op": "Cu mine_op",
-    "Cu mine_ph": "Cu mine_ph",
-    "Cu mine_pg": "Cu mine_pg",
-    "Cu mine_tr": "Cu mine_tr",
-    "Forest_pg": "Forest_pg",
-    "Forest_ph": "Forest_ph",
-    "Forest_tr": "Forest_tr",
-    "I&S_fs": "I&S_fs",
-    "I&S_md": "I&S_md",
-    "I&S_op": "I&S_op",
-    "I&S_pg": "I&S_pg",
-    "I&S_ph": "I&S_ph",
-    "I&S_tr": "I&S_tr",
-    "Manuf_fs": "Manuf_fs",
-    "Manuf_md": "Manuf_md",
-    "Manuf_op": "Manuf_op",
-    "Manuf_pg": "Manuf_pg",
-    "Manuf_ph": "Manuf_ph",
-    "Manuf_tr": "Manuf_tr",
-    "O non-met_fs": "O non-met_fs",
-    "O non-met_md": "O non-met_md",
-    "O non-met_pg": "O non-met_pg",
-    "O non-met_ph": "O non-met_ph",
-    "O non-met_tr": "O non-met_tr",
-    "Salt_fs": "Salt_fs",
-    "Salt_md": "Salt_md",
-    "Salt_ph": "Salt_ph",
-    "Salt_tr": "Salt_tr",
-    "Smelt_fs": "Smelt_fs",
-    "Smelt_md": "Smelt_md",
-    "Smelt_op": "Smelt_op",
-    "Smelt_ph": "Smelt_ph",
-    "Smelt_tr": "Smelt_tr",
-    "p&p_fs": "p&p_fs",
-    "p&p_md": "p&p_md",
-    "p&p_op": "p&p_op",
-    "p&p_pg": "p&p_pg",
-    "p&p_ph": "p&p_ph",
-    "p&p_tr": "p&p_tr",
-    "ROth": "ROth",
-    "RSH": "RSH",
-    "RWH": "RWH",
-    "Air": "Air",
-    "HDV": "HDV",
-    "ICB": "ICB",
-    "LDV": "LDV",
-    "MDV": "MDV",
-    "Off-Road": "Off-Road",
-    "Rail": "Rail",
-    "SB": "SB",
-    "UB": "UB",
-    "G&S mine_fs": "G&S mine_fs",
-    "G&S mine_md": "G&S mine_md",
-    "G&S mine_op": "G&S mine_op",
-    "G&S mine_pg": "G&S mine_pg",
-    "G&S mine_ph": "G&S mine_ph",
-    "G&S mine_tr": "G&S mine_tr",
-    "I mine_fs": "I mine_fs",
-    "I mine_md": "I mine_md",
-    "I mine_op": "I mine_op",
-    "I mine_pg": "I mine_pg",
-    "I mine_ph": "I mine_ph",
-    "I mine_tr": "I mine_tr",
-    "O metal_fs": "O metal_fs",
-    "O metal_md": "O metal_md",
-    "O metal_op": "O metal_op",
-    "O metal_pg": "O metal_pg",
-    "O metal_ph": "O metal_ph",
-    "O metal_tr": "O metal_tr",
-    "Marine": "Marine",
-    "Alum_fs": "Alum_fs",
-    "Alum_md": "Alum_md",
-    "Alum_op": "Alum_op",
-    "Alum_ph": "Alum_ph",
-    "Alum_tr": "Alum_tr",
-    "K mine_fs": "K mine_fs",
-    "K mine_md": "K mine_md",
-    "K mine_ph": "K mine_ph",
-    "K mine_tr": "K mine_tr"
-}
 
-carrier_tech_dict = {
-    "d_ice":    "Diesel ICE",
-    "db_ice":   "Biodiesel ICE",
-    "dr_ice":   "Renewable Diesel ICE",
-    "et_ice":   "Ethanol ICE",
-    "j_ice":    "Jet ICE",
-    "p_ice":    "Gasoline ICE",
-    "e_resht":  "Electric Resistive Heat",
-    "hfo_boil": "HFO Boiler",
-    "lfo_boil": "LFO Boiler",
-    "ng_mef":   "NG Mech. Furnace",
-    "pro_mef":  "Prop Mech. Furnace",
-    "st_HtXch": "Steam Exchanger",
-    "e_othbldg":"Elec. Other Bldg.",
-    "hfo_othbldg":"HFO Other Bldg.",
-    "lfo_othbldg":"LFO Other Bldg.",
-    "ng_cook":  "NG Cooking",
-    "pro_cook": "Prop Cooking",
-    "st_othbldg":"Steam Other Bldg.",
-    "ng_boil":  "NG Boiler",
-    "pro_boil": "Prop Boiler",
-    "e_hwt":    "Elec. Hot Water",
-    "hfo_hwt":  "HFO Hot Water",
-    "lfo_hwt":  "LFO Hot Water",
-    "ng_hwt":   "NG Hot Water",
-    "pro_hwt":  "Prop Hot Water",
-    "st_hwt":   "Steam Hot Water",
-    "e_fs":     "Elec. Facility Support",
-    "e_gridmd": "Elec. Grid Drive",
-    "ng_icemd": "NG Engine Drive",
-    "e_op":     "Elec. Other Processes",
-    "c_ph":     "Coal Proc. Heat",
-    "e_ph":     "Elec. Proc. Heat",
-    "ng_ph":    "NG Proc. Heat",
-    "pl_ph":    "Plastics Proc. Heat",
-    "st_ph":    "Steam Proc. Heat",
-    "d_icemd":  "Diesel Engine Drive",
-    "d_icepg":  "Diesel Power Gen",
-    "d_ph":     "Diesel Proc. Heat",
-    "hfo_ph":   "HFO Proc. Heat",
-    "ng_icepg": "NG Power Gen",
-    "hfo_icepg":"HFO Power Gen",
-    "w_ph":     "Wood Proc. Heat",
-    "e_bev":    "Battery EV",
-    "lfo_cook": "LFO Cooking",
-    "w_cook":   "Wood Cooking",
-    "e_ashp":   "Air-Source HP",
-    "lfo_hef":  "LFO HE Furnace",
-    "lfo_mef":  "LFO Mech. Furnace",
-    "lfo_nef":  "LFO Non-Eff. Furnace",
-    "ng_hef":   "NG HE Furnace",
-    "ng_nef":   "NG Non-Eff. Furnace",
-    "w_stove":  "Wood Stove",
-    "w_hwt":    "Wood Hot Water",
-    "ng_ice":   "NG ICE",
-    "pro_ice":  "Prop ICE",
-    "hfo_ice":  "HFO ICE",
-    "st_htXch": "Steam Heat Exch."
-}
+# === Abbreviations of the NZEST codes (code -> name dictionaries: nzest_constants.py, compiled by taxonomy.py) ===
 
 
 abbreviation_dict = {
@@ -302,72 +159,251 @@ abbreviation_dict = {
     "WCSB": "Western Canadian Sedimentary Basin"
 }
 
-Province_real = {
-    "ab" : "Alberta",
-    "qc" : "Quebec",
-    "sk" : "Sasktchewan",
-    "atl" : "Atlantic Provinces",
-    "bct" : "British-Columbia",
-    "on" : "Ontario",
-    "mb": "Manitoba"
-    
-}
 
+def columnar_frame(df):
+    """
+    Copy of a post-processed frame with the columnar dtypes:
+    - Identifier columns become dictionary-encoded categoricals
+    - Year is stored as int16
+    """
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "Year" in df.columns:
+        df["Year"] = df["Year"].astype("int16")
+    return df
 
-carrier_dict = {
-    "d": "Diesel",
-    "db": "Biodiesel",
-    "dr": "R-Diesel",
-    "et": "Ethanol",
-    "j": "Jet Fuel",
-    "p": "Gasoline",
-    "e": "Elec",
-    "hfo": "HFO",
-    "lfo": "LFO",
-    "ng": "NG",
-    "pro": "Prop",
-    "st": "Steam",
-    "c": "Coal",
-    "pl": "Plastics",
-    "w": "Wood"
-}
 
+def columnar_table(df):
+    """
+    Arrow table of columnar_frame(df) whose dictionary columns all use int32
+    indices. Pandas picks the narrowest index for each frame (int8 below 128
+    categories), so chunks or partitions of one output would otherwise get
+    different, possibly too narrow, schemas.
+    """
+    table = pa.Table.from_pandas(columnar_frame(df), preserve_index=False)
+    fields = [
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type, f.type.ordered), f.nullable, f.metadata)
+        if pa.types.is_dictionary(f.type) else f
+        for f in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
 
-# === Function to process Status-Quo scenario CSV ===
-def process_SQ(input_csv_path, output_csv_path):
+
+def clear_partitions(csv_path):
+    """Drop the partitioned outputs of an incremental build before a full rewrite."""
+    if os.path.isdir(columnar_path(csv_path)):
+        shutil.rmtree(columnar_path(csv_path))
+    for path in (partitions_dir(csv_path), manifest_path(csv_path)):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def write_columnar(df, csv_path):
+    """Write the Parquet companion of a post-processed CSV (see columnar_frame)."""
+    clear_partitions(csv_path)
+    pq.write_table(columnar_table(df), columnar_path(csv_path))
+
+
+def load_carbon_content(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "Carbon_Content.csv")):
+    """Carbon Content table indexed by Carrier; each column is a per-carrier factor vector."""
+    return pd.read_csv(path).set_index("Carrier")
+
+
+def add_carbon_content(df, df_CC, energy_col="Energy demand (PJ/yr)"):
+    """Append the carrier's carbon factors and Carbon Content MT c (PJ / (MJ/kgC) = Mt C)."""
+    # Carrier position in the factor table; -1 (unknown carrier) picks the trailing NaN
+    positions = df_CC.index.get_indexer(df["Carrier"])
+    for col in df_CC.columns:
+        df[col] = np.append(df_CC[col].to_numpy(dtype=float), np.nan)[positions]
+    energy_pj = df[energy_col] if "(PJ" in energy_col else df[energy_col] * 1e-6
+    df["Carbon Content MT c"] = energy_pj / df["Energy per kg C (MJ/kgC)"]
+    return df
+
+
+def transform_SQ(df_SQ, df_CC):
     """
-    Process Status-Quo scenario CSV:
-    - Loads raw CSV from input_csv_path
-    - Transforms wide data (years 2000-2050) into long format
+    Turn wide Status-Quo rows into the long post-processed layout:
+    - Melts the year columns into Year / Energy demand (PJ/yr)
     - Maps codes to descriptive names using predefined dictionaries
-    - Writes cleaned data to output_csv_path
+    - Looks up the carrier's carbon factors and computes Carbon Content MT c
     """
-    # Load Status-Quo scenario data into a DataFrame
-    df_SQ = pd.read_csv(input_csv_path)
-
-    # Melt the DataFrame from wide to long format
+    year_cols = [c for c in df_SQ.columns if c.strip().isdigit()]
     df_SQ = df_SQ.melt(
         id_vars=["prov","Sector","Subsector","en_carrier","tech"],
-        value_vars=[str(y) for y in range(2000, 2051)],
+        value_vars=year_cols,
         var_name="Year",
         value_name="Energy demand (PJ/yr)"
     )
 
-    # Map codes to descriptive names
-    df_SQ["Carrier"] = df_SQ["en_carrier"].map(carrier_dict)
-    df_SQ["Tech_name"] = df_SQ["tech"].map(carrier_tech_dict)
-    df_SQ["Tech_subsector"] = df_SQ["Subsector"].map(sector_activity_dict)
-    df_SQ["Province"] = df_SQ["prov"].map(Province_real)
-    
-    Path_Carbon_Content = "Carbon_Content.csv"
-    df_CC = pd.read_csv(Path_Carbon_Content)
+    # Map codes to descriptive names (catalog keys resolved once per distinct code)
+    df_SQ["Carrier"] = CATALOG["carrier"].lookup(df_SQ["en_carrier"])
+    df_SQ["Tech_name"] = CATALOG["tech"].lookup(df_SQ["tech"])
+    df_SQ["Tech_subsector"] = CATALOG["subsector"].lookup(df_SQ["Subsector"])
+    df_SQ["Province"] = CATALOG["province"].lookup(df_SQ["prov"])
 
+    return add_carbon_content(df_SQ, df_CC)
 
-    df_merged = df_SQ.merge(df_CC, on="Carrier", how='left')
-    df_merged['Carbon Content MT c'] = df_merged['Energy demand (PJ/yr)'] / df_merged['Energy per kg C (MJ/kgC)'] 
 
-    # Export the transformed data to CSV
-    df_merged.to_csv(output_csv_path, index=False)
+def run_pipeline(input_csv_path, output_csv_path, transform, chunksize=None):
+    """
+    Read a raw scenario CSV, apply transform(df, df_CC) and write the CSV
+    plus its Parquet companion (see write_columnar).
+
+    With chunksize, the input is streamed that many raw rows at a time and
+    each transformed chunk is appended to both outputs, so peak memory is
+    bounded by the chunk size rather than the file size.
+    """
+    df_CC = load_carbon_content()
+
+    if chunksize is None:
+        df_merged = transform(pd.read_csv(input_csv_path), df_CC)
+        # Export the transformed data to CSV
+        df_merged.to_csv(output_csv_path, index=False)
+        write_columnar(df_merged, output_csv_path)
+        return
+
+    clear_partitions(output_csv_path)
+    writer = None
+    try:
+        with pd.read_csv(input_csv_path, chunksize=chunksize) as reader:
+            for i, chunk in enumerate(reader):
+                df_chunk = transform(chunk, df_CC)
+                df_chunk.to_csv(output_csv_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+                # int32 dictionary indices: a later chunk may have more categories than the first
+                table = columnar_table(df_chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(columnar_path(output_csv_path), table.schema)
+                writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# === Incremental rebuild keyed by per-partition content hashes ===
+def partitions_dir(csv_path):
+    """Per-partition CSV fragments of an incremental build."""
+    return os.path.splitext(csv_path)[0] + "_parts"
+
+
+def manifest_path(csv_path):
+    """Partition hashes of an incremental build."""
+    return os.path.splitext(csv_path)[0] + "_manifest.json"
+
+
+def pipeline_fingerprint(transform, df_CC):
+    """Hash of everything besides the raw rows that shapes the output: code, catalog and factors."""
+    digest = hashlib.sha256()
+    for module in sorted({__name__, transform.__module__, "taxonomy", "nzest_constants"}):
+        with open(sys.modules[module].__file__, "rb") as f:
+            digest.update(f.read())
+    digest.update(df_CC.to_csv().encode())
+    return digest.hexdigest()
+
+
+def partition_name(key):
+    """File-name-safe form of a partition key."""
+    return re.sub(r"[^\w.-]", "_", key)
+
+
+def partition_hash(df_part, fingerprint):
+    digest = hashlib.sha256(fingerprint.encode())
+    digest.update(",".join(map(str, df_part.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df_part, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def run_incremental(input_csv_path, output_csv_path, transform, partition_col):
+    """
+    Rebuild only the partitions (raw rows sharing a partition_col value)
+    whose content hash changed since the last incremental build.
+
+    The Parquet companion becomes a directory with one file per partition,
+    which load_csv reads as a single dataset. The CSV is reassembled from
+    per-partition fragments, a plain byte copy with no re-processing.
+    Returns the rebuilt partition keys.
+    """
+    df_CC = load_carbon_content()
+    df_raw = pd.read_csv(input_csv_path)
+    fingerprint = pipeline_fingerprint(transform, df_CC)
+
+    dataset_dir = columnar_path(output_csv_path)
+    parts_dir = partitions_dir(output_csv_path)
+    manifest = {}
+    if os.path.isdir(dataset_dir) and os.path.exists(manifest_path(output_csv_path)):
+        with open(manifest_path(output_csv_path)) as f:
+            manifest = json.load(f)
+    else:
+        # First incremental build, or a full rewrite happened since: start over
+        clear_partitions(output_csv_path)
+        if os.path.exists(dataset_dir):
+            os.remove(dataset_dir)
+    os.makedirs(dataset_dir, exist_ok=True)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    old_hashes = manifest.get("partitions", {})
+    hashes = {}
+    rebuilt = []
+    for key, df_part in df_raw.groupby(partition_col, sort=True, dropna=False):
+        key = str(key)
+        hashes[key] = partition_hash(df_part, fingerprint)
+        name = partition_name(key)
+        parquet_part = os.path.join(dataset_dir, f"part-{name}.parquet")
+        csv_part = os.path.join(parts_dir, f"{name}.csv")
+        if old_hashes.get(key) == hashes[key] and os.path.exists(parquet_part) and os.path.exists(csv_part):
+            continue
+        df_out = transform(df_part, df_CC)
+        manifest["columns"] = list(df_out.columns)
+        # Write next to the target and swap in, so readers never see a partial file
+        # (dataset readers skip dot-files)
+        tmp_part = os.path.join(dataset_dir, f".part-{name}.parquet.tmp")
+        pq.write_table(columnar_table(df_out), tmp_part)
+        os.replace(tmp_part, parquet_part)
+        df_out.to_csv(csv_part, header=False, index=False)
+        rebuilt.append(key)
+
+    removed = [key for key in old_hashes if key not in hashes]
+    for key in removed:
+        name = partition_name(key)
+        for path in (os.path.join(dataset_dir, f"part-{name}.parquet"), os.path.join(parts_dir, f"{name}.csv")):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if rebuilt or removed or not os.path.exists(output_csv_path):
+        with open(output_csv_path + ".tmp", "w", newline="") as out:
+            pd.DataFrame(columns=manifest["columns"]).to_csv(out, index=False)
+            for key in sorted(hashes):
+                with open(os.path.join(parts_dir, partition_name(key) + ".csv")) as part:
+                    shutil.copyfileobj(part, out)
+        os.replace(output_csv_path + ".tmp", output_csv_path)
+        # load_csv only prefers the Parquet dataset while it is not older than the CSV
+        os.utime(dataset_dir)
+
+    manifest["partition_col"] = partition_col
+    manifest["partitions"] = hashes
+    with open(manifest_path(output_csv_path), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return rebuilt
+
+
+# === Function to process Status-Quo scenario CSV ===
+def process_SQ(input_csv_path, output_csv_path, chunksize=None, incremental=False):
+    """
+    Process Status-Quo scenario CSV:
+    - Loads raw CSV from input_csv_path
+    - Transforms wide data (years 2000-2050) into long format (see transform_SQ)
+    - Writes cleaned data to output_csv_path, plus a Parquet companion
+      (see write_columnar) that load_csv prefers when it is up to date
+    - With chunksize, streams the input in chunks (see run_pipeline)
+    - With incremental, only re-processes provinces whose raw rows changed
+      since the last incremental build (see run_incremental)
+    """
+    if incremental:
+        return run_incremental(input_csv_path, output_csv_path, transform_SQ, "prov")
+    run_pipeline(input_csv_path, output_csv_path, transform_SQ, chunksize)
 
 
 # Optional: Script execution guard for standalone usage
@@ -0,0 +1,151 @@
+"""
+Description:
+-------------
+Synthetic Status-Quo exports for scaling benchmarks.
+
+Generates raw wide-format files with the schema of the NZEST Status-Quo
+export (prov, Sector, Subsector, en_carrier, tech, 2000..2050) at any
+multiple of the checked-in sample's row count. Codes are drawn from the
+code catalog (taxonomy.py), so every generated row maps to names in
+process_SQ. The sample decides which sector each sub-sector belongs
+to, which technologies it usually uses, and the shape of the yearly
+profiles, which are resampled with noise.
+
+Beyond the sample's combinations, sub-sectors get technologies they do
+not use in the sample and, at large scale factors, repeated keys (as
+in exports split by region or vintage), which the pipeline sums.
+
+Larger vocabularies than the catalog's are opt-in: --regions splits each
+province into that many region codes (ab, ab_r1, ab_r2, ...) and
+--new-techs adds that many technology codes (<carrier>_syn<i>). They grow
+the raw code columns and their categoricals, but the catalog does not know
+them, so process_SQ gives them no Province or Tech_name and the pages,
+which select by name, do not show them. Sub-annual steps cannot be
+generated: the export has one column per year and the pipeline only
+melts all-digit year columns.
+
+Usage:
+    python SQ_Synthetic.py OUT_DIR [--scales 1 10 100] [--seed N] [--regions N] [--new-techs N]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from SQ_Pre_Process import CATALOG
+
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Status-quo scenario data.csv")
+ID_COLUMNS = ["prov", "Sector", "Subsector", "en_carrier", "tech"]
+# Share of rows using a technology the sub-sector does not use in the sample
+NEW_TECH_SHARE = 0.2
+
+
+def load_sample(path=SAMPLE_CSV):
+    """Sample export restricted to codes known to the catalog."""
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    known = (
+        (CATALOG["province"].keys(df["prov"]) >= 0)
+        & (CATALOG["subsector"].keys(df["Subsector"]) >= 0)
+        & (CATALOG["tech"].keys(df["tech"]) >= 0)
+        & (CATALOG["carrier"].keys(df["en_carrier"]) >= 0)
+    )
+    return df[known].reset_index(drop=True)
+
+
+def tech_carrier(techs):
+    # Technology codes start with their carrier code (d_ice -> d), split once per distinct code
+    positions, uniques = pd.factorize(np.asarray(techs, dtype=object))
+    return np.array([t.split("_")[0] for t in uniques], dtype=object)[positions]
+
+
+def synthetic_techs(n, carriers):
+    """n technology codes unknown to the catalog, spread over the carrier codes."""
+    return np.array([f"{carriers[i % len(carriers)]}_syn{i}" for i in range(n)], dtype=object)
+
+
+def generate_SQ(scale=1.0, seed=0, sample=None, regions=1, new_techs=0):
+    """
+    Wide Status-Quo frame with round(scale * sample rows) rows. Deterministic
+    for a given scale, seed, sample, regions and new_techs. Each province is
+    split into regions region codes, and new_techs technology codes beyond
+    the catalog join the pool of technologies new to a sub-sector.
+    """
+    sample = load_sample() if sample is None else sample
+    rng = np.random.default_rng(seed)
+    year_cols = [c for c in sample.columns if c.isdigit()]
+    n_rows = max(int(round(scale * len(sample))), 1)
+
+    # Sub-sector frequencies, sectors and usual technologies from the sample
+    subsector_freq = sample["Subsector"].value_counts(normalize=True)
+    sector_of = sample.drop_duplicates("Subsector").set_index("Subsector")["Sector"]
+    techs_of = sample.groupby("Subsector")["tech"].unique()
+    techs = CATALOG["tech"]
+    tech_carriers = techs.take(np.arange(len(techs)), "carrier")
+    all_techs = techs.codes[CATALOG["carrier"].keys(tech_carriers) >= 0]
+    carriers = pd.unique(tech_carrier(all_techs))
+    all_techs = np.concatenate([all_techs, synthetic_techs(new_techs, carriers)])
+    provinces = sample["prov"].unique()
+
+    # Usual technologies of every sub-sector, flattened: sub-sector i owns
+    # flat[offsets[i]:offsets[i] + sizes[i]]
+    subsector_codes = subsector_freq.index.to_numpy()
+    usual = [techs_of[sub] for sub in subsector_codes]
+    sizes = np.array([len(t) for t in usual])
+    offsets = np.r_[0, np.cumsum(sizes)[:-1]]
+    flat = np.concatenate(usual)
+
+    sub_idx = rng.choice(len(subsector_codes), size=n_rows, p=subsector_freq.to_numpy())
+    subsectors = subsector_codes[sub_idx]
+    prov = rng.choice(provinces, size=n_rows).astype(object)
+    if regions > 1:
+        region = rng.integers(0, regions, size=n_rows)
+        prov = np.where(region == 0, prov, prov + "_r" + region.astype(str).astype(object))
+    new_tech = rng.random(n_rows) < NEW_TECH_SHARE
+    tech = np.where(
+        new_tech,
+        all_techs[rng.integers(0, len(all_techs), size=n_rows)],
+        flat[offsets[sub_idx] + rng.integers(0, sizes[sub_idx])],
+    )
+
+    # Yearly profiles: a sample row's shape, rescaled and with year-to-year noise
+    profiles = sample[year_cols].to_numpy(dtype=float)
+    picked = profiles[rng.integers(0, len(profiles), size=n_rows)]
+    level = rng.lognormal(mean=0.0, sigma=0.5, size=(n_rows, 1))
+    noise = 1 + rng.normal(0.0, 0.05, size=picked.shape)
+    values = np.clip(picked * level * noise, 0.0, None)
+
+    df = pd.DataFrame({
+        "prov": prov,
+        "Sector": sector_of.reindex(subsectors).to_numpy(),
+        "Subsector": subsectors,
+        "en_carrier": tech_carrier(tech),
+        "tech": tech,
+    })
+    return pd.concat([df, pd.DataFrame(values, columns=year_cols)], axis=1)
+
+
+def write_SQ(out_dir, scale, seed=0, sample=None, regions=1, new_techs=0):
+    """Write the synthetic export for one scale factor; returns its path."""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"SQ_synthetic_x{scale:g}.csv")
+    generate_SQ(scale, seed, sample, regions, new_techs).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic NZEST Status-Quo exports.")
+    parser.add_argument("out_dir", help="directory for the generated CSVs")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1, 10, 100],
+                        help="multiples of the sample's row count")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--regions", type=int, default=1, help="region codes per province (1 keeps the catalog's)")
+    parser.add_argument("--new-techs", type=int, default=0, help="technology codes to add beyond the catalog")
+    args = parser.parse_args()
+    sample = load_sample()
+    for scale in args.scales:
+        path = write_SQ(args.out_dir, scale, args.seed, sample, args.regions, args.new_techs)
+        print(f"wrote  {path} ({int(round(scale * len(sample)))} rows)")
@@ -2,21 +2,27 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from stack_labels import band_matrix, stacked_area_labels
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from collections import defaultdict
 from nzest_constants import (
     sector_activity_dict,
     carrier_dict,
-    carrier_colors,
-    sector_activity_colors,
-    carrier_tech_colors,
     group_colors,
     stack_order,
 )
 
-# Define base directory for input CSV files, relative to this script's location
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
+# "Group by" option -> grouping column
+GROUP_BY = {
+    "Carrier": "Carrier",
+    "Carrier & Tech": "Tech_name",
+    "Sub Sector": "Tech_subsector"
+}
+
 
 def Energy_Demand():
     # Apply basic styling to the Streamlit app (background and text color)
@@ -33,82 +39,69 @@ def Energy_Demand():
     # Sidebar: Scenario selection radio buttons (no file uploader)
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
 
-    # Determine fallback CSV path based on selected scenario
-    fallback = os.path.join(base_dir, 'SQ_Post_Process.csv') if scenario == 'Status-Quo' else os.path.join(base_dir, 'NZ_Post_Process.csv')
-
-    # Load CSV if it exists; otherwise, show error and stop execution
-    if os.path.exists(fallback):
-        df = load_csv(fallback)
-    else:
+    # Fetch the shared dataset for the scenario; show error and stop if it has not been generated
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-
-    # For Net-Zero scenario, filter out placeholder sector entries ("-")
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    cube = dataset.cube
 
     # Identify the energy data column and extract its base unit (e.g., GJ, TJ, PJ)
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
     # Sidebar: Filters for sectors, provinces, and years
     st.sidebar.header("Filters")
 
     # List of unique sectors sorted alphabetically
-    sectors = sorted(df['Sector'].dropna().unique())
+    sectors = cube.members('Sector')
     selected_sectors = st.sidebar.multiselect("Select Sectors", sectors, default=sectors)
 
     # List of unique provinces sorted alphabetically
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
 
     # Add "All Canada" option at the top for province selection
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
 
     # Determine min and max years available in data for slider range
-    min_y = int(pd.to_numeric(df['Year'], errors='coerce').min())
-    max_y = int(pd.to_numeric(df['Year'], errors='coerce').max())
+    min_y = int(min(cube.members('Year')))
+    max_y = int(max(cube.members('Year')))
     selected_years = st.sidebar.slider("Select Year Range", min_y, max_y, (min_y, max_y))
 
     # Sidebar: Grouping options for charting
-    group_map = {
-        "Carrier": "Carrier",
-        "Carrier & Tech": "Tech_name",
-        "Sub Sector": "Tech_subsector"
-    }
-    sel_label = st.sidebar.selectbox("Group by", list(group_map.keys()))
-    dim_col = group_map[sel_label]
+    sel_label = st.sidebar.selectbox("Group by", list(GROUP_BY.keys()))
+    dim_col = GROUP_BY[sel_label]
 
     # Sidebar: Unit display options with default set to base unit from data
     display_unit = st.sidebar.selectbox("Display unit", ["GJ","TJ","PJ"], index=["GJ","TJ","PJ"].index(base_unit))
 
-    # Convert energy data to GJ for uniformity, then apply factor to convert to display unit
-    df['Energy_GJ'] = df[energy_col] * ({'GJ':1,'PJ':1e6}[base_unit])
-    factor = {'GJ':1,'TJ':1e-3,'PJ':1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
-
-    # Filter data based on selected sectors, provinces, and years
-    # If "All Canada" selected, aggregate across all provinces
-    if "All Canada" in selected_provinces:
-        df_filtered = df[
-            df['Sector'].isin(selected_sectors) &
-            df['Year'].between(*selected_years)
-        ]
-    else:
-        df_filtered = df[
-            df['Sector'].isin(selected_sectors) &
-            df['Province'].isin(selected_provinces) &
-            df['Year'].between(*selected_years)
-        ]
+    # Sum the selection by year and selected dimension, in the display unit
+    grouped = Energy_Demand_Data(cube, selected_sectors, selected_provinces, selected_years, dim_col, display_unit)
+
+    # Display options, chart and table rerun on their own when only a display option changes
+    Energy_Demand_Chart(grouped, scenario, sel_label, dim_col, display_unit)
+
+    # Provide a download button in the sidebar to export chart data as CSV
+    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download chart data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_data_{display_unit}.csv",
+        mime="text/csv"
+    )
+
 
-    # Group filtered data by year and selected dimension, summing energy values
-    grouped = df_filtered.groupby(['Year', dim_col])['Energy_display'].sum().reset_index()
+@st.fragment
+def Energy_Demand_Chart(grouped, scenario, sel_label, dim_col, display_unit):
+    # Presentation half of the page: styles the aggregate computed by Energy_Demand.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
 
     # Extract sorted unique labels for the current grouping dimension
     label_options = sorted(grouped[dim_col].unique())
 
-    # Sidebar: Chart display options inside an expander for better UI organization
-    with st.sidebar.expander("Chart display options", expanded=False):
+    # Chart display options inside an expander above the chart (fragments cannot write to the sidebar)
+    with st.expander("Chart display options", expanded=False):
         # Option to show a vertical line marking 2022 cutoff between historical and model data
         show_cutoff_line = st.checkbox("Show 2022 data/model cutoff", value=False)
 
@@ -146,15 +139,8 @@ def Energy_Demand():
         show_data_table = st.checkbox("Show table of chart values below", value=False)
 
         # --- Begin per-label color customization logic ---
-        # Select default color mapping based on grouping selection
-        if sel_label == "Carrier & Tech":
-            default_map = carrier_tech_colors
-        elif sel_label == "Sub Sector":
-            default_map = sector_activity_colors
-        elif sel_label == "Carrier":
-            default_map = carrier_colors
-        else:
-            default_map = {}
+        # Stable default color of every label of the grouping
+        default_map = color_map(dim_col, label_options)
 
         # Checkbox to enable manual selection of trace (fill) colors
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
@@ -165,16 +151,10 @@ def Energy_Demand():
         if show_trace_colors:
             st.markdown("**Pick a color for each label's area/trace:**")
             for label in label_options:
-                # Use default color if available, else fallback to gray
-                col = default_map.get(label, None)
-                picked = st.color_picker(f"Trace color for {label}", col if col is not None else "#CCCCCC", key=f"color_{sel_label}_{label}")
+                picked = st.color_picker(f"Trace color for {label}", default_map[label], key=f"color_{sel_label}_{label}")
                 label_colors[label] = picked
         else:
-            # Assign default colors where available; otherwise, leave unassigned for Plotly defaults
-            for label in label_options:
-                c = default_map.get(label, None)
-                if c is not None:
-                    label_colors[label] = c
+            label_colors = default_map
 
         # --- Label text color customization ---
         # Checkbox to enable selection of label text colors (black or white)
@@ -200,18 +180,91 @@ def Energy_Demand():
                 label_text_colors[label] = "white"
         # --- End per-label color customization ---
 
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        scenario=scenario, sel_label=sel_label, dim_col=dim_col, display_unit=display_unit,
+        label_colors=label_colors, label_text_colors=label_text_colors,
+        show_cutoff_line=show_cutoff_line, show_labels=show_labels, show_legend=show_legend,
+        label_font_size=label_font_size, label_mode=label_mode, show_label_for=show_label_for,
+        tick_label_font_size=tick_label_font_size,
+    )
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("Energy_Demand", grouped, **options)
+    fig = figure_cache.get(fig_key)
+    if fig is None:
+        fig = Energy_Demand_Figure(grouped, **options)
+        if fig is None:
+            st.warning("No data available for the current selection.")
+            return
+        figure_cache.put(fig_key, fig)
+
+    # Render the Plotly figure within the Streamlit app
+    with stage("serialize"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    # If user opted to show data table, display the grouped data below the chart
+    if 'show_data_table' in locals() and show_data_table:
+        st.subheader("Underlying values for chart")
+        st.dataframe(grouped)
+
+
+@profiled("data")
+def Energy_Demand_Data(cube, sectors=None, provinces=("All Canada",), years=None, dim_col="Carrier", display_unit=None):
+    """
+    Energy summed by year and dim_col over a selection of the scenario cube,
+    in display_unit (the data unit when None). Sectors and years default to
+    all of them; "All Canada" among the provinces reads the national rollup.
+    """
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+    all_years = cube.members('Year')
+    years = years or (min(all_years), max(all_years))
+
+    # "All Canada" reads the national rollup level of the cube
+    where = {'Sector': cube.members('Sector') if sectors is None else sectors}
+    if "All Canada" in provinces:
+        # Precomputed national totals instead of a sum over the provinces
+        cube = cube.national
+    else:
+        where['Province'] = list(provinces)
+
+    # Sum the cube by year and selected dimension
+    grouped = cube.query(
+        energy_col, ['Year', dim_col], where=where,
+        years=range(years[0], years[1] + 1), name='Energy_display'
+    )
+
+    # Convert the aggregated energy to the display unit
+    to_display_unit(grouped, 'Energy_display', base_unit, display_unit or base_unit)
+    return grouped
+
+
+@profiled("figure")
+def Energy_Demand_Figure(grouped, scenario, sel_label="Carrier", dim_col="Carrier", display_unit="PJ",
+                         label_colors=None, label_text_colors=None, show_cutoff_line=False,
+                         show_labels=True, show_legend=False, label_font_size=24, label_mode="Auto",
+                         show_label_for=(), tick_label_font_size=24):
+    """
+    Stacked area chart of an Energy_Demand_Data aggregate. Option defaults
+    match the page's display options; label_colors defaults to the colors of
+    the grouping. Returns None when labels are requested but nothing is plotted.
+    """
+    if label_colors is None:
+        label_colors = color_map(dim_col, grouped[dim_col].unique())
+
     # Prepare y-axis label text including the selected display unit per year
     y_label = f"Energy demand ({display_unit}/yr)"
 
     # Create an area chart using Plotly Express with the grouped data
-    fig = px.area(
-        grouped, x='Year', y='Energy_display', color=dim_col,
-        labels={'Energy_display': y_label, 'Year':'Year', dim_col:sel_label},
-        title=f"{scenario} {y_label} by {sel_label}",
-        category_orders={dim_col: stack_order},
-        color_discrete_map=label_colors,
-    )
-    
+    with stage("px"):
+        fig = px.area(
+            grouped, x='Year', y='Energy_display', color=dim_col,
+            labels={'Energy_display': y_label, 'Year':'Year', dim_col:sel_label},
+            title=f"{scenario} {y_label} by {sel_label}",
+            category_orders={dim_col: stack_order},
+            color_discrete_map=label_colors,
+        )
+
     # Remove border lines and ensure each area is filled with its trace color
     fig.for_each_trace(
         lambda trace: trace.update(
@@ -278,7 +331,7 @@ def Energy_Demand():
         title_font=dict(size=tick_label_font_size)
     )
 
-    # Set legend visibility based on sidebar checkbox
+    # Set legend visibility based on the display options checkbox
     fig.update_layout(showlegend=show_legend)
 
     # If enabled, add a vertical dashed line at year 2022 to indicate data/model cutoff
@@ -294,113 +347,20 @@ def Energy_Demand():
         )
 
     # Only add area/bar labels if user selected to show them
-    if show_labels:
-        # Define constants for label positioning and size threshold
-        y_offset_abs  = 0.0         # Absolute vertical offset for labels
-        offset_frac   = 0.2         # Fractional offset within band height for label position
-        pixel_shift   = 0           # Pixel shift for label positioning
-        min_height_ratio = 0.02     # Minimum relative band height (2%) to show label
-
-        # Target year on x-axis to place labels (e.g., 2035)
-        target_year = 2035
-
-        # If no data traces exist, warn user and exit function early
-        if not fig.data:
-            st.warning("No data available for the current selection.")
-            return
-
-        # Extract x-axis values from first trace (all traces share same x)
-        x_vals = list(fig.data[0].x)
-
-        # Find index of target year; if not found, default to middle index
-        idx = x_vals.index(target_year) if target_year in x_vals else len(x_vals) // 2
-        x_pos = x_vals[idx]
-
-        # Calculate total stacked height at target year across all traces
-        total_stack_height = sum(trace.y[idx] for trace in fig.data)
-
-        # Initialize list to keep track of cumulative stacked y-values for label positioning
-        stacked_y = [0.0] * len(x_vals)
-
-        # Determine label display mode: automatic or manual
-        auto_show = label_mode == "Auto"
-        manual_show = label_mode == "Manual"
-
-        # Loop through each data trace to decide if label should be shown and add annotation
-        for trace in fig.data:
-            # Calculate top y-values of current band by adding current trace y to stacked_y
-            y_top = [a + b for a, b in zip(stacked_y, trace.y)]
-
-            # Height of current band at target year
-            band_height = trace.y[idx]
-
-            # Check if label should be shown based on mode and band height
-            if (
-                (auto_show and band_height / total_stack_height >= min_height_ratio)
-                or (manual_show and trace.name in show_label_for)
-            ):
-                if band_height / total_stack_height >= min_height_ratio:
-                    # Position label vertically near middle of band with some offset
-                    y_mid = (stacked_y[idx] + y_top[idx]) / 2 + y_offset_abs + offset_frac * band_height
-                    y_label = y_mid
-                    yanchor = "middle"
-                    font_color = label_text_colors.get(trace.name, "white")
-                else:
-                    # For smaller bands, position label just above top with smaller font color
-                    y_label = y_top[idx] + 0.01 * total_stack_height  # 1% gap above band
-                    yanchor = "bottom"
-                    font_color = "#666"
-
-                # Calculate slope of band at target year for label text angle
-                window = 3  # years on each side of target for slope calculation
-                start_year = target_year - window
-                end_year = target_year + window
-                try:
-                    start_idx = x_vals.index(start_year)
-                    end_idx = x_vals.index(end_year)
-                    start_y = trace.y[start_idx]
-                    end_y = trace.y[end_idx]
-                    denom = (abs(start_y) + abs(end_y)) / 2
-                    if denom != 0:
-                        slope_ratio = (end_y - start_y) / denom
-                    else:
-                        slope_ratio = 0
-                except ValueError:
-                    # If start or end year not found, default slope to zero
-                    slope_ratio = 0
-
-                # Limit text angle between -12 and 0 degrees, inverse proportional to slope
-                textangle = max(min(-slope_ratio * 12, 0), -12)
-
-                # Add annotation (label) to figure at calculated position and angle
-                fig.add_annotation(
-                    x=x_pos,
-                    y=y_label,
-                    text=trace.name,
-                    showarrow=False,
-                    xanchor="left",
-                    yanchor=yanchor,
-                    font=dict(size=label_font_size, color=font_color),
-                    yshift=pixel_shift,
-                    textangle=textangle
-                )
-
-            # Update stacked_y to include current trace's values for next iteration
-            stacked_y = y_top
-
-    # Render the Plotly figure within the Streamlit app
-    st.plotly_chart(fig, use_container_width=True)
-
-    # If user opted to show data table, display the grouped data below the chart
-    if 'show_data_table' in locals() and show_data_table:
-        st.subheader("Underlying values for chart")
-        st.dataframe(grouped)
-
-    # Provide a download button in the sidebar to export chart data as CSV
-    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download chart data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_data_{display_unit}.csv",
-        mime="text/csv"
-    )
+    with stage("labels"):
+        if show_labels:
+            # If no data traces exist, there is nothing to label: the caller warns instead
+            if not fig.data:
+                return None
+
+            # Band heights per year in trace (stacking) order, labelled at 2035; the
+            # slope window stays on 2035 even when labels fall back to the middle year
+            names = [trace.name for trace in fig.data]
+            x_vals, bands = band_matrix(grouped, 'Year', 'Energy_display', dim_col, names)
+            fig.layout.annotations += tuple(stacked_area_labels(
+                x_vals, bands, names, label_x=2035, slope_x=2035, min_height_ratio=0.02,
+                manual=label_mode == "Manual", show_for=show_label_for,
+                text_colors=label_text_colors, font_size=label_font_size,
+            ))
+
+    return fig
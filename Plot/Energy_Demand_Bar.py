@@ -2,15 +2,16 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from stack_labels import stacked_bar_labels
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from collections import defaultdict
 from nzest_constants import (
     sector_activity_dict,
     carrier_dict,
-    carrier_colors,
-    sector_activity_colors,
-    carrier_tech_colors,
     group_colors,
     stack_order,
     category_mapping,
@@ -18,7 +19,13 @@ from nzest_constants import (
     fossil_carriers,
     group_order,
 )
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
+
+# "Group by" option -> grouping column
+GROUP_BY = {
+    "Carrier": "Carrier",
+    "Carrier & Tech": "Tech_name",
+    "Sub Sector": "Tech_subsector"
+}
 
 
 def Energy_Demand_Bar():
@@ -26,71 +33,56 @@ def Energy_Demand_Bar():
 
     # Scenario toggle (no uploader)
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
-    fallback = os.path.join(base_dir, 'SQ_Post_Process.csv') if scenario == 'Status-Quo' else os.path.join(base_dir, 'NZ_Post_Process.csv')
-    if os.path.exists(fallback):
-        df = load_csv(fallback)
-    else:
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-    # Filter out placeholder sector "-" for Net-Zero
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    cube = dataset.cube
 
     # Identify energy column and base unit
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
     # Sidebar filters
     st.sidebar.header("Filters")
-    sectors = sorted(df['Sector'].dropna().unique())
+    sectors = cube.members('Sector')
     selected_sectors = st.sidebar.multiselect("Select Sectors", sectors, default=sectors)
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
-    years = sorted(pd.to_numeric(df['Year'], errors='coerce').dropna().unique())
+    years = cube.members('Year')
     selected_years = st.sidebar.multiselect("Select up to 5 Years", options=years, default=years[:5], max_selections=5)
     # Toggle for decarbonisation marker
     # show_decarb = st.sidebar.checkbox("Show decarbonisation indicator", value=True)
 
     # Group-by and unit toggle
-    group_map = {
-        "Carrier": "Carrier",
-        "Carrier & Tech": "Tech_name",
-        "Sub Sector": "Tech_subsector"
-    }
-    sel_label = st.sidebar.selectbox("Group by", list(group_map.keys()))
-    dim_col = group_map[sel_label]
+    sel_label = st.sidebar.selectbox("Group by", list(GROUP_BY.keys()))
+    dim_col = GROUP_BY[sel_label]
     display_unit = st.sidebar.selectbox("Display unit", ["GJ","TJ","PJ"], index=["GJ","TJ","PJ"].index(base_unit))
 
+    # Energy per year and selected dimension, in the display unit
+    grouped = Energy_Demand_Bar_Data(cube, selected_sectors, selected_provinces, selected_years, dim_col, display_unit)
 
-    # Convert to GJ and apply factor
-    df['Energy_GJ'] = df[energy_col] * ({'GJ':1,'PJ':1e6}[base_unit])
-    factor = {'GJ':1,'TJ':1e-3,'PJ':1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
+    # Download button
+    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download chart data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_data_{display_unit}.csv",
+        mime="text/csv"
+    )
+
+    # Display options, chart and table rerun on their own when only a display option changes
+    Energy_Demand_Bar_Chart(grouped, scenario, selected_sectors, sel_label, dim_col, display_unit)
 
-    # Filter & group with "All Canada" option
-    if "All Canada" in selected_provinces:
-        # Ignore specific province filters and aggregate across all provinces
-        df_filtered = df[
-            df['Sector'].isin(selected_sectors) &
-            df['Year'].isin(selected_years)
-        ]
-    else:
-        df_filtered = df[
-            df['Sector'].isin(selected_sectors) &
-            df['Province'].isin(selected_provinces) &
-            df['Year'].isin(selected_years)
-        ]
-    grouped = df_filtered.groupby(['Year', dim_col])['Energy_display'].sum().reset_index()
-    grouped['Year'] = grouped['Year'].astype(str)
-    # Filter out categories representing <5% of total over the selected range
-    total_by_cat = grouped.groupby(dim_col)['Energy_display'].sum()
-    total_all = total_by_cat.sum()
-    keep_cats = total_by_cat[total_by_cat / total_all >= 0.0001].index
-    grouped = grouped[grouped[dim_col].isin(keep_cats)]
+
+@st.fragment
+def Energy_Demand_Bar_Chart(grouped, scenario, selected_sectors, sel_label, dim_col, display_unit):
+    # Presentation half of the page: styles the aggregate computed by Energy_Demand_Bar.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
 
     # --- All chart display options and label selector in a single expander ---
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         show_labels = st.checkbox("Show area/bar labels on chart", value=True)
         show_legend = st.checkbox("Show legend", value=False)
         show_decarb = st.checkbox("Show decarbonisation indicator", value=True)
@@ -120,23 +112,18 @@ def Energy_Demand_Bar():
         show_data_table = st.checkbox("Show table of chart values below", value=False)
 
         # --- BEGIN: Per-label color logic ---
-        import random
-        def random_hex():
-            return "#{:06x}".format(random.randint(0, 0xFFFFFF))
-
         # --- Trace (fill) colors toggle ---
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
         label_colors = {}
-        default_map = carrier_colors if sel_label == "Carrier" else carrier_colors
+        # Stable default color of every label of the grouping
+        default_map = color_map(dim_col, label_options)
         if show_trace_colors and label_options:
             st.markdown("**Pick a color for each label's area/trace:**")
             for label in label_options:
-                col = default_map.get(label, random_hex())
-                picked = st.color_picker(f"Trace color for {label}", col, key=f"bar_color_{sel_label}_{label}")
+                picked = st.color_picker(f"Trace color for {label}", default_map[label], key=f"bar_color_{sel_label}_{label}")
                 label_colors[label] = picked
         elif label_options:
-            for label in label_options:
-                label_colors[label] = default_map.get(label, random_hex())
+            label_colors = default_map
 
         # --- Label text colors toggle ---
         show_label_text_colors = st.checkbox("Select label text colors (black or white)", value=False)
@@ -156,19 +143,87 @@ def Energy_Demand_Bar():
                 label_text_colors[label] = "white"
         # --- END: Per-label color logic ---
 
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        scenario=scenario, selected_sectors=selected_sectors, sel_label=sel_label, dim_col=dim_col,
+        display_unit=display_unit, label_colors=label_colors, label_text_colors=label_text_colors,
+        show_labels=show_labels, show_legend=show_legend, show_decarb=show_decarb,
+        label_font_size=label_font_size, label_mode=label_mode, show_label_for=show_label_for,
+        tick_label_font_size=tick_label_font_size,
+    )
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("Energy_Demand_Bar", grouped, **options)
+    fig = figure_cache.get(fig_key)
+    if fig is None:
+        fig = Energy_Demand_Bar_Figure(grouped, **options)
+        figure_cache.put(fig_key, fig)
+
+    with stage("serialize"):
+        st.plotly_chart(fig, use_container_width=True)
+    if show_data_table:
+        st.subheader("Underlying values for chart")
+        st.dataframe(grouped)
+
+
+@profiled("data")
+def Energy_Demand_Bar_Data(cube, sectors=None, provinces=("All Canada",), years=None, dim_col="Carrier", display_unit=None):
+    """
+    Energy per year and dim_col for a few years of the scenario cube (the
+    first five when None), in display_unit (the data unit when None).
+    Categories below 0.01% of the total are dropped.
+    """
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+    if years is None:
+        years = cube.members('Year')[:5]
+
+    # Filter & group with "All Canada" option
+    where = {'Sector': cube.members('Sector') if sectors is None else sectors}
+    if "All Canada" in provinces:
+        # Precomputed national totals instead of a sum over the provinces
+        cube = cube.national
+    else:
+        where['Province'] = list(provinces)
+    grouped = cube.query(energy_col, ['Year', dim_col], where=where, years=years, name='Energy_display')
+
+    # Convert the aggregated energy to the display unit
+    to_display_unit(grouped, 'Energy_display', base_unit, display_unit or base_unit)
+    grouped['Year'] = grouped['Year'].astype(str)
+    # Filter out categories representing <5% of total over the selected range
+    total_by_cat = grouped.groupby(dim_col, observed=True)['Energy_display'].sum()
+    total_all = total_by_cat.sum()
+    keep_cats = total_by_cat[total_by_cat / total_all >= 0.0001].index
+    grouped = grouped[grouped[dim_col].isin(keep_cats)]
+    return grouped
+
+
+@profiled("figure")
+def Energy_Demand_Bar_Figure(grouped, scenario, selected_sectors, sel_label="Carrier", dim_col="Carrier",
+                             display_unit="PJ", label_colors=None, label_text_colors=None, show_labels=True,
+                             show_legend=False, show_decarb=True, label_font_size=16, label_mode="Auto",
+                             show_label_for=(), tick_label_font_size=24):
+    """
+    Stacked bar chart of an Energy_Demand_Bar_Data aggregate, one bar per
+    year. Option defaults match the page's display options.
+    """
+    if label_colors is None:
+        label_colors = color_map(dim_col, grouped[dim_col].unique())
+    label_text_colors = label_text_colors or {}
+
     # Plot
     y_label = f"Energy demand ({display_unit}/yr)"
-    fig = px.bar(
-        grouped,
-        x='Year',
-        y='Energy_display',
-        color=dim_col,
-        text=dim_col,  # add this line
-        labels={'Energy_display': y_label, 'Year':'Year', dim_col:sel_label},
-        title=f"{scenario} {y_label} by {sel_label} for sectors: {', '.join(selected_sectors)}",
-        category_orders={dim_col: stack_order},
-        color_discrete_map=label_colors,
-    )
+    with stage("px"):
+        fig = px.bar(
+            grouped,
+            x='Year',
+            y='Energy_display',
+            color=dim_col,
+            text=dim_col,  # add this line
+            labels={'Energy_display': y_label, 'Year':'Year', dim_col:sel_label},
+            title=f"{scenario} {y_label} by {sel_label} for sectors: {', '.join(selected_sectors)}",
+            category_orders={dim_col: stack_order},
+            color_discrete_map=label_colors,
+        )
 
     # Enforce white background, black fonts, and full numeric ticks
     fig.update_layout(template='plotly_white', font_color='black')
@@ -191,55 +246,25 @@ def Energy_Demand_Bar():
         tickformat='.0f'
     )
 
-    # Compute stack heights for each x (Year) before the label loop
-    from collections import defaultdict  # already imported at top; harmless re-import
-    # Build total stack height per Year so we can compare each bar to its stack
-    stack_heights = defaultdict(float)
-    for t in fig.data:
-        for x_val, y_val in zip(t.x, t.y):
-            stack_heights[str(x_val)] += y_val
-
-    threshold = 0.05        # bar must be ≥ 5 % of its stack to be considered
-    inside_threshold = 0.10  # bar must be ≥ 10 % of its stack to keep the label *inside*
-
-    auto_show = label_mode == "Auto"
-    manual_show = label_mode == "Manual"
-    for trace in fig.data:
-        positions = []
-        texts = []
-        for x_val, y_val, t_text in zip(trace.x, trace.y, trace.text):
-            stack = stack_heights[str(x_val)]
-            rel = y_val / stack if stack > 0 else 0
-            label_name = t_text if isinstance(t_text, str) else trace.name
-            show = (
-                (auto_show and rel >= threshold)
-                or (manual_show and label_name in show_label_for)
-            )
-            if show:
-                # If bar is < 1 (in displayed unit), force the label outside
-                if y_val < 1:
-                    positions.append("outside")
-                else:
-                    positions.append("inside" if rel >= inside_threshold else "outside")
-                texts.append(label_name)
-            else:
-                positions.append("none")
-                texts.append(" ")  # keep hover active with a space
-
-        trace.textposition = positions
-        trace.text = texts
-        trace.texttemplate = "%{text} %{y:.0f} (" + display_unit + "/yr)"
-        trace.insidetextanchor = "middle"
-        trace.textfont = dict(size=label_font_size, color=label_text_colors.get(trace.name, "white"))
-        # Force specific labels to black
-        if trace.name in ["Jet Fuel", "Elec"]:
-            trace.textfont['color'] = 'black'
-        trace.width = 0.54
-        trace.hovertemplate = (
-            "Year: %{x}<br>"
-            f"{y_label}: "+"%{y:.3f}<br>"
-            f"{sel_label}: {trace.name}<extra></extra>"
+    with stage("labels"):
+        # Label text, position and font per bar, relative to each year's stack
+        label_updates = stacked_bar_labels(
+            fig, grouped, 'Year', 'Energy_display', dim_col,
+            manual=label_mode == "Manual", show_for=show_label_for,
+            # Force specific labels to black
+            text_colors={**label_text_colors, "Jet Fuel": "black", "Elec": "black"},
+            font_size=label_font_size,
         )
+        for trace, update in zip(fig.data, label_updates):
+            trace.update(update)
+            trace.texttemplate = "%{text} %{y:.0f} (" + display_unit + "/yr)"
+            trace.insidetextanchor = "middle"
+            trace.width = 0.54
+            trace.hovertemplate = (
+                "Year: %{x}<br>"
+                f"{y_label}: "+"%{y:.3f}<br>"
+                f"{sel_label}: {trace.name}<extra></extra>"
+            )
 
     # Hide bar labels if show_labels is False
     if not show_labels:
@@ -295,7 +320,7 @@ def Energy_Demand_Bar():
         title_font=dict(size=tick_label_font_size)
     )
 
-    # 1) Show/hide the legend as per sidebar
+    # 1) Show/hide the legend as per display options
     fig.update_layout(showlegend=show_legend)
 
     if show_decarb:
@@ -304,7 +329,7 @@ def Energy_Demand_Bar():
                            "Diesel", "R-Diesel", "Gasoline", "Jet Fuel",
                            "Prop", "NG", "Plastics"]
         decarb = grouped[grouped[dim_col].isin(fossil_carriers)] \
-                  .groupby('Year')['Energy_display'].sum().reset_index()
+                  .groupby('Year', observed=True)['Energy_display'].sum().reset_index()
         # Add marker trace for decarbonisation amount
         fig.add_trace(go.Scatter(
             x=decarb['Year'],
@@ -329,17 +354,4 @@ def Energy_Demand_Bar():
             mode="show"  # keep text at least this size
         )
     )
-
-    # Download button
-    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download chart data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_data_{display_unit}.csv",
-        mime="text/csv"
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    if show_data_table:
-        st.subheader("Underlying values for chart")
-        st.dataframe(grouped)
\ No newline at end of file
+    return fig
@@ -1,14 +1,19 @@
 
 
 import streamlit as st
-import pandas as pd
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from stack_labels import band_matrix, stacked_area_labels
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from nzest_constants import (
-    group_colors,
     group_order,
 )
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
+from taxonomy import CATALOG
+
+# Groups plotted by the page (sectors map to them in the catalog); other sectors are left out
+GROUPS = list(CATALOG["group"].names)
 
 
 def Energy_Demand_Grouped():
@@ -26,61 +31,56 @@ def Energy_Demand_Grouped():
 
     # Load scenario and data
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
-    fallback = os.path.join(base_dir, 'SQ_Post_Process.csv') if scenario == 'Status-Quo' else os.path.join(base_dir, 'NZ_Post_Process.csv')
-    if os.path.exists(fallback):
-        df = load_csv(fallback)
-    else:
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    # Options come from the cube, the rows from the selected level
+    cube = dataset.cube
 
-    # Identify energy column and convert to GJ
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
-    df['Energy_GJ'] = df[energy_col] * ({'GJ': 1, 'PJ': 1e6}[base_unit])
+    # Identify energy column and its unit
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
     # Sidebar filters
     st.sidebar.header("Filters")
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
-    min_y = int(pd.to_numeric(df['Year'], errors='coerce').min())
-    max_y = int(pd.to_numeric(df['Year'], errors='coerce').max())
+    years = cube.members('Year')
+    min_y, max_y = int(years[0]), int(years[-1])
     selected_years = st.sidebar.slider("Select Year Range", min_y, max_y, (min_y, max_y))
     display_unit = st.sidebar.selectbox("Display unit", ["GJ", "TJ", "PJ"], index=["GJ", "TJ", "PJ"].index(base_unit))
-    factor = {'GJ': 1, 'TJ': 1e-3, 'PJ': 1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
 
-    # Group sectors as requested
-    mapping = {
-        "Transport":   "Transport",
-        "Residential": "Building",
-        "Commercial":  "Building",
-        "Industry":    "Industry",
-        "Agriculture": "Industry"
-    }
-    df['Group'] = df['Sector'].map(mapping).fillna("Other")
+    # "All Canada" reads the precomputed national totals instead of every province row
+    df = (dataset.national if "All Canada" in selected_provinces else dataset).view()
+    if scenario.startswith("Net-Zero"):
+        df = df[df['Sector'] != "-"]
 
-    # Filter rows by selection
-    if "All Canada" in selected_provinces:
-        df_filtered = df[df['Year'].between(*selected_years)]
-    else:
-        df_filtered = df[
-            df['Year'].between(*selected_years) &
-            df['Province'].isin(selected_provinces)
-        ]
-    grouped = (
-        df_filtered
-        .groupby(['Year', 'Group'])['Energy_display']
-        .sum()
-        .reset_index()
+    # Energy per year and category over the selection, in the display unit
+    grouped = Energy_Demand_Grouped_Data(df, selected_provinces, selected_years, display_unit)
+
+    # Display options, chart and table rerun on their own when only a display option changes
+    Energy_Demand_Grouped_Chart(grouped, scenario, display_unit)
+
+    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download grouped energy data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_energy_grouped_{selected_years[0]}_{selected_years[1]}_{display_unit}.csv",
+        mime="text/csv"
     )
-    grouped = grouped[grouped['Group'].isin(["Transport", "Building", "Industry"])]
-    label_options = ["Transport", "Building", "Industry"]
+
+
+@st.fragment
+def Energy_Demand_Grouped_Chart(grouped, scenario, display_unit):
+    # Presentation half of the page: styles the aggregate computed by Energy_Demand_Grouped.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
+
+    label_options = GROUPS
 
     # --- All chart display options and label selector in a single expander ---
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         show_cutoff_line = st.checkbox("Show 2022 data/model cutoff", value=False)
         show_labels = st.checkbox("Show area labels on chart", value=True)
         show_legend = st.checkbox("Show legend", value=False)
@@ -105,15 +105,15 @@ def Energy_Demand_Grouped():
         # --- Color pickers for each group ---
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
         group_color_map = {}
+        # Stable default color of every group
+        default_map = color_map('group', label_options)
         if show_trace_colors:
             st.markdown("**Pick a color for each group:**")
             for label in label_options:
-                col = group_colors.get(label, "#CCCCCC")
-                picked = st.color_picker(f"Trace color for {label}", col, key=f"grouped_color_{label}")
+                picked = st.color_picker(f"Trace color for {label}", default_map[label], key=f"grouped_color_{label}")
                 group_color_map[label] = picked
         else:
-            for label in label_options:
-                group_color_map[label] = group_colors.get(label, "#CCCCCC")
+            group_color_map = default_map
 
         # --- Label text color pickers ---
         show_label_text_colors = st.checkbox("Select label text colors (black or white)", value=False)
@@ -132,21 +132,91 @@ def Energy_Demand_Grouped():
             for label in label_options:
                 label_text_colors[label] = "white"
 
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        scenario=scenario, display_unit=display_unit, group_color_map=group_color_map,
+        label_text_colors=label_text_colors, show_cutoff_line=show_cutoff_line, show_labels=show_labels,
+        show_legend=show_legend, label_font_size=label_font_size, label_mode=label_mode,
+        show_label_for=show_label_for, tick_label_font_size=tick_label_font_size,
+    )
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("Energy_Demand_Grouped", grouped, **options)
+    fig = figure_cache.get(fig_key)
+    if fig is None:
+        fig = Energy_Demand_Grouped_Figure(grouped, **options)
+        figure_cache.put(fig_key, fig)
+
+    with stage("serialize"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    if show_data_table:
+        st.subheader("Underlying values for chart")
+        st.dataframe(grouped.pivot(index='Year', columns='Group', values='Energy_display').reset_index())
+
+
+@profiled("data")
+def Energy_Demand_Grouped_Data(df, provinces=("All Canada",), years=None, display_unit=None):
+    """
+    Energy per year and category (Transport, Building, Industry) of a scenario
+    frame, in display_unit (the data unit when None). Years default to the
+    full range. "All Canada" among the provinces drops the province filter,
+    so pass the national rollup frame (Dataset.national) for national totals.
+    """
+    energy_col = next(c for c in df.columns if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+    years = years or (int(df['Year'].min()), int(df['Year'].max()))
+
+    # Group sectors as requested
+    df = df.assign(Group=CATALOG["sector"].lookup(df['Sector'], "group").fillna("Other"))
+
+    # Filter rows by selection
+    with stage("filter"):
+        if "All Canada" in provinces:
+            df_filtered = df[df['Year'].between(*years)]
+        else:
+            df_filtered = df[
+                df['Year'].between(*years) &
+                df['Province'].isin(provinces)
+            ]
+    with stage("groupby"):
+        grouped = (
+            df_filtered
+            .groupby(['Year', 'Group'])[energy_col]
+            .sum()
+            .reset_index(name='Energy_display')
+        )
+    to_display_unit(grouped, 'Energy_display', base_unit, display_unit or base_unit)
+    return grouped[grouped['Group'].isin(GROUPS)]
+
+
+@profiled("figure")
+def Energy_Demand_Grouped_Figure(grouped, scenario, display_unit="PJ", group_color_map=None,
+                                 label_text_colors=None, show_cutoff_line=False, show_labels=True,
+                                 show_legend=False, label_font_size=24, label_mode="Auto",
+                                 show_label_for=(), tick_label_font_size=24):
+    """
+    Stacked area chart of an Energy_Demand_Grouped_Data aggregate. Option
+    defaults match the page's display options.
+    """
+    if group_color_map is None:
+        group_color_map = color_map('group', GROUPS)
+
     # --- Area chart ---
     y_label = f"Energy demand ({display_unit}/yr)"
     import plotly.express as px
     # Define explicit group order
-    
-    fig = px.area(
-        grouped,
-        x='Year',
-        y='Energy_display',
-        color='Group',
-        labels={'Energy_display': y_label, 'Year': 'Year', 'Group': 'Category'},
-        title=f"{scenario} Energy Demand by Category",
-        color_discrete_map=group_color_map,
-        category_orders={'Group': group_order}
-    )
+
+    with stage("px"):
+        fig = px.area(
+            grouped,
+            x='Year',
+            y='Energy_display',
+            color='Group',
+            labels={'Energy_display': y_label, 'Year': 'Year', 'Group': 'Category'},
+            title=f"{scenario} Energy Demand by Category",
+            color_discrete_map=group_color_map,
+            category_orders={'Group': group_order}
+        )
 
     # Remove area border lines
     fig.for_each_trace(
@@ -216,76 +286,15 @@ def Energy_Demand_Grouped():
         )
 
     # Label logic (inside/outside/none)
-    if show_labels:
-        y_offset_abs  = 0.0
-        offset_frac   = 0.2
-        pixel_shift   = 0
-        min_height_ratio = 0.02  # 2% of total height at target year
-
-        # Choose a mid/future year to place label
-        target_year = 2035 if 2035 in list(grouped['Year'].unique()) else grouped['Year'].max()
-        x_vals = list(fig.data[0].x) if fig.data else []
-        if target_year in x_vals:
-            idx = x_vals.index(target_year)
-        else:
-            idx = len(x_vals) // 2 if x_vals else 0
-        x_pos = x_vals[idx] if x_vals else None
-        total_stack_height = sum(trace.y[idx] for trace in fig.data) if fig.data else 0
-        stacked_y = [0.0] * len(x_vals)
-        auto_show = label_mode == "Auto"
-        manual_show = label_mode == "Manual"
-        for trace in fig.data:
-            y_top = [a + b for a, b in zip(stacked_y, trace.y)]
-            band_height = trace.y[idx]
-            if (
-                (auto_show and band_height / total_stack_height >= min_height_ratio)
-                or (manual_show and trace.name in show_label_for)
-            ):
-                if band_height / total_stack_height >= min_height_ratio:
-                    y_mid = (stacked_y[idx] + y_top[idx]) / 2 + y_offset_abs + offset_frac * band_height
-                    y_label_pos = y_mid
-                    yanchor = "middle"
-                    font_color = label_text_colors.get(trace.name, "white")
-                else:
-                    y_label_pos = y_top[idx] + 0.01 * total_stack_height
-                    yanchor = "bottom"
-                    font_color = "#666"
-                window = 3
-                start_year = x_vals[idx] - window if x_vals else None
-                end_year = x_vals[idx] + window if x_vals else None
-                try:
-                    start_idx = x_vals.index(start_year)
-                    end_idx = x_vals.index(end_year)
-                    start_y = trace.y[start_idx]
-                    end_y = trace.y[end_idx]
-                    denom = (abs(start_y) + abs(end_y)) / 2
-                    slope_ratio = (end_y - start_y) / denom if denom != 0 else 0
-                except Exception:
-                    slope_ratio = 0
-                textangle = max(min(-slope_ratio * 12, 0), -12)
-                if x_pos is not None:
-                    fig.add_annotation(
-                        x=x_pos,
-                        y=y_label_pos,
-                        text=trace.name,
-                        showarrow=False,
-                        xanchor="left",
-                        yanchor=yanchor,
-                        font=dict(size=label_font_size, color=font_color),
-                        yshift=pixel_shift,
-                        textangle=textangle
-                    )
-            stacked_y = y_top
-
-    st.plotly_chart(fig, use_container_width=True)
-
-    if show_data_table:
-        st.subheader("Underlying values for chart")
-        st.dataframe(grouped.pivot(index='Year', columns='Group', values='Energy_display').reset_index())
-    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download grouped energy data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_energy_grouped_{selected_years[0]}_{selected_years[1]}_{display_unit}.csv",
-        mime="text/csv"
-    )
\ No newline at end of file
+    with stage("labels"):
+        if show_labels and fig.data:
+            # Choose a mid/future year to place label
+            target_year = 2035 if 2035 in list(grouped['Year'].unique()) else grouped['Year'].max()
+            names = [trace.name for trace in fig.data]
+            x_vals, bands = band_matrix(grouped, 'Year', 'Energy_display', 'Group', names)
+            fig.layout.annotations += tuple(stacked_area_labels(
+                x_vals, bands, names, label_x=target_year, min_height_ratio=0.02,
+                manual=label_mode == "Manual", show_for=show_label_for,
+                text_colors=label_text_colors, font_size=label_font_size,
+            ))
+    return fig
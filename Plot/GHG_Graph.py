@@ -4,8 +4,11 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_ghg_dataset
+from stack_labels import band_matrix, stacked_area_labels
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from collections import defaultdict
 from nzest_constants import (
     sector_activity_dict,
@@ -21,8 +24,29 @@ from nzest_constants import (
     group_order,
 )
 
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
-ghg_data_path = os.path.join(base_dir, "GHG_Data.csv")
+# Default color mapping for GHG categories (populate this dictionary as needed)
+GHG_LABEL_COLORS = {
+    "Buildings": "#9C1414",
+    "Agric": "#aeaeae",
+    "Energy Sector": "#18506B",
+    "Ind Processes": "#747474",
+    "Non Energy Ind": "#C56060",
+    "Transport": "#ECC10B",
+    "Waste": "#d1d1d1",
+    "End use Combustion of Energy Carriers": "#225f99",
+    "Production of Energy Carriers": "#c00000",
+    "Non-Energy Emissions": "#78206e",
+    "Electricity": "#FFBF00",
+    "Oil and Gas": "#c00000",
+    "Commercial": "#6C1D1D",
+    "Residential": "#a64d79",
+    "Air": "#167a0a",
+    "Road": "#7ee183",
+    "Off Road": "#1dce39",
+    "Rail": "#219a2c",
+    "Marine": "#20842e",
+}
+
 
 def GHG_Graph():
     st.markdown(
@@ -34,14 +58,12 @@ def GHG_Graph():
         unsafe_allow_html=True
     )
     st.title("NZEST Chart Generator")
-    Path = ghg_data_path
-    df_ghg = pd.read_csv(Path)
-    df_ghg = df_ghg.melt(id_vars=['Sector', 'Sub-Sector', 'Use', 'Province']
-                            ,value_vars=([str(year) for year in range(1990,2024)])
-                            ,var_name= 'year'
-                            ,value_name="GHG")
-    # Ensure GHG values are numeric
-    df_ghg['GHG'] = pd.to_numeric(df_ghg['GHG'], errors='coerce')
+    # Melted, typed GHG table (int16 year, categorical ids, float32 GHG)
+    dataset = get_ghg_dataset()
+    if dataset is None:
+        st.error("No GHG data found.")
+        st.stop()
+    df_ghg = dataset.view()
     
     # Sidebar filters
     st.sidebar.header("Filters")
@@ -64,13 +86,36 @@ def GHG_Graph():
     sel_label = st.sidebar.selectbox("Group by", list(group_map.keys()))
     dim_col = group_map[sel_label]
 
+    # Emissions per year and grouping category, in the display unit
+    grouped = GHG_Graph_Data(df_ghg, selected_years, selected_provinces, unit_sel, dim_col)
+
+    # Every category of the grouping dimension, offered in the label and color options
+    label_options = sorted(df_ghg[dim_col].dropna().unique())
+
+    # Download
+    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download GHG data as CSV",
+        data=csv_bytes,
+        file_name=f"GHG_Emissions_{sel_label}_{unit_sel}_{selected_years[0]}_{selected_years[1]}.csv",
+        mime="text/csv"
+    )
+
+    # Display options, chart and table rerun on their own when only a display option changes
+    GHG_Graph_Chart(grouped, unit_sel, sel_label, dim_col, label_options)
+
+
+@st.fragment
+def GHG_Graph_Chart(grouped, unit_sel, sel_label, dim_col, label_options):
+    # Presentation half of the page: styles the aggregate computed by GHG_Graph.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
+
     # Chart display options in a single expander
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         show_labels = st.checkbox("Show area/bar labels on chart", value=True)
         show_legend = st.checkbox("Show legend", value=False)
         label_font_size = st.slider("Label font size", min_value=8, max_value=28, value=16)
         # Label mode and selector logic
-        label_options = sorted(df_ghg[dim_col].dropna().unique())
         label_mode = st.radio(
             "Label mode",
             options=["Auto", "Manual"],
@@ -89,44 +134,18 @@ def GHG_Graph():
         show_data_table = st.checkbox("Show table of chart values below", value=False)
 
         # --- BEGIN: Per-label color logic ---
-        # Default color mapping for GHG categories (populate this dictionary as needed)
-        label_colors_default = {
-             "Buildings": "#9C1414",
-             "Agric": "#aeaeae",
-             "Energy Sector":"#18506B",
-             "Ind Processes":"#747474",
-             "Non Energy Ind": "#C56060",
-             "Transport":"#ECC10B",
-             "Waste": "#d1d1d1",
-             "End use Combustion of Energy Carriers":"#225f99",
-             "Production of Energy Carriers":"#c00000",
-             "Non-Energy Emissions":"#78206e",
-             "Electricity":"#FFBF00",
-             "Oil and Gas":"#c00000",
-                "Commercial": "#6C1D1D",
-                "Residential": "#a64d79",
-                "Air": "#167a0a",
-                "Road": "#7ee183",
-                "Off Road": "#1dce39",
-                "Rail": "#219a2c",
-                "Marine": "#20842e"
-           
-        }
-
-        label_options = sorted(df_ghg[dim_col].dropna().unique())
-
         # --- Trace (fill) colors toggle ---
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
         label_colors = {}
+        # Stable default color of every label (GHG_LABEL_COLORS first)
+        default_map = color_map('ghg', label_options, palette=GHG_LABEL_COLORS)
         if show_trace_colors and label_options:
             st.markdown("**Pick a color for each label's area/trace:**")
             for label in label_options:
-                col = label_colors_default.get(label, "#CCCCCC")
-                picked = st.color_picker(f"Trace color for {label}", col, key=f"ghg_color_{sel_label}_{label}")
+                picked = st.color_picker(f"Trace color for {label}", default_map[label], key=f"ghg_color_{sel_label}_{label}")
                 label_colors[label] = picked
         elif label_options:
-            for label in label_options:
-                label_colors[label] = label_colors_default.get(label, "#CCCCCC")
+            label_colors = default_map
 
         # --- Label text colors toggle ---
         show_label_text_colors = st.checkbox("Select label text colors (black or white)", value=False)
@@ -146,40 +165,90 @@ def GHG_Graph():
                 label_text_colors[label] = "white"
         # --- END: Per-label color logic ---
 
-    # Dimension filter based on grouping
-    dim_options = sorted(df_ghg[dim_col].dropna().unique())
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        unit_sel=unit_sel, sel_label=sel_label, dim_col=dim_col, label_colors=label_colors,
+        label_text_colors=label_text_colors, show_labels=show_labels, show_legend=show_legend,
+        label_font_size=label_font_size, label_mode=label_mode, show_label_for=show_label_for,
+        tick_label_font_size=tick_label_font_size,
+    )
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("GHG_Graph", grouped, **options)
+    fig = figure_cache.get(fig_key)
+    if fig is None:
+        fig = GHG_Graph_Figure(grouped, **options)
+        if fig is None:
+            st.warning("No data available for the current selection.")
+            return
+        figure_cache.put(fig_key, fig)
 
+    # Render plot and table
+    with stage("serialize"):
+        st.plotly_chart(fig, use_container_width=True)
+    if show_data_table:
+        st.subheader("Underlying values for chart")
+        st.dataframe(grouped)
+
+
+@profiled("data")
+def GHG_Graph_Data(df_ghg, years=None, provinces=("All Canada",), unit="MtCO₂e", dim_col="Sector"):
+    """
+    GHG emissions per year and dim_col category over the (first, last) years
+    range (every year when None), converted from kt to unit (MtCO₂e or GtCO₂e).
+    """
     # Filter dataframe
-    if "All Canada" in selected_provinces:
-        # Ignore province filtering, aggregate across all provinces
-        df_filtered = df_ghg[
-            df_ghg['year'].astype(int).between(selected_years[0], selected_years[1])
-        ]
-    else:
-        df_filtered = df_ghg[
-            df_ghg['Province'].isin(selected_provinces) &
-            df_ghg['year'].astype(int).between(selected_years[0], selected_years[1])
-        ]
+    if years is None:
+        years = (int(df_ghg['year'].min()), int(df_ghg['year'].max()))
+    with stage("filter"):
+        if "All Canada" in provinces:
+            # Ignore province filtering, aggregate across all provinces
+            df_filtered = df_ghg[
+                df_ghg['year'].between(years[0], years[1])
+            ]
+        else:
+            df_filtered = df_ghg[
+                df_ghg['Province'].isin(provinces) &
+                df_ghg['year'].between(years[0], years[1])
+            ]
     # Aggregate
-    grouped = df_filtered.groupby(['year', dim_col])['GHG'].sum().reset_index()
+    with stage("groupby"):
+        grouped = df_filtered.groupby(['year', dim_col], observed=True)['GHG'].sum().reset_index()
     grouped['year'] = grouped['year'].astype(int)
+    grouped[dim_col] = grouped[dim_col].astype(object)
+    grouped['GHG'] = grouped['GHG'].astype(float)
 
     # Convert from kilotonnes (kt) to Mt or Gt as selected
     # Data is in kilotonnes: 1 Mt = 1,000 kt; 1 Gt = 1,000,000 kt
-    factor = {"MtCO₂e": 1e-3, "GtCO₂e": 1e-6}[unit_sel]
+    factor = {"MtCO₂e": 1e-3, "GtCO₂e": 1e-6}[unit]
     grouped['GHG'] = grouped['GHG'] * factor
+    return grouped
+
+
+@profiled("figure")
+def GHG_Graph_Figure(grouped, unit_sel="MtCO₂e", sel_label="Sector", dim_col="Sector", label_colors=None,
+                     label_text_colors=None, show_labels=True, show_legend=False, label_font_size=16,
+                     label_mode="Auto", show_label_for=(), tick_label_font_size=24):
+    """
+    Stacked area chart of a GHG_Graph_Data aggregate. Option defaults match
+    the page's display options. Returns None when labels are requested but
+    there is nothing to plot.
+    """
+    if label_colors is None:
+        label_colors = color_map('ghg', grouped[dim_col].unique(), palette=GHG_LABEL_COLORS)
+    label_text_colors = label_text_colors or {}
 
     # Plot
     y_label = f"GHG Emissions ({unit_sel}/yr)"
-    fig = px.area(
-        grouped,
-        x='year',
-        y='GHG',
-        color=dim_col,
-        labels={'GHG': y_label, 'year': 'Year', dim_col: sel_label},
-        title=f"GHG Emissions by {sel_label}",
-        color_discrete_map=label_colors,
-    )
+    with stage("px"):
+        fig = px.area(
+            grouped,
+            x='year',
+            y='GHG',
+            color=dim_col,
+            labels={'GHG': y_label, 'year': 'Year', dim_col: sel_label},
+            title=f"GHG Emissions by {sel_label}",
+            color_discrete_map=label_colors,
+        )
     # Apply styling similar to Energy Demand
     fig.for_each_trace(lambda trace: trace.update(fillcolor=trace.line.color, line=dict(width=0)))
     fig.update_layout(
@@ -222,96 +291,21 @@ def GHG_Graph():
         title_font=dict(size=tick_label_font_size)
     )
 
-    # Set legend visibility based on sidebar
+    # Set legend visibility based on display options
     fig.update_layout(showlegend=show_legend)
 
-    # Optional: Area label annotations
-    if show_labels:
-        y_offset_abs  = 0.0
-        offset_frac   = 0.2
-        pixel_shift   = 0
-        min_height_ratio = 0.07  # 7% threshold
-
-        # 3) Identify the x-position to place the label at the midpoint of the visible years
-        if not fig.data:
-            st.warning("No data available for the current selection.")
-            return
-        x_vals = list(fig.data[0].x)
-        if not x_vals:
-            st.warning("No x-values available for plotting.")
-            return
-        mid_idx = len(x_vals) // 2  # lower mid for even length, standard
-        idx = mid_idx
-        x_pos = x_vals[idx]
-
-        # 4) Compute total stack height at target year
-        total_stack_height = sum(trace.y[idx] for trace in fig.data)
-
-        # 5) Loop through traces and annotate
-        stacked_y = [0.0] * len(x_vals)
-
-        auto_show = label_mode == "Auto"
-        manual_show = label_mode == "Manual"
-        for trace in fig.data:
-            y_top = [a + b for a, b in zip(stacked_y, trace.y)]
-            band_height = trace.y[idx]
-            band_ratio = band_height / total_stack_height if total_stack_height != 0 else 0
-
-            if (
-                (auto_show and band_ratio >= min_height_ratio)
-                or (manual_show and trace.name in show_label_for)
-            ):
-                if band_ratio >= min_height_ratio:
-                    # Label inside the band (centered, color from label_text_colors)
-                    y_mid = (stacked_y[idx] + y_top[idx]) / 2 + y_offset_abs + offset_frac * band_height
-                    y_label = y_mid
-                    yanchor = "middle"
-                    font_color = label_text_colors.get(trace.name, "white")
-                else:
-                    # Label above the band (grey)
-                    y_label = y_top[idx] + 0.01 * total_stack_height  # 1% of stack as gap
-                    yanchor = "bottom"
-                    font_color = "#666"
-
-                # Slope/angle logic (unchanged)
-                window = 3
-                start_year = x_vals[idx] - window
-                end_year = x_vals[idx] + window
-                try:
-                    start_idx = x_vals.index(start_year)
-                    end_idx = x_vals.index(end_year)
-                    start_y = trace.y[start_idx]
-                    end_y = trace.y[end_idx]
-                    denom = (abs(start_y) + abs(end_y)) / 2
-                    slope_ratio = (end_y - start_y) / denom if denom != 0 else 0
-                except ValueError:
-                    slope_ratio = 0
-
-                textangle = max(min(-slope_ratio * 12, 0), -12)
-
-                fig.add_annotation(
-                    x=x_pos,
-                    y=y_label,
-                    text=trace.name,
-                    showarrow=False,
-                    xanchor="left",
-                    yanchor=yanchor,
-                    font=dict(size=label_font_size, color=font_color),
-                    yshift=pixel_shift,
-                    textangle=textangle
-                )
-
-            stacked_y = y_top
-
-    # Render plot and download
-    st.plotly_chart(fig, use_container_width=True)
-    if show_data_table:
-        st.subheader("Underlying values for chart")
-        st.dataframe(grouped)
-    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download GHG data as CSV",
-        data=csv_bytes,
-        file_name=f"GHG_Emissions_{sel_label}_{unit_sel}_{selected_years[0]}_{selected_years[1]}.csv",
-        mime="text/csv"
-    )
\ No newline at end of file
+    with stage("labels"):
+        # Optional: Area label annotations, placed at the middle of the visible years
+        if show_labels:
+            if not fig.data:
+                return None
+            names = [trace.name for trace in fig.data]
+            x_vals, bands = band_matrix(grouped, 'year', 'GHG', dim_col, names)
+            if not len(x_vals):
+                return None
+            fig.layout.annotations += tuple(stacked_area_labels(
+                x_vals, bands, names, min_height_ratio=0.07,
+                manual=label_mode == "Manual", show_for=show_label_for,
+                text_colors=label_text_colors, font_size=label_font_size,
+            ))
+    return fig
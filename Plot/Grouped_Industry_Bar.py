@@ -2,15 +2,16 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from collections import defaultdict
+import numpy as np
 from nzest_constants import (
     sector_activity_dict,
     carrier_dict,
-    carrier_colors,
-    sector_activity_colors,
-    carrier_tech_colors,
     group_colors,
     stack_order,
     category_mapping,
@@ -19,8 +20,7 @@ from nzest_constants import (
     group_order,
     tech_subsector_to_group,
 )
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
-
+from taxonomy import CATALOG
 
 
 def Grouped_Industry_Bar():
@@ -36,105 +36,71 @@ def Grouped_Industry_Bar():
     st.title("NZEST Grouped Industry Bar Chart")
 
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
-    fallback = 'SQ_Post_Process.csv' if scenario == 'Status-Quo' else 'NZ_Post_Process.csv'
-    csv_path = os.path.join(base_dir,fallback)
-    if os.path.exists(csv_path):
-        df = load_csv(csv_path)
-    else:
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    # Options come from the cube; only the rows of the selected year are read
+    cube = dataset.cube
 
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
-    df['Energy_GJ'] = df[energy_col] * ({'GJ': 1, 'PJ': 1e6}[base_unit])
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
-    years = sorted(pd.to_numeric(df['Year'], errors='coerce').dropna().unique())
+    years = cube.members('Year')
     selected_year = st.sidebar.selectbox("Select Year", years)
+    # "All Canada" reads the precomputed national totals instead of every province row
+    df = (dataset.national if "All Canada" in selected_provinces else dataset).year_view(selected_year)
+    if scenario.startswith("Net-Zero"):
+        df = df[df['Sector'] != "-"]
     display_unit = st.sidebar.selectbox("Display unit", ["GJ", "TJ", "PJ"], index=["GJ", "TJ", "PJ"].index(base_unit))
-    factor = {'GJ': 1, 'TJ': 1e-3, 'PJ': 1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
-
-    # Use the explicit mapping for grouping
-    manufacturing_codes = {k for k, v in tech_subsector_to_group.items() if v == "Manufacturing"}
-    extractive_codes = {k for k, v in tech_subsector_to_group.items() if v == "Extractive Industry"}
 
     st.sidebar.header("Industry Comparison Bar")
     selectable_cats = list(category_mapping.keys())
     default_cat = "Cement" if "Cement" in selectable_cats else selectable_cats[0]
     selected_cat = st.sidebar.selectbox("Select specific industry to extract and compare", selectable_cats, index=selectable_cats.index(default_cat))
-    selected_codes = category_mapping[selected_cat]
-
-    # Filter year and province
-    if "All Canada" in selected_provinces:
-        df_year = df[df['Year'] == selected_year]
-    else:
-        df_year = df[(df['Year'] == selected_year) & (df['Province'].isin(selected_provinces))]
-
-    # Determine if the selected sector is manufacturing or extractive using mapping
-    selected_cat_codes = category_mapping[selected_cat]
-    selected_cat_group = tech_subsector_to_group.get(selected_cat_codes[0], None)
 
     # Debug: warn if mapping is incomplete
-    missing_in_mapping = [code for code in selected_cat_codes if code not in tech_subsector_to_group]
+    missing_in_mapping = [code for code in category_mapping[selected_cat] if code not in tech_subsector_to_group]
     if missing_in_mapping:
         st.warning(f"The following selected sector codes are missing from tech_subsector_to_group mapping: {missing_in_mapping}")
 
-    df_codes_missing = set(df_year['Tech_subsector'].unique()) - set(tech_subsector_to_group.keys())
+    # Energy per industry group and carrier for the year, in the display unit
+    grouped, group_order, df_codes_missing = Grouped_Industry_Bar_Data(
+        df, selected_cat, selected_provinces, selected_year, display_unit
+    )
     if df_codes_missing:
         st.warning(f"The following Tech_subsector codes in your data are missing from tech_subsector_to_group: {sorted(df_codes_missing)}")
 
-    # Assign group logic
-    def assign_group(row):
-        if row['Tech_subsector'] in selected_codes:
-            return selected_cat
-        elif selected_cat_group == "Manufacturing":
-            if row['Tech_subsector'] in manufacturing_codes and row['Tech_subsector'] not in selected_codes:
-                return "Manufacturing Other"
-            elif row['Tech_subsector'] in extractive_codes:
-                return "Extractive Industry"
-        elif selected_cat_group == "Extractive Industry":
-            if row['Tech_subsector'] in extractive_codes and row['Tech_subsector'] not in selected_codes:
-                return "Extractive Industry Other"
-            elif row['Tech_subsector'] in manufacturing_codes:
-                return "Manufacturing"
-        return None
-
-    df_year = df_year.copy()
-    df_year['Group'] = df_year.apply(assign_group, axis=1)
-
-    # Only show three mutually exclusive bars
-    if selected_cat_group == "Manufacturing":
-        keep_groups = [selected_cat, "Manufacturing Other", "Extractive Industry"]
-        group_order = [selected_cat, "Manufacturing Other", "Extractive Industry"]
-    elif selected_cat_group == "Extractive Industry":
-        keep_groups = [selected_cat, "Manufacturing", "Extractive Industry Other"]
-        group_order = [selected_cat, "Manufacturing", "Extractive Industry Other"]
-    else:
-        # fallback: treat as manufacturing
-        keep_groups = [selected_cat, "Manufacturing Other", "Extractive Industry"]
-        group_order = [selected_cat, "Manufacturing Other", "Extractive Industry"]
-    df_year = df_year[df_year['Group'].isin(keep_groups)]
-
-    grouped = (
-        df_year
-        .groupby(['Group', 'Carrier'])['Energy_display']
-        .sum()
-        .reset_index()
-    )
-
     # Set the carrier order for the chart
     if 'stack_order' in globals():
         this_carrier_order = stack_order
     else:
-        this_carrier_order = sorted(df['Carrier'].dropna().unique())
+        this_carrier_order = cube.members('Carrier')
+    # Every carrier of the scenario, offered in the trace color pickers
+    all_carriers = cube.members('Carrier')
+
+    # Display options, chart and table rerun on their own when only a display option changes
+    Grouped_Industry_Bar_Chart(grouped, scenario, selected_year, display_unit, group_order, this_carrier_order, all_carriers)
+
+    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download grouped industry data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_grouped_industry_{selected_year}_{display_unit}.csv",
+        mime="text/csv"
+    )
+
+
+@st.fragment
+def Grouped_Industry_Bar_Chart(grouped, scenario, selected_year, display_unit, group_order, this_carrier_order, all_carriers):
+    # Presentation half of the page: styles the aggregate computed by Grouped_Industry_Bar.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
 
     # Chart display options
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         show_legend = st.checkbox("Show legend", value=True)
         label_font_size = st.slider("Label font size", min_value=8, max_value=28, value=16)
         label_mode = st.radio(
@@ -153,15 +119,15 @@ def Grouped_Industry_Bar():
         show_data_table = st.checkbox("Show table of chart values below", value=False)
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
         carrier_color_map = {}
+        # Stable default color of every carrier
+        default_map = color_map('Carrier', all_carriers)
         if show_trace_colors:
-            carriers = sorted(df['Carrier'].dropna().unique())
+            carriers = sorted(all_carriers)
             for label in carriers:
-                col = carrier_colors.get(label, "#CCCCCC")
-                picked = st.color_picker(f"Trace color for {label}", col, key=f"grouped_ind_bar_color_{label}")
+                picked = st.color_picker(f"Trace color for {label}", default_map[label], key=f"grouped_ind_bar_color_{label}")
                 carrier_color_map[label] = picked
         else:
-            for label in df['Carrier'].dropna().unique():
-                carrier_color_map[label] = carrier_colors.get(label, "#CCCCCC")
+            carrier_color_map = default_map
         show_label_text_colors = st.checkbox("Select label text colors (black or white)", value=False)
         label_text_colors = {}
         if show_label_text_colors:
@@ -178,17 +144,130 @@ def Grouped_Industry_Bar():
             for group in group_order:
                 label_text_colors[group] = "white"
 
-    y_label = f"Energy demand ({display_unit}/yr)"
-    fig = px.bar(
-        grouped,
-        x='Group',
-        y='Energy_display',
-        color='Carrier',
-        labels={'Energy_display': y_label, 'Group': 'Industry Group', 'Carrier': 'Carrier'},
-        title=f"{scenario} Industry Demand by Group ({selected_year})",
-        color_discrete_map=carrier_color_map,
-        category_orders={'Group': group_order, 'Carrier': this_carrier_order}
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        scenario=scenario, selected_year=selected_year, display_unit=display_unit, group_order=group_order,
+        this_carrier_order=this_carrier_order, carrier_color_map=carrier_color_map,
+        label_text_colors=label_text_colors, show_legend=show_legend, label_font_size=label_font_size,
+        label_mode=label_mode, show_label_for=show_label_for, tick_label_font_size=tick_label_font_size,
     )
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("Grouped_Industry_Bar", grouped, **options)
+    fig = figure_cache.get(fig_key)
+    if fig is None:
+        fig = Grouped_Industry_Bar_Figure(grouped, **options)
+        figure_cache.put(fig_key, fig)
+
+    with stage("serialize"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    if show_data_table:
+        st.subheader("Underlying values for chart")
+        st.dataframe(grouped.pivot(index='Carrier', columns='Group', values='Energy_display').reset_index())
+
+
+@profiled("data")
+def Grouped_Industry_Bar_Data(df, category="Cement", provinces=("All Canada",), year=None, display_unit=None):
+    """
+    Energy per industry group and carrier for one year, in display_unit (the
+    data unit when None). The groups are the selected industry category and
+    the rest of manufacturing and extractive industry, without overlap.
+    "All Canada" among the provinces drops the province filter, so pass the
+    national rollup frame (Dataset.national) for national totals.
+
+    Returns the aggregate, the order of its groups and the Tech_subsector
+    codes of the selection that have no group in tech_subsector_to_group.
+    """
+    energy_col = next(c for c in df.columns if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+    if year is None:
+        year = sorted(pd.to_numeric(df['Year'], errors='coerce').dropna().unique())[0]
+
+    # Industry group and category of every catalog sub-sector, by member key
+    subsectors = CATALOG["subsector"]
+    members = np.arange(len(subsectors))
+    member_industry_group = subsectors.take(members, "industry_group")
+    member_category = subsectors.take(members, "category")
+
+    # Filter year and province (a Dataset.year_view already holds one year only)
+    with stage("filter"):
+        if "All Canada" in provinces:
+            df_year = df[df['Year'] == year]
+        else:
+            df_year = df[(df['Year'] == year) & (df['Province'].isin(provinces))]
+
+    # Determine if the selected sector is manufacturing or extractive using the catalog
+    selected_cat_group = CATALOG["category"].lookup([category], "industry_group")[0]
+
+    # Member key -> group; the selected category overrides its parent group
+    member_group = np.full(len(subsectors), np.nan, dtype=object)
+    if selected_cat_group == "Manufacturing":
+        member_group[member_industry_group == "Manufacturing"] = "Manufacturing Other"
+        member_group[member_industry_group == "Extractive Industry"] = "Extractive Industry"
+    elif selected_cat_group == "Extractive Industry":
+        member_group[member_industry_group == "Extractive Industry"] = "Extractive Industry Other"
+        member_group[member_industry_group == "Manufacturing"] = "Manufacturing"
+    member_group[member_category == category] = category
+
+    # Sub-sector keys resolved once per distinct code, then one take per column
+    keys = subsectors.keys(df_year['Tech_subsector'])
+    has_group = ~pd.isna(np.append(member_industry_group, np.nan)[keys])
+
+    # Codes of the selection that have no group
+    df_codes_missing = set(df_year['Tech_subsector'][~has_group].dropna().unique())
+
+    df_year = df_year.assign(Group=np.append(member_group, np.nan)[keys])
+
+    # Only show three mutually exclusive bars
+    if selected_cat_group == "Manufacturing":
+        keep_groups = [category, "Manufacturing Other", "Extractive Industry"]
+        group_order = [category, "Manufacturing Other", "Extractive Industry"]
+    elif selected_cat_group == "Extractive Industry":
+        keep_groups = [category, "Manufacturing", "Extractive Industry Other"]
+        group_order = [category, "Manufacturing", "Extractive Industry Other"]
+    else:
+        # fallback: treat as manufacturing
+        keep_groups = [category, "Manufacturing Other", "Extractive Industry"]
+        group_order = [category, "Manufacturing Other", "Extractive Industry"]
+    df_year = df_year[df_year['Group'].isin(keep_groups)]
+
+    with stage("groupby"):
+        grouped = (
+            df_year
+            .groupby(['Group', 'Carrier'], observed=True)[energy_col]
+            .sum()
+            .reset_index(name='Energy_display')
+        )
+    to_display_unit(grouped, 'Energy_display', base_unit, display_unit or base_unit)
+    return grouped, group_order, df_codes_missing
+
+
+@profiled("figure")
+def Grouped_Industry_Bar_Figure(grouped, scenario, selected_year, display_unit="PJ", group_order=(),
+                                this_carrier_order=stack_order, carrier_color_map=None, label_text_colors=None,
+                                show_legend=True, label_font_size=16, label_mode="Auto", show_label_for=(),
+                                tick_label_font_size=24):
+    """
+    Stacked bar chart of a Grouped_Industry_Bar_Data aggregate, one bar per
+    industry group in group_order. Option defaults match the page's display
+    options.
+    """
+    if carrier_color_map is None:
+        carrier_color_map = color_map('Carrier', grouped['Carrier'].unique())
+    label_text_colors = label_text_colors or {}
+
+    y_label = f"Energy demand ({display_unit}/yr)"
+    with stage("px"):
+        fig = px.bar(
+            grouped,
+            x='Group',
+            y='Energy_display',
+            color='Carrier',
+            labels={'Energy_display': y_label, 'Group': 'Industry Group', 'Carrier': 'Carrier'},
+            title=f"{scenario} Industry Demand by Group ({selected_year})",
+            color_discrete_map=carrier_color_map,
+            category_orders={'Group': group_order, 'Carrier': this_carrier_order}
+        )
     fig.update_layout(
         height=900,
         showlegend=show_legend,
@@ -225,59 +304,47 @@ def Grouped_Industry_Bar():
         title_font=dict(size=tick_label_font_size)
     )
 
-    # Label logic
-    auto_show = label_mode == "Auto"
-    manual_show = label_mode == "Manual"
-    bar_threshold = 0.05  # Only label if bar is >=5% of group stack
-    from collections import defaultdict
-    stack_heights = defaultdict(float)
-    for t in fig.data:
-        for x_val, y_val in zip(t.x, t.y):
-            stack_heights[str(x_val)] += y_val
-    for trace in fig.data:
-        positions = []
-        texts = []
-        for x_val, y_val in zip(trace.x, trace.y):
-            stack = stack_heights[str(x_val)]
-            rel = y_val / stack if stack > 0 else 0
-            group = x_val
-            # PATCH: Label logic now checks carrier name against show_label_for
-            is_label = (
-                (auto_show and group in group_order and rel >= bar_threshold)
-                or (manual_show and trace.name in show_label_for)
-            )
-            if is_label:
-                if y_val < 1:
-                    positions.append("outside")
+    with stage("labels"):
+        # Label logic
+        auto_show = label_mode == "Auto"
+        manual_show = label_mode == "Manual"
+        bar_threshold = 0.05  # Only label if bar is >=5% of group stack
+        from collections import defaultdict
+        stack_heights = defaultdict(float)
+        for t in fig.data:
+            for x_val, y_val in zip(t.x, t.y):
+                stack_heights[str(x_val)] += y_val
+        for trace in fig.data:
+            positions = []
+            texts = []
+            for x_val, y_val in zip(trace.x, trace.y):
+                stack = stack_heights[str(x_val)]
+                rel = y_val / stack if stack > 0 else 0
+                group = x_val
+                # PATCH: Label logic now checks carrier name against show_label_for
+                is_label = (
+                    (auto_show and group in group_order and rel >= bar_threshold)
+                    or (manual_show and trace.name in show_label_for)
+                )
+                if is_label:
+                    if y_val < 1:
+                        positions.append("outside")
+                    else:
+                        positions.append("inside" if rel >= 0.10 else "outside")
+                    texts.append(trace.name)
                 else:
-                    positions.append("inside" if rel >= 0.10 else "outside")
-                texts.append(trace.name)
-            else:
-                positions.append("none")
-                texts.append(" ")
-        trace.textposition = positions
-        trace.text = texts
-        trace.texttemplate = "%{text} %{y:.0f} (" + display_unit + "/yr)"
-        trace.insidetextanchor = "middle"
-        group_name = trace.x[0] if hasattr(trace, "x") and len(trace.x) > 0 else trace.name
-        trace.textfont = dict(size=label_font_size, color=label_text_colors.get(group_name, "white"))
-        trace.width = 0.54
-        trace.hovertemplate = (
-            "Group: %{x}<br>"
-            f"{y_label}: "+"%{y:.3f}<br>"
-            "Carrier: %{legendgroup}<extra></extra>"
-        )
-
-    st.plotly_chart(fig, use_container_width=True)
-
-    if show_data_table:
-        st.subheader("Underlying values for chart")
-        st.dataframe(grouped.pivot(index='Carrier', columns='Group', values='Energy_display').reset_index())
-
-    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download grouped industry data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_grouped_industry_{selected_year}_{display_unit}.csv",
-        mime="text/csv"
-    )
\ No newline at end of file
+                    positions.append("none")
+                    texts.append(" ")
+            trace.textposition = positions
+            trace.text = texts
+            trace.texttemplate = "%{text} %{y:.0f} (" + display_unit + "/yr)"
+            trace.insidetextanchor = "middle"
+            group_name = trace.x[0] if hasattr(trace, "x") and len(trace.x) > 0 else trace.name
+            trace.textfont = dict(size=label_font_size, color=label_text_colors.get(group_name, "white"))
+            trace.width = 0.54
+            trace.hovertemplate = (
+                "Group: %{x}<br>"
+                f"{y_label}: "+"%{y:.3f}<br>"
+                "Carrier: %{legendgroup}<extra></extra>"
+            )
+    return fig
@@ -4,15 +4,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from collections import defaultdict
 from nzest_constants import (
     sector_activity_dict,
     carrier_dict,
-    carrier_colors,
-    sector_activity_colors,
-    carrier_tech_colors,
     group_colors,
     stack_order,
     category_mapping,
@@ -20,7 +20,11 @@ from nzest_constants import (
     fossil_carriers,
     group_order,
 )
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
+# Carriers counted by the decarbonisation indicator on the industry chart
+INDUSTRY_FOSSIL_CARRIERS = ["Coal", "HFO", "LFO",
+                            "Diesel", "R-Diesel", "Gasoline", "Jet Fuel",
+                            "Prop", "NG", "Plastics"]
+
 
 def Industry_Sector_Bar():
     st.markdown(
@@ -35,48 +39,25 @@ def Industry_Sector_Bar():
 
     # Scenario toggle (no uploader)
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
-    fallback = os.path.join(base_dir, 'SQ_Post_Process.csv') if scenario == 'Status-Quo' else os.path.join(base_dir, 'NZ_Post_Process.csv')
-    if os.path.exists(fallback):
-        df = load_csv(fallback)
-    else:
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-    # Filter out placeholder sector "-" for Net-Zero
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    cube = dataset.cube
 
     # Identify energy column and base unit
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
     # Sidebar filters
     st.sidebar.header("Filters")
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
-    years = sorted(pd.to_numeric(df['Year'], errors='coerce').dropna().unique())
+    years = cube.members('Year')
     selected_year = st.sidebar.selectbox("Select Year", years)
     display_unit = st.sidebar.selectbox("Display unit", ["GJ","TJ","PJ"], index=["GJ","TJ","PJ"].index(base_unit))
 
-    # Convert to GJ and apply factor
-    df['Energy_GJ'] = df[energy_col] * ({'GJ':1,'PJ':1e6}[base_unit])
-    factor = {'GJ':1,'TJ':1e-3,'PJ':1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
-
-    # Filter to Industry sector, with "All Canada" option
-    if "All Canada" in selected_provinces:
-        # Ignore province filter, aggregate across all provinces
-        df_ind = df[
-            (df['Sector'] == "Industry") &
-            (df['Year'] == selected_year)
-        ]
-    else:
-        df_ind = df[
-            (df['Sector'] == "Industry") &
-            df['Province'].isin(selected_provinces) &
-            (df['Year'] == selected_year)
-        ]
-
     # Sidebar: select one high-level industry category
     category_options = list(category_mapping.keys())
     selected_categories = st.sidebar.multiselect(
@@ -84,29 +65,31 @@ def Industry_Sector_Bar():
         default=[category_options[0]],
         max_selections=len(category_options)
     )
-    # Filter to the selected categories using category_mapping
-    # Flatten codes from all selected categories
-    selected_codes = [code for cat in selected_categories for code in category_mapping[cat]]
-    # Map codes to descriptive subsector names
-    selected_subsectors = [sector_activity_dict[code] for code in selected_codes]
-    df_ind = df_ind[df_ind['Tech_subsector'].isin(selected_subsectors)]
+    # Energy per industry sub-sector and carrier for the year, in the display unit
+    grouped_ind = Industry_Sector_Bar_Data(cube, selected_categories, selected_provinces, selected_year, display_unit)
 
-    # Group only by Tech_subsector and Carrier (remove Industry_group)
-    grouped_ind = df_ind.groupby(['Tech_subsector','Carrier'])['Energy_display'].sum().reset_index()
-    # Filter out small contributions (<5% of total category energy)
-    total_energy = grouped_ind['Energy_display'].sum()
-    grouped_ind = grouped_ind[grouped_ind['Energy_display'] >= 0.001 * total_energy]
+    # Display options and chart rerun on their own when only a display option changes
+    Industry_Sector_Bar_Chart(grouped_ind, selected_categories, selected_year, display_unit)
 
-    # Render the chart for the chosen high-level category
-    y_label = f"Energy demand ({display_unit}/yr)"
-    fossil_carriers = ["Coal", "HFO", "LFO",
-                       "Diesel", "R-Diesel", "Gasoline", "Jet Fuel",
-                       "Prop", "NG", "Plastics"]
+    # Download chart data
+    csv_bytes = grouped_ind.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download industry data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_industry_{selected_year}_{display_unit}.csv",
+        mime="text/csv"
+    )
+
+
+@st.fragment
+def Industry_Sector_Bar_Chart(grouped_ind, selected_categories, selected_year, display_unit):
+    # Presentation half of the page: styles the aggregate computed by Industry_Sector_Bar.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
 
     df_grp = grouped_ind.copy()
 
     # Chart display options in a single expander (moved after df_grp definition)
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         show_labels = st.checkbox("Show area/bar labels on chart", value=True)
         show_legend = st.checkbox("Show legend", value=False)
         show_decarb = st.checkbox("Show decarbonisation indicator", value=True)
@@ -128,23 +111,18 @@ def Industry_Sector_Bar():
         tick_label_font_size = st.slider("Axis tick label font size", min_value=16, max_value=34, value=24)
 
         # --- BEGIN: Per-label color logic for Industry_Sector_Bar ---
-        import random
-        def random_hex():
-            return "#{:06x}".format(random.randint(0, 0xFFFFFF))
-
         # --- Trace (fill) colors toggle ---
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
         label_colors = {}
-        default_map = carrier_colors
+        # Stable default color of every carrier
+        default_map = color_map('Carrier', label_options)
         if show_trace_colors:
             st.markdown("**Pick a color for each label's area/trace:**")
             for label in label_options:
-                col = default_map.get(label, random_hex())
-                picked = st.color_picker(f"Trace color for {label}", col, key=f"ind_bar_color_{label}")
+                picked = st.color_picker(f"Trace color for {label}", default_map[label], key=f"ind_bar_color_{label}")
                 label_colors[label] = picked
         else:
-            for label in label_options:
-                label_colors[label] = default_map.get(label, random_hex())
+            label_colors = default_map
 
         # --- Label text colors toggle ---
         show_label_text_colors = st.checkbox("Select label text colors (black or white)", value=False)
@@ -167,65 +145,139 @@ def Industry_Sector_Bar():
     # Display combined header for multiple categories
     categories_label = ", ".join(selected_categories)
     st.subheader(f"{categories_label} — {selected_year}")
-    fig = px.bar(
-        df_grp,
-        x='Tech_subsector',
-        y='Energy_display',
-        color='Carrier',
-        text='Carrier',
-        labels={
-            'Energy_display': y_label,
-            'Tech_subsector': 'Sub-sector',
-            'Carrier': 'Carrier'
-        },
-        title=f"{categories_label} ({selected_year})",
-        color_discrete_map=label_colors,
-        category_orders={
-            'Tech_subsector': sorted(df_grp['Tech_subsector'].unique()),
-            'Carrier': stack_order
-        }
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        categories_label=categories_label, selected_year=selected_year, display_unit=display_unit,
+        label_colors=label_colors, label_text_colors=label_text_colors, show_labels=show_labels,
+        show_legend=show_legend, show_decarb=show_decarb, label_font_size=label_font_size,
+        label_mode=label_mode, show_label_for=show_label_for, tick_label_font_size=tick_label_font_size,
     )
-    # Compute stack heights for each x (subsector)
-    stack_heights = defaultdict(float)
-    for t in fig.data:
-        for x, y in zip(t.x, t.y):
-            stack_heights[str(x)] += y
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("Industry_Sector_Bar", df_grp, **options)
+    fig = figure_cache.get(fig_key)
+    if fig is None:
+        fig = Industry_Sector_Bar_Figure(df_grp, **options)
+        figure_cache.put(fig_key, fig)
 
-    auto_show = label_mode == "Auto"
-    manual_show = label_mode == "Manual"
-    threshold = 0.05  # 10% of stack height
+    with stage("serialize"):
+        st.plotly_chart(fig, use_container_width=True)
 
-    for trace in fig.data:
-        positions = []
-        texts = []
-        for x, y, t in zip(trace.x, trace.y, trace.text):
-            stack = stack_heights[str(x)]
-            rel = y / stack if stack > 0 else 0
-            label_name = t if isinstance(t, str) else trace.name
-            show = (
-                (auto_show and rel >= threshold)
-                or (manual_show and label_name in show_label_for)
-            )
-            if show:
-                # If under 1 PJ/yr, always put label "outside"
-                if y < 1:
-                    positions.append("outside")
-                else:
-                    positions.append("inside" if rel >= threshold else "outside")
-                texts.append(label_name)
-            else:
-                positions.append("none")
-                texts.append(" ")  # keep hover active with a space
-        trace.textposition = positions
-        trace.text = texts
-        trace.texttemplate = "%{text} %{y:.1f} (" + display_unit + "/yr)"
-        trace.insidetextanchor = "middle"
-        trace.textfont = dict(size=label_font_size, color=label_text_colors.get(trace.name, "white"))
-        trace.hovertemplate = (
-            "Sub-sector: %{x}<br>"
-            f"{y_label}: "+"%{y:.1f}<br>"
-            f"Carrier: {trace.name}<extra></extra>"
+
+@profiled("data")
+def Industry_Sector_Bar_Data(cube, categories=None, provinces=("All Canada",), year=None, display_unit=None):
+    """
+    Industry energy per sub-sector and carrier of the given industry categories
+    (the first one when None) for one year, in display_unit, with contributions
+    under 0.1% of the total dropped.
+    """
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+    categories = categories or [next(iter(category_mapping))]
+
+    # Filter to the selected categories using category_mapping
+    # Flatten codes from all selected categories
+    selected_codes = [code for cat in categories for code in category_mapping[cat]]
+    # Map codes to descriptive subsector names
+    selected_subsectors = [sector_activity_dict[code] for code in selected_codes]
+
+    # Filter to Industry sector and selected subsectors, with "All Canada" option
+    where = {'Sector': ["Industry"], 'Tech_subsector': selected_subsectors}
+    if year is None:
+        year = cube.members('Year')[0]
+    if "All Canada" in provinces:
+        # Precomputed national totals instead of a sum over the provinces
+        cube = cube.national
+    else:
+        where['Province'] = list(provinces)
+
+    # Group only by Tech_subsector and Carrier (remove Industry_group)
+    grouped_ind = cube.query(
+        energy_col, ['Tech_subsector', 'Carrier'], where=where,
+        years=[year], name='Energy_display'
+    )
+
+    # Convert the aggregated energy to the display unit
+    to_display_unit(grouped_ind, 'Energy_display', base_unit, display_unit or base_unit)
+    # Filter out small contributions (<5% of total category energy)
+    total_energy = grouped_ind['Energy_display'].sum()
+    grouped_ind = grouped_ind[grouped_ind['Energy_display'] >= 0.001 * total_energy]
+    return grouped_ind
+
+
+@profiled("figure")
+def Industry_Sector_Bar_Figure(df_grp, categories_label, selected_year, display_unit="PJ", label_colors=None,
+                               label_text_colors=None, show_labels=True, show_legend=False, show_decarb=True,
+                               label_font_size=16, label_mode="Auto", show_label_for=(), tick_label_font_size=24):
+    """
+    Stacked bar chart of an Industry_Sector_Bar_Data aggregate, one bar per
+    industry sub-sector. Option defaults match the page's display options.
+    """
+    y_label = f"Energy demand ({display_unit}/yr)"
+    if label_colors is None:
+        label_colors = color_map('Carrier', df_grp['Carrier'].unique())
+    label_text_colors = label_text_colors or {}
+
+    with stage("px"):
+        fig = px.bar(
+            df_grp,
+            x='Tech_subsector',
+            y='Energy_display',
+            color='Carrier',
+            text='Carrier',
+            labels={
+                'Energy_display': y_label,
+                'Tech_subsector': 'Sub-sector',
+                'Carrier': 'Carrier'
+            },
+            title=f"{categories_label} ({selected_year})",
+            color_discrete_map=label_colors,
+            category_orders={
+                'Tech_subsector': sorted(df_grp['Tech_subsector'].unique()),
+                'Carrier': stack_order
+            }
         )
+    with stage("labels"):
+        # Compute stack heights for each x (subsector)
+        stack_heights = defaultdict(float)
+        for t in fig.data:
+            for x, y in zip(t.x, t.y):
+                stack_heights[str(x)] += y
+
+        auto_show = label_mode == "Auto"
+        manual_show = label_mode == "Manual"
+        threshold = 0.05  # 10% of stack height
+
+        for trace in fig.data:
+            positions = []
+            texts = []
+            for x, y, t in zip(trace.x, trace.y, trace.text):
+                stack = stack_heights[str(x)]
+                rel = y / stack if stack > 0 else 0
+                label_name = t if isinstance(t, str) else trace.name
+                show = (
+                    (auto_show and rel >= threshold)
+                    or (manual_show and label_name in show_label_for)
+                )
+                if show:
+                    # If under 1 PJ/yr, always put label "outside"
+                    if y < 1:
+                        positions.append("outside")
+                    else:
+                        positions.append("inside" if rel >= threshold else "outside")
+                    texts.append(label_name)
+                else:
+                    positions.append("none")
+                    texts.append(" ")  # keep hover active with a space
+            trace.textposition = positions
+            trace.text = texts
+            trace.texttemplate = "%{text} %{y:.1f} (" + display_unit + "/yr)"
+            trace.insidetextanchor = "middle"
+            trace.textfont = dict(size=label_font_size, color=label_text_colors.get(trace.name, "white"))
+            trace.hovertemplate = (
+                "Sub-sector: %{x}<br>"
+                f"{y_label}: "+"%{y:.1f}<br>"
+                f"Carrier: {trace.name}<extra></extra>"
+            )
     # Hide bar labels if show_labels is False
     if not show_labels:
         fig.update_traces(text="", textposition="none")
@@ -264,8 +316,8 @@ def Industry_Sector_Bar():
         title_font=dict(size=tick_label_font_size)
     )
     if show_decarb:
-        decarb_grp = df_grp[df_grp['Carrier'].isin(fossil_carriers)] \
-                    .groupby('Tech_subsector')['Energy_display'].sum().reset_index()
+        decarb_grp = df_grp[df_grp['Carrier'].isin(INDUSTRY_FOSSIL_CARRIERS)] \
+                    .groupby('Tech_subsector', observed=True)['Energy_display'].sum().reset_index()
         fig.add_trace(go.Scatter(
             x=decarb_grp['Tech_subsector'],
             y=decarb_grp['Energy_display'],
@@ -276,16 +328,4 @@ def Industry_Sector_Bar():
             marker=dict(symbol='triangle-down', size=20, color='black'),
             showlegend=False
         ))
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Download chart data
-    csv_bytes = grouped_ind.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download industry data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_industry_{selected_year}_{display_unit}.csv",
-        mime="text/csv"
-    )
-
-
-
+    return fig
@@ -4,15 +4,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
 from collections import defaultdict
 from nzest_constants import (
     sector_activity_dict,
     carrier_dict,
-    carrier_colors,
-    sector_activity_colors,
-    carrier_tech_colors,
     group_colors,
     stack_order,
     category_mapping,
@@ -20,8 +20,6 @@ from nzest_constants import (
     fossil_carriers,
     group_order,
 )
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
-
 
 
 def Multi_Sector_Bar():
@@ -37,57 +35,53 @@ def Multi_Sector_Bar():
 
     # Scenario toggle (no uploader)
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
-    fallback = os.path.join(base_dir, 'SQ_Post_Process.csv') if scenario == 'Status-Quo' else os.path.join(base_dir, 'NZ_Post_Process.csv')
-    if os.path.exists(fallback):
-        df = load_csv(fallback)
-    else:
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-    # Filter out placeholder sector "-" for Net-Zero
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    cube = dataset.cube
 
     # Identify energy column and base unit
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
     # Sidebar filters
     st.sidebar.header("Filters")
-    sectors = sorted(df['Sector'].dropna().unique())
+    sectors = cube.members('Sector')
     selected_sectors = st.sidebar.multiselect(
         "Select up to 3 Sectors", sectors, default=sectors[:2], max_selections=3
     )
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
-    years = sorted(pd.to_numeric(df['Year'], errors='coerce').dropna().unique())
+    years = cube.members('Year')
     selected_year = st.sidebar.selectbox("Select Year", years)
 
     display_unit = st.sidebar.selectbox("Display unit", ["GJ","TJ","PJ"], index=["GJ","TJ","PJ"].index(base_unit))
 
-    # Convert to GJ and apply factor
-    df['Energy_GJ'] = df[energy_col] * ({'GJ':1,'PJ':1e6}[base_unit])
-    factor = {'GJ':1,'TJ':1e-3,'PJ':1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
+    # Energy per sector, sub-sector and carrier for the year, in the display unit
+    grouped = Multi_Sector_Bar_Data(cube, selected_sectors, selected_provinces, selected_year, display_unit)
 
-    # Filter & group by sector, sub-sector and carrier, with "All Canada" optiongroup_colors
+    # Display options and charts rerun on their own when only a display option changes
+    Multi_Sector_Bar_Chart(grouped, selected_sectors, selected_year, display_unit)
 
-    if "All Canada" in selected_provinces:
-        # Ignore province filter, aggregate across all provinces
-        df_filtered = df[
-            df['Sector'].isin(selected_sectors) &
-            (df['Year'] == selected_year)
-        ]
-    else:
-        df_filtered = df[
-            df['Sector'].isin(selected_sectors) &
-            df['Province'].isin(selected_provinces) &
-            (df['Year'] == selected_year)
-        ]
-    grouped = df_filtered.groupby(['Sector', 'Tech_subsector', 'Carrier'])['Energy_display'].sum().reset_index()
+    # Download chart data
+    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download chart data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_multi_sector_{selected_year}_{display_unit}.csv",
+        mime="text/csv"
+    )
+
+
+@st.fragment
+def Multi_Sector_Bar_Chart(grouped, selected_sectors, selected_year, display_unit):
+    # Presentation half of the page: styles the aggregate computed by Multi_Sector_Bar.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
 
     # Chart display options in a single expander
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         show_labels = st.checkbox("Show area/bar labels on chart", value=True)
         show_legend = st.checkbox("Show legend", value=False)
         show_decarb = st.checkbox("Show decarbonisation indicator", value=True)
@@ -101,28 +95,24 @@ def Multi_Sector_Bar():
         tick_label_font_size = st.slider("Axis tick label font size", min_value=16, max_value=34, value=24)
 
         # --- BEGIN: Per-trace color and text color logic for Multi_Sector_Bar ---
-        import random
-        def random_hex():
-            return "#{:06x}".format(random.randint(0, 0xFFFFFF))
-
         # --- Trace (fill) colors toggle ---
         show_trace_colors = st.checkbox("Select trace (fill) colors", value=False)
         trace_label_colors = {}
-        default_map = carrier_colors
+        # Stable default color of every carrier of the charted sectors
+        default_map = color_map('Carrier', grouped['Carrier'].unique())
         if show_trace_colors:
             st.markdown("**Pick a color for each label's area/trace:**")
             for s in selected_sectors[:2]:
                 # Each chart has its own label set
                 label_options = sorted(grouped[grouped['Sector'] == s]['Carrier'].unique())
                 for label in label_options:
-                    col = default_map.get(label, random_hex())
-                    picked = st.color_picker(f"{s}: Trace color for {label}", col, key=f"multi_bar_color_{s}_{label}")
+                    picked = st.color_picker(f"{s}: Trace color for {label}", default_map[label], key=f"multi_bar_color_{s}_{label}")
                     trace_label_colors[(s, label)] = picked
         else:
             for s in selected_sectors[:2]:
                 label_options = sorted(grouped[grouped['Sector'] == s]['Carrier'].unique())
                 for label in label_options:
-                    trace_label_colors[(s, label)] = default_map.get(label, random_hex())
+                    trace_label_colors[(s, label)] = default_map[label]
 
         # --- Label text colors toggle ---
         show_label_text_colors = st.checkbox("Select label text colors (black or white)", value=False)
@@ -148,7 +138,6 @@ def Multi_Sector_Bar():
 
     # Create two columns for side-by-side charts
     cols = st.columns(2)
-    y_label = f"Energy demand ({display_unit}/yr)"
 
     for idx, sec in enumerate(selected_sectors[:2]):
         df_sec = grouped[grouped['Sector'] == sec]
@@ -164,115 +153,170 @@ def Multi_Sector_Bar():
             show_label_for = label_options
         with cols[idx]:
             st.subheader(f"{sec} Sector — {selected_year}")
-            fig = px.bar(
-                df_sec,
-                x='Tech_subsector',
-                y='Energy_display',
-                color='Carrier',
-                text='Carrier',
-                labels={
-                    'Energy_display': y_label,
-                    'Tech_subsector': 'Sub-sector',
-                    'Carrier': 'Carrier'
-                },
-                title=f"{sec} Sector ({selected_year})",
-                color_discrete_map={label: trace_label_colors[(sec, label)] for label in label_options},
-                category_orders={
-                    'Tech_subsector': sorted(df_sec['Tech_subsector'].unique()),
-                    'Carrier': stack_order
-                }
+            # Reuse the figure built for an identical view (same data and display options)
+            options = dict(
+                sec=sec, selected_year=selected_year, display_unit=display_unit,
+                label_colors={label: trace_label_colors[(sec, label)] for label in label_options},
+                label_text_colors={label: text_label_colors.get((sec, label), "white") for label in label_options},
+                show_labels=show_labels, show_legend=show_legend, show_decarb=show_decarb,
+                label_font_size=label_font_size, label_mode=label_mode, show_label_for=show_label_for,
+                tick_label_font_size=tick_label_font_size,
             )
-            # Compute stack heights per x for this sector's chart
-            x_vals = [str(x) for x in df_sec['Tech_subsector']]
-            stack_heights = {str(x): 0 for x in x_vals}
-            for t in fig.data:
-                for x, y in zip(t.x, t.y):
-                    stack_heights[str(x)] += y
-            auto_show = label_mode == "Auto"
-            manual_show = label_mode == "Manual"
-            for trace in fig.data:
-                positions = []
-                texts = []
-                for x, y, t_ in zip(trace.x, trace.y, trace.text):
-                    stack = stack_heights[str(x)]
-                    rel = y / stack if stack > 0 else 0
-                    label_name = t_ if isinstance(t_, str) else trace.name
-                    show = (
-                        (auto_show and rel >= 0.1)
-                        or (manual_show and label_name in show_label_for)
-                    )
-                    if show:
-                        positions.append("inside" if rel >= 0.1 else "outside")
-                        texts.append(label_name)
-                    else:
-                        positions.append("none")
-                        texts.append(" ")  # keep hover active with a space
-                trace.textposition = positions
-                trace.text = texts
-                trace.texttemplate = "%{text} %{y:.0f} (" + display_unit + "/yr)"
-                trace.insidetextanchor = "middle"
-                trace.textfont = dict(size=label_font_size, color=text_label_colors.get((sec, trace.name), "white"))
-                trace.hovertemplate = (
-                    "Sub-sector: %{x}<br>"
-                    f"{y_label}: "+"%{y:.1f}<br>"
-                    f"Carrier: {trace.name}<extra></extra>"
+            figure_cache = get_figure_cache()
+            fig_key = figure_key("Multi_Sector_Bar", df_sec, **options)
+            fig = figure_cache.get(fig_key)
+            if fig is None:
+                fig = Multi_Sector_Bar_Figure(df_sec, **options)
+                figure_cache.put(fig_key, fig)
+
+            with stage("serialize"):
+                st.plotly_chart(fig, use_container_width=True)
+
+
+@profiled("data")
+def Multi_Sector_Bar_Data(cube, sectors=None, provinces=("All Canada",), year=None, display_unit=None):
+    """
+    Energy per sector, sub-sector and carrier for one year of the scenario
+    cube, in display_unit (the data unit when None). Sectors default to the
+    first two and the year to the first one.
+    """
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+
+    # Filter & group by sector, sub-sector and carrier, with "All Canada" option
+    where = {'Sector': cube.members('Sector')[:2] if sectors is None else sectors}
+    if year is None:
+        year = cube.members('Year')[0]
+    if "All Canada" in provinces:
+        # Precomputed national totals instead of a sum over the provinces
+        cube = cube.national
+    else:
+        where['Province'] = list(provinces)
+    grouped = cube.query(
+        energy_col, ['Sector', 'Tech_subsector', 'Carrier'], where=where,
+        years=[year], name='Energy_display'
+    )
+
+    # Convert the aggregated energy to the display unit
+    to_display_unit(grouped, 'Energy_display', base_unit, display_unit or base_unit)
+    return grouped
+
+
+@profiled("figure")
+def Multi_Sector_Bar_Figure(df_sec, sec, selected_year, display_unit="PJ", label_colors=None,
+                            label_text_colors=None, show_labels=True, show_legend=False, show_decarb=True,
+                            label_font_size=16, label_mode="Auto", show_label_for=(), tick_label_font_size=24):
+    """
+    Stacked bar chart of one sector of a Multi_Sector_Bar_Data aggregate, one
+    bar per sub-sector. Option defaults match the page's display options.
+    """
+    y_label = f"Energy demand ({display_unit}/yr)"
+    if label_colors is None:
+        label_colors = color_map('Carrier', df_sec['Carrier'].unique())
+    label_text_colors = label_text_colors or {}
+
+    with stage("px"):
+        fig = px.bar(
+            df_sec,
+            x='Tech_subsector',
+            y='Energy_display',
+            color='Carrier',
+            text='Carrier',
+            labels={
+                'Energy_display': y_label,
+                'Tech_subsector': 'Sub-sector',
+                'Carrier': 'Carrier'
+            },
+            title=f"{sec} Sector ({selected_year})",
+            color_discrete_map=label_colors,
+            category_orders={
+                'Tech_subsector': sorted(df_sec['Tech_subsector'].unique()),
+                'Carrier': stack_order
+            }
+        )
+    with stage("labels"):
+        # Compute stack heights per x for this sector's chart
+        x_vals = [str(x) for x in df_sec['Tech_subsector']]
+        stack_heights = {str(x): 0 for x in x_vals}
+        for t in fig.data:
+            for x, y in zip(t.x, t.y):
+                stack_heights[str(x)] += y
+        auto_show = label_mode == "Auto"
+        manual_show = label_mode == "Manual"
+        for trace in fig.data:
+            positions = []
+            texts = []
+            for x, y, t_ in zip(trace.x, trace.y, trace.text):
+                stack = stack_heights[str(x)]
+                rel = y / stack if stack > 0 else 0
+                label_name = t_ if isinstance(t_, str) else trace.name
+                show = (
+                    (auto_show and rel >= 0.1)
+                    or (manual_show and label_name in show_label_for)
                 )
-            # Hide bar labels if show_labels is False
-            if not show_labels:
-                fig.update_traces(text="", textposition="none")
-            fig.update_layout(
-                height=500,
-                showlegend=show_legend,
-                margin=dict(r=20),
-                title_font=dict(size=tick_label_font_size)
-            )
-            fig.update_xaxes(
-                tickangle=-45,
-                showline=True,
-                linewidth=2,
-                linecolor='black',
-                ticks='outside',
-                ticklen=10,
-                tickwidth=2,
-                tickcolor='black',
-                tickfont=dict(size=tick_label_font_size),
-                title_font=dict(size=tick_label_font_size)
+                if show:
+                    positions.append("inside" if rel >= 0.1 else "outside")
+                    texts.append(label_name)
+                else:
+                    positions.append("none")
+                    texts.append(" ")  # keep hover active with a space
+            trace.textposition = positions
+            trace.text = texts
+            trace.texttemplate = "%{text} %{y:.0f} (" + display_unit + "/yr)"
+            trace.insidetextanchor = "middle"
+            trace.textfont = dict(size=label_font_size, color=label_text_colors.get(trace.name, "white"))
+            trace.hovertemplate = (
+                "Sub-sector: %{x}<br>"
+                f"{y_label}: "+"%{y:.1f}<br>"
+                f"Carrier: {trace.name}<extra></extra>"
             )
-            fig.update_yaxes(
-                showgrid=True,
-                gridcolor='lightgrey',
-                gridwidth=1,
-                showline=True,
-                linewidth=2,
-                linecolor='black',
-                ticks='outside',
-                ticklen=10,
-                tickwidth=2,
-                tickcolor='black',
-                mirror=True,
-                tickfont=dict(size=tick_label_font_size),
-                title_font=dict(size=tick_label_font_size)
-            )
-            if show_decarb:
-                decarb_sec = df_sec[df_sec['Carrier'].isin(fossil_carriers)] \
-                             .groupby('Tech_subsector')['Energy_display'].sum().reset_index()
-                fig.add_trace(go.Scatter(
-                    x=decarb_sec['Tech_subsector'],
-                    y=decarb_sec['Energy_display'],
-                    mode='markers+text',
-                    text=[f"{val:.1f} ({display_unit}/yr)" for val in decarb_sec['Energy_display']],
-                    textposition="middle right",
-                    textfont=dict(size=12, color="black"),
-                    marker=dict(symbol='triangle-down', size=20, color='black'),
-                    showlegend=False
-                ))
-            st.plotly_chart(fig, use_container_width=True)
-
-    # Download chart data
-    csv_bytes = grouped.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download chart data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_multi_sector_{selected_year}_{display_unit}.csv",
-        mime="text/csv"
-    )
\ No newline at end of file
+    # Hide bar labels if show_labels is False
+    if not show_labels:
+        fig.update_traces(text="", textposition="none")
+    fig.update_layout(
+        height=500,
+        showlegend=show_legend,
+        margin=dict(r=20),
+        title_font=dict(size=tick_label_font_size)
+    )
+    fig.update_xaxes(
+        tickangle=-45,
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        ticks='outside',
+        ticklen=10,
+        tickwidth=2,
+        tickcolor='black',
+        tickfont=dict(size=tick_label_font_size),
+        title_font=dict(size=tick_label_font_size)
+    )
+    fig.update_yaxes(
+        showgrid=True,
+        gridcolor='lightgrey',
+        gridwidth=1,
+        showline=True,
+        linewidth=2,
+        linecolor='black',
+        ticks='outside',
+        ticklen=10,
+        tickwidth=2,
+        tickcolor='black',
+        mirror=True,
+        tickfont=dict(size=tick_label_font_size),
+        title_font=dict(size=tick_label_font_size)
+    )
+    if show_decarb:
+        decarb_sec = df_sec[df_sec['Carrier'].isin(fossil_carriers)] \
+                     .groupby('Tech_subsector', observed=True)['Energy_display'].sum().reset_index()
+        fig.add_trace(go.Scatter(
+            x=decarb_sec['Tech_subsector'],
+            y=decarb_sec['Energy_display'],
+            mode='markers+text',
+            text=[f"{val:.1f} ({display_unit}/yr)" for val in decarb_sec['Energy_display']],
+            textposition="middle right",
+            textfont=dict(size=12, color="black"),
+            marker=dict(symbol='triangle-down', size=20, color='black'),
+            showlegend=False
+        ))
+    return fig
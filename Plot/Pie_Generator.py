@@ -4,15 +4,16 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from load_csv import load_csv
-import os
+from dataset_registry import get_dataset
+from units import energy_unit, to_display_unit
+from figure_cache import figure_key, get_figure_cache
+from profiling import profiled, stage
+from trace_colors import color_map
+import re
 from collections import defaultdict
 from nzest_constants import (
     sector_activity_dict,
     carrier_dict,
-    carrier_colors,
-    sector_activity_colors,
-    carrier_tech_colors,
     group_colors,
     stack_order,
     category_mapping,
@@ -20,7 +21,6 @@ from nzest_constants import (
     fossil_carriers,
     group_order,
 )
-base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "Input")
 
 
 
@@ -42,32 +42,49 @@ def Pie_Generator(Sector, num_rings=3):
 
     # Scenario toggle (no uploader)
     scenario = st.sidebar.radio("Select Scenario", ["Status-Quo", "Net-Zero (beta)"])
-    fallback = os.path.join(base_dir, 'SQ_Post_Process.csv') if scenario == 'Status-Quo' else os.path.join(base_dir, 'NZ_Post_Process.csv')
-    if os.path.exists(fallback):
-        df = load_csv(fallback)
-    else:
+    dataset = get_dataset(scenario)
+    if dataset is None:
         st.error(f"No CSV for {scenario}.")
         st.stop()
-    # Filter out placeholder sector "-" for Net-Zero
-    if scenario.startswith("Net-Zero"):
-        df = df[df['Sector'] != "-"]
+    cube = dataset.cube
 
     # Identify energy column and base unit
-    energy_col = next(c for c in df.columns if c.startswith('Energy'))
-    base_unit = energy_col.split('(')[1].split('/')[0]
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
 
     # Sidebar filters
     st.sidebar.header("Filters")
-    provinces = sorted(df['Province'].dropna().unique())
+    provinces = cube.members('Province')
     provinces_with_all = ["All Canada"] + provinces
     selected_provinces = st.sidebar.multiselect("Select Provinces", provinces_with_all, default=provinces_with_all)
-    years = sorted(pd.to_numeric(df['Year'], errors='coerce').dropna().unique())
+    years = cube.members('Year')
     selected_year = st.sidebar.selectbox("Select Year", years)
 
     display_unit = st.sidebar.selectbox("Display unit", ["GJ","TJ","PJ"], index=["GJ","TJ","PJ"].index(base_unit))
 
+    # Energy per sub-sector, carrier and technology for the year, with slice percentages
+    df_grouped_donut = Pie_Generator_Data(cube, Sector, selected_provinces, selected_year, display_unit)
+
+    # Download button
+    csv_bytes = df_grouped_donut.to_csv(index=False).encode('utf-8')
+    st.sidebar.download_button(
+        "Download chart data as CSV",
+        data=csv_bytes,
+        file_name=f"{scenario}_transport_data_{display_unit}.csv",
+        mime="text/csv"
+    )
+
+    # Display options, chart and table rerun on their own when only a display option changes
+    Pie_Generator_Chart(df_grouped_donut, Sector, num_rings, scenario, display_unit)
+
+
+@st.fragment
+def Pie_Generator_Chart(df_grouped_donut, Sector, num_rings, scenario, display_unit):
+    # Presentation half of the page: styles the aggregate computed by Pie_Generator.
+    # Widgets in here rerun only this fragment, so the data is not filtered or summed again.
+
     # Chart display options in a single expander (controls depend on label_mode)
-    with st.sidebar.expander("Chart display options", expanded=False):
+    with st.expander("Chart display options", expanded=False):
         label_mode = st.radio(
             "Label display mode",
             options=["Auto", "Manual"],
@@ -99,70 +116,124 @@ def Pie_Generator(Sector, num_rings=3):
             )
             show_data_table = st.checkbox("Show table of chart values below", value=False)
 
-    # Convert to GJ and apply factor
-    df['Energy_GJ'] = df[energy_col] * ({'GJ':1,'PJ':1e6}[base_unit])
-    factor = {'GJ':1,'TJ':1e-3,'PJ':1e-6}[display_unit]
-    df['Energy_display'] = df['Energy_GJ'] * factor
-
-    if Sector == "All":
-        if "All Canada" in selected_provinces:
-            # Aggregate across all provinces, ignore province filter
-            df_filtered = df[
-                (df['Year'] == selected_year)
-            ]
-        else:
-            df_filtered = df[
-                df['Province'].isin(selected_provinces) &
-                (df['Year'] == selected_year)
-            ]
+    # Label column of the inner ring and the label options the figure depends on
+    if label_mode == "Auto":
+        sunburst_label_col = 'Tech_subsector'
+        show_data_table = False  # table option not shown in Auto mode
+        label_settings = dict(
+            show_labels=show_labels, show_percent=show_percent, min_pct_to_show_label=min_pct_to_show_label,
+            label_font_size=auto_label_font_size,
+        )
     else:
-        if "All Canada" in selected_provinces:
-            df_filtered = df[
-                (df['Sector'].str.contains(Sector, case=False, na=False)) &
-                (df['Year'] == selected_year)
-            ]
+        def abbreviate_with_ellipsis(label, max_len):
+            return label if len(label) <= max_len else label[:max_len - 1] + "…"
+
+        if adaptive_abbreviate and 'Tech_subsector' in df_grouped_donut.columns:
+            # On a copy: the aggregate is reused as is when the fragment reruns
+            df_grouped_donut = df_grouped_donut.assign(
+                Tech_subsector_display=df_grouped_donut['Tech_subsector'].astype(str).apply(
+                    lambda x: abbreviate_with_ellipsis(x, max_label_length)
+                )
+            )
+            sunburst_label_col = 'Tech_subsector_display'
         else:
-            df_filtered = df[
-                (df['Sector'].str.contains(Sector, case=False, na=False)) &
-                df['Province'].isin(selected_provinces) &
-                (df['Year'] == selected_year)
-            ]
+            sunburst_label_col = 'Tech_subsector'
+        label_settings = dict(
+            show_labels=show_labels, show_percent=show_percent, min_pct_to_show_label=manual_min_pct_to_show_label,
+            label_font_size=label_font_size, label_orientation=label_orientation,
+        )
+
+    # Reuse the figure built for an identical view (same data and display options)
+    options = dict(
+        scenario=scenario, num_rings=num_rings, display_unit=display_unit, label_mode=label_mode,
+        sunburst_label_col=sunburst_label_col, **label_settings,
+    )
+    figure_cache = get_figure_cache()
+    fig_key = figure_key("Pie_Generator", df_grouped_donut, **options)
+    fig_donut = figure_cache.get(fig_key)
+    if fig_donut is None:
+        fig_donut = Pie_Generator_Figure(df_grouped_donut, **options)
+        figure_cache.put(fig_key, fig_donut)
+
+    with stage("serialize"):
+        st.plotly_chart(fig_donut, use_container_width=True)
+
+    if (label_mode == "Manual" and 'show_data_table' in locals() and show_data_table):
+        st.subheader("Underlying values for chart")
+        # Show only relevant columns
+        show_cols = [sunburst_label_col, 'Carrier', 'Tech_name', 'Energy_display']
+        st.dataframe(df_grouped_donut[show_cols])
+
+
+@profiled("data")
+def Pie_Generator_Data(cube, Sector="All", provinces=("All Canada",), year=None, display_unit=None):
+    """
+    Energy per sub-sector, carrier and technology for one year of the sectors
+    matching the Sector pattern ("All" for every sector), in display_unit,
+    with each row's percentage of the total in 'pct'.
+    """
+    energy_col = next(c for c in cube.measures if c.startswith('Energy'))
+    base_unit = energy_unit(energy_col)
+
+    # Filter by sector pattern and year, with "All Canada" option
+    where = {}
+    if Sector != "All":
+        pattern = re.compile(Sector, re.IGNORECASE)
+        where['Sector'] = [s for s in cube.members('Sector') if pattern.search(s)]
+    if year is None:
+        year = cube.members('Year')[0]
+    if "All Canada" in provinces:
+        # Precomputed national totals instead of a sum over the provinces
+        cube = cube.national
+    else:
+        where['Province'] = list(provinces)
 
     # Group for sunburst: aggregate over the selected time range
-    df_grouped_donut = df_filtered.groupby(['Tech_subsector', 'Carrier', 'Tech_name'])['Energy_display'].sum().reset_index()
+    df_grouped_donut = cube.query(
+        energy_col, ['Tech_subsector', 'Carrier', 'Tech_name'], where=where,
+        years=[year], name='Energy_display'
+    )
+
+    # Convert the aggregated energy to the display unit
+    to_display_unit(df_grouped_donut, 'Energy_display', base_unit, display_unit or base_unit)
+
+    # Compute slice percentage (do not filter out small slices)
+    df_grouped_donut['pct'] = df_grouped_donut['Energy_display'] / df_grouped_donut['Energy_display'].sum() * 100
+    return df_grouped_donut
+
 
+@profiled("figure")
+def Pie_Generator_Figure(df_grouped_donut, scenario, num_rings=3, display_unit="PJ", label_mode="Auto",
+                         sunburst_label_col="Tech_subsector", show_labels=True, show_percent=False,
+                         min_pct_to_show_label=3, label_font_size=16, label_orientation="auto"):
+    """
+    Sunburst of a Pie_Generator_Data aggregate with num_rings rings (sub-sector,
+    carrier, technology). Option defaults match the page's Auto display options;
+    label_orientation only applies in Manual mode.
+    """
     # --- Determine color_discrete_map for px.sunburst based on outermost ring ---
     # The sunburst path is set by path = base_path[:num_rings], so outermost is path[-1]
     def get_sunburst_color_map(path):
-        """Return the appropriate color_discrete_map for px.sunburst given the path."""
+        """Return the stable color of every label of the outermost ring of the path."""
         if not path:
             return {}
         outer = path[-1]
-        if outer == 'Carrier':
-            return carrier_colors
-        elif outer == 'Tech_name':
-            return carrier_tech_colors
-        elif outer == 'Tech_subsector' or outer == 'Tech_subsector_display':
-            return sector_activity_colors
-        else:
-            return {}
+        return color_map(outer, df_grouped_donut[outer].unique())
 
     # --- New: Pie label/legend logic depending on label_mode ---
     if label_mode == "Auto":
-        # Compute slice percentage and determine labels (do not filter out small slices)
-        df_grouped_donut['pct'] = df_grouped_donut['Energy_display'] / df_grouped_donut['Energy_display'].sum() * 100
-        sunburst_label_col = 'Tech_subsector'
         base_path = [sunburst_label_col, 'Carrier', 'Tech_name']
         path = base_path[:num_rings]
-        color_map = get_sunburst_color_map(path)
-        fig_donut = px.sunburst(
-            df_grouped_donut,
-            path=path,
-            values='Energy_display',
-            color=path[-1],  # color by outermost ring
-            color_discrete_map=color_map,
-            title=f"{scenario} Transport Energy breakdown ({display_unit})",
-        )
+        path_colors = get_sunburst_color_map(path)
+        with stage("px"):
+            fig_donut = px.sunburst(
+                df_grouped_donut,
+                path=path,
+                values='Energy_display',
+                color=path[-1],  # color by outermost ring
+                color_discrete_map=path_colors,
+                title=f"{scenario} Transport Energy breakdown ({display_unit})",
+            )
         fig_donut.update_layout(
             height=1080,
             title_x=0.5,
@@ -170,52 +241,42 @@ def Pie_Generator(Sector, num_rings=3):
             showlegend=True,
             uniformtext=dict(mode='show', minsize=1)
         )
-        # --- Begin: Per-slice label display logic for sunburst ---
-        for trace in fig_donut.data:
-            values = trace.values if hasattr(trace, "values") else []
-            labels = trace.labels if hasattr(trace, "labels") else []
-            total = sum(values) if values is not None and len(values) > 0 else 0
-            text_list = []
-            for label, value in zip(labels, values):
-                pct = (value / total * 100) if total > 0 else 0
-                if show_labels and value > 0 and pct >= min_pct_to_show_label:
-                    if show_percent:
-                        text_list.append(f"{label}<br>{pct:.1f}%")
+        with stage("labels"):
+            # --- Begin: Per-slice label display logic for sunburst ---
+            for trace in fig_donut.data:
+                values = trace.values if hasattr(trace, "values") else []
+                labels = trace.labels if hasattr(trace, "labels") else []
+                total = sum(values) if values is not None and len(values) > 0 else 0
+                text_list = []
+                for label, value in zip(labels, values):
+                    pct = (value / total * 100) if total > 0 else 0
+                    if show_labels and value > 0 and pct >= min_pct_to_show_label:
+                        if show_percent:
+                            text_list.append(f"{label}<br>{pct:.1f}%")
+                        else:
+                            text_list.append(f"{label}<br>{value:.0f} ({display_unit}/yr)")
                     else:
-                        text_list.append(f"{label}<br>{value:.0f} ({display_unit}/yr)")
-                else:
-                    text_list.append("")
-            trace.text = text_list
-            trace.texttemplate = "%{text}"
-            trace.textinfo = "text"
-            trace.insidetextorientation = "horizontal"
-            trace.textfont = dict(size=auto_label_font_size)
+                        text_list.append("")
+                trace.text = text_list
+                trace.texttemplate = "%{text}"
+                trace.textinfo = "text"
+                trace.insidetextorientation = "horizontal"
+                trace.textfont = dict(size=label_font_size)
         # --- End: Per-slice label display logic for sunburst ---
-        show_data_table = False  # table option not shown in Auto mode
     else:
         # Manual mode: use all manual options and display logic
-        def abbreviate_with_ellipsis(label, max_len):
-            return label if len(label) <= max_len else label[:max_len - 1] + "…"
-
-        if adaptive_abbreviate and 'Tech_subsector' in df_grouped_donut.columns:
-            df_grouped_donut['Tech_subsector_display'] = df_grouped_donut['Tech_subsector'].astype(str).apply(
-                lambda x: abbreviate_with_ellipsis(x, max_label_length)
-            )
-            sunburst_label_col = 'Tech_subsector_display'
-        else:
-            sunburst_label_col = 'Tech_subsector'
-
         base_path = [sunburst_label_col, 'Carrier', 'Tech_name']
         path = base_path[:num_rings]
-        color_map = get_sunburst_color_map(path)
-        fig_donut = px.sunburst(
-            df_grouped_donut,
-            path=path,
-            values='Energy_display',
-            color=path[-1],  # color by outermost ring
-            color_discrete_map=color_map,
-            title=f"{scenario} Transport Energy breakdown ({display_unit})",
-        )
+        path_colors = get_sunburst_color_map(path)
+        with stage("px"):
+            fig_donut = px.sunburst(
+                df_grouped_donut,
+                path=path,
+                values='Energy_display',
+                color=path[-1],  # color by outermost ring
+                color_discrete_map=path_colors,
+                title=f"{scenario} Transport Energy breakdown ({display_unit})",
+            )
         fig_donut.update_layout(
             height=1080,
             title_x=0.5,
@@ -223,26 +284,27 @@ def Pie_Generator(Sector, num_rings=3):
             showlegend=True,
             uniformtext=dict(mode='show', minsize=1)
         )
-        # --- Begin: Per-slice label display logic for sunburst, Manual mode ---
-        total_energy = df_grouped_donut['Energy_display'].sum()
-        for trace in fig_donut.data:
-            values = trace.values if hasattr(trace, "values") else []
-            labels = trace.labels if hasattr(trace, "labels") else []
-            text_list = []
-            for label, value in zip(labels, values):
-                pct = (value / total_energy * 100) if total_energy > 0 else 0
-                if show_labels and value > 0 and pct >= manual_min_pct_to_show_label:
-                    if show_percent:
-                        text_list.append(f"{label}<br>{pct:.1f}%")
+        with stage("labels"):
+            # --- Begin: Per-slice label display logic for sunburst, Manual mode ---
+            total_energy = df_grouped_donut['Energy_display'].sum()
+            for trace in fig_donut.data:
+                values = trace.values if hasattr(trace, "values") else []
+                labels = trace.labels if hasattr(trace, "labels") else []
+                text_list = []
+                for label, value in zip(labels, values):
+                    pct = (value / total_energy * 100) if total_energy > 0 else 0
+                    if show_labels and value > 0 and pct >= min_pct_to_show_label:
+                        if show_percent:
+                            text_list.append(f"{label}<br>{pct:.1f}%")
+                        else:
+                            text_list.append(f"{label}<br>{value:.0f} ({display_unit}/yr)")
                     else:
-                        text_list.append(f"{label}<br>{value:.0f} ({display_unit}/yr)")
-                else:
-                    text_list.append("")
-            trace.text = text_list
-            trace.texttemplate = "%{text}"
-            trace.textinfo = "text"
-            trace.insidetextorientation = label_orientation if 'label_orientation' in locals() else "auto"
-            trace.textfont = dict(size=label_font_size)
+                        text_list.append("")
+                trace.text = text_list
+                trace.texttemplate = "%{text}"
+                trace.textinfo = "text"
+                trace.insidetextorientation = label_orientation
+                trace.textfont = dict(size=label_font_size)
         # --- End: Per-slice label display logic for sunburst, Manual mode ---
 
     # if you used animation_frame, propagate title centering into each frame
@@ -255,21 +317,4 @@ def Pie_Generator(Sector, num_rings=3):
             title_x=0.5,
             title_xanchor='center'
         )
-
-    st.plotly_chart(fig_donut, use_container_width=True)
-
-    if (label_mode == "Manual" and 'show_data_table' in locals() and show_data_table):
-        st.subheader("Underlying values for chart")
-        # Show only relevant columns
-        show_cols = [sunburst_label_col, 'Carrier', 'Tech_name', 'Energy_display']
-        st.dataframe(df_grouped_donut[show_cols])
-
-    # Download button
-    csv_bytes = df_grouped_donut.to_csv(index=False).encode('utf-8')
-    st.sidebar.download_button(
-        "Download chart data as CSV",
-        data=csv_bytes,
-        file_name=f"{scenario}_transport_data_{display_unit}.csv",
-        mime="text/csv"
-    )
-
+    return fig_donut
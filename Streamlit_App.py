@@ -4,15 +4,11 @@ import os
 import streamlit as st
 # Local modules
 from nzest_constants import PAGES
-from Plot.Energy_Demand import Energy_Demand
-from Plot.Energy_Demand_Grouped import Energy_Demand_Grouped
-from Plot.Multi_Sector_Bar import Multi_Sector_Bar
-from Plot.Energy_Demand_Bar import Energy_Demand_Bar
-from Plot.Industry_Sector_Bar import Industry_Sector_Bar
-from Plot.GHG_Graph import GHG_Graph
-from Plot.Carbon_content_Bar import Carbon_content_Bar
-from Plot.Pie_Generator import Pie_Generator
-from Plot. Grouped_Industry_Bar import  Grouped_Industry_Bar
+from page_registry import render_page
+from profiling import profile_rerun
+
+# Stage timings panel on by default (NZEST_PROFILE=1), otherwise opt-in from the sidebar
+PROFILE_DEFAULT = os.environ.get("NZEST_PROFILE") == "1"
 
 
 def setup_page():
@@ -64,6 +60,8 @@ def setup_page():
         st.session_state["intro_shown"] = False
     if "Go to" not in st.session_state:
         st.session_state["Go to"] = "Energy Demand"
+    if "debug_profile" not in st.session_state:
+        st.session_state["debug_profile"] = PROFILE_DEFAULT
 
 
 def _handle_continue():
@@ -136,35 +134,13 @@ def run_app():
     pages_for_select = [k for k in PAGES.keys() if k != "Intro"]
     selection = st.sidebar.selectbox("Go to", pages_for_select, key="Go to")
 
-    # 8) Dispatch
-    if selection == "GHG Emissions":
-        GHG_Graph()
-    elif selection == "Energy Demand":
-        Energy_Demand()
-    elif selection == "Energy Demand Grouped":
-        Energy_Demand_Grouped()
-    elif selection == "Energy Demand (Bar Chart)":
-        Energy_Demand_Bar()
-    elif selection == "Carbon Content (Bar Chart)":
-        Carbon_content_Bar()
-    # elif selection == "Pie Chart All Sectors":
-    #     Pie_Generator("All")
-    elif selection == "Pie Chart Agriculture":
-        Pie_Generator("Agriculture", 2)
-    elif selection == "Pie Chart Transport":
-        Pie_Generator("Transport", 2)
-    elif selection == "Pie Chart Building":
-        Pie_Generator("Commercial|Residential", 2)
-    elif selection == "Pie Chart Industry":
-        Pie_Generator("Industry", 2)
-    elif selection == "Multi Sector Bar Chart":
-        Multi_Sector_Bar()
-    elif selection == "Industry Subsector Bar Chart":
-        Industry_Sector_Bar()
-    elif selection == "Grouped Industry Bar Chart":
-        Grouped_Industry_Bar()
-    elif selection == "Carbon Content (Bar Chart)":
-        Carbon_content_Bar()
+    # 8) Dispatch (page modules are imported on first selection)
+    try:
+        with profile_rerun(selection, st.session_state["debug_profile"]):
+            render_page(selection)
+    finally:
+        # Last in the sidebar, and still shown when a page stops early
+        st.sidebar.checkbox("Show stage timings (debug)", key="debug_profile")
 
 
 if __name__ == "__main__":
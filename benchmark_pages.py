@@ -0,0 +1,244 @@
+"""
+Description:
+-------------
+Per-rerun latency benchmark of every dashboard page.
+
+Each page of PAGE_REGISTRY is driven through Streamlit's AppTest harness
+over a matrix of widget states (defaults, each "Group by" option, a
+province subset, another year, another display unit, manual labels), and
+every state is rerun a few times. Wall time per rerun is reported as
+p50/p95 per page, together with the time spent in each stage:
+
+    load       get_dataset / get_ghg_dataset
+    filter     the "filter" stages inside <Page>_Data (cube and row masks)
+    aggregate  the rest of <Page>_Data
+    figure     <Page>_Figure
+    serialize  st.plotly_chart (Plotly JSON and the chart message)
+
+The stages come from the profiling hooks (profiling.stage / profiled): each
+rerun is run with the stage timings panel on, and its trace is read back
+from a temporary trace file, so wall times include the profiling overhead.
+The figure cache is bypassed so every rerun builds its figures, unless
+--cached is given. For the duration of the run only, profiling.TRACE_FILE
+points at the temporary file and, without --cached, FigureCache.get always
+misses; both are restored when the run ends. Results are written as JSON, tagged with the git
+commit and with the figure cache statistics after each page, so runs can be
+compared between commits with --compare.
+
+Usage:
+    python benchmark_pages.py [OUT_JSON] [--pages ...] [--repeats N] [--cached] [--compare OLD_JSON]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from unittest import mock
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+import figure_cache
+import profiling
+from page_registry import PAGE_REGISTRY
+
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Streamlit_App.py")
+STAGES = ["load", "filter", "aggregate", "figure", "serialize"]
+
+
+def stage_seconds(trace):
+    """Seconds of each benchmark stage in one profiled rerun (a profiling trace)."""
+    totals = defaultdict(float)
+    # Names of the stages holding the current record, outermost first
+    open_stages = []
+    for record in trace["stages"]:
+        del open_stages[record["depth"]:]
+        name = record["stage"]
+        # A stage nested in one of the same name is already counted
+        if name not in open_stages:
+            # Only masks built by <Page>_Data count as filtering
+            if name != "filter" or "data" in open_stages:
+                totals[name] += record["seconds"]
+        open_stages.append(name)
+    return {
+        "load": totals["load"],
+        "filter": totals["filter"],
+        "aggregate": max(totals["data"] - totals["filter"], 0.0),
+        "figure": totals["figure"],
+        "serialize": totals["serialize"],
+    }
+
+
+def last_trace(path):
+    with open(path) as f:
+        lines = f.read().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def widget_states(at):
+    """
+    (name, setter) pairs for the page currently shown by at. Each setter
+    changes one widget from the page defaults.
+    """
+    states = [("default", None)]
+    group_by = [s for s in at.sidebar.selectbox if s.label == "Group by"]
+    for option in (group_by[0].options[1:] if group_by else []):
+        states.append((f"group_by={option}", lambda at, o=option: _select(at.sidebar.selectbox, "Group by", o)))
+    if any(s.label == "Select Provinces" for s in at.sidebar.multiselect):
+        states.append(("provinces", lambda at: _select(
+            at.sidebar.multiselect, "Select Provinces",
+            lambda w: [p for p in w.options if p != "All Canada"][:2])))
+    if any(s.label == "Select Year" for s in at.sidebar.selectbox):
+        states.append(("year", lambda at: _select(at.sidebar.selectbox, "Select Year", lambda w: w.options[len(w.options) // 2])))
+    if any(s.label == "Display unit" for s in at.sidebar.selectbox):
+        states.append(("unit", lambda at: _select(at.sidebar.selectbox, "Display unit", lambda w: w.options[0])))
+    if any(r.label in ("Label mode", "Label display mode") for r in at.radio):
+        states.append(("manual_labels", lambda at: _select(at.radio, ("Label mode", "Label display mode"), "Manual")))
+    return states
+
+
+def _select(widgets, label, value):
+    labels = label if isinstance(label, tuple) else (label,)
+    widget = next(w for w in widgets if w.label in labels)
+    widget.set_value(value(widget) if callable(value) else value)
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None}
+    return {"p50": round(float(np.percentile(values, 50)), 4), "p95": round(float(np.percentile(values, 95)), 4)}
+
+
+def _open_page(label, timeout):
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    at.session_state["intro_shown"] = True
+    at.session_state["Go to"] = label
+    # Every rerun is profiled, so its stages land in the trace file
+    at.session_state["debug_profile"] = True
+    at.run()
+    return at
+
+
+def benchmark_page(label, trace_path, repeats=5, timeout=120):
+    """Rerun times of one page over its widget states, with the seconds of each stage per rerun."""
+    at = _open_page(label, timeout)
+    runs = []
+    for name, setter in widget_states(at):
+        if setter is not None:
+            setter(at)
+        for _ in range(repeats):
+            open(trace_path, "w").close()
+            start = time.perf_counter()
+            at.run()
+            wall = time.perf_counter() - start
+            if at.exception:
+                raise RuntimeError(f"{label} [{name}]: {at.exception[0].message}")
+            trace = last_trace(trace_path)
+            if trace is None:
+                raise RuntimeError(f"{label} [{name}]: the rerun was not profiled")
+            runs.append({"state": name, "wall": wall, **stage_seconds(trace)})
+        # Back to the defaults for the next state
+        at = _open_page(label, timeout)
+    return {
+        "runs": len(runs),
+        "states": sorted({run["state"] for run in runs}),
+        "wall": percentiles([run["wall"] for run in runs]),
+        "stages": {stage: percentiles([run[stage] for run in runs]) for stage in STAGES},
+    }
+
+
+def _figure_cache_stats_script():
+    import streamlit as st
+    from figure_cache import get_figure_cache
+    st.session_state["figure_cache_stats"] = get_figure_cache().stats()
+
+
+def figure_cache_stats(timeout=30):
+    """
+    Statistics of the figure cache the app's sessions share. st.cache_resource
+    only returns the cached instance inside a script run, so they are read
+    through a one-line AppTest script.
+    """
+    at = AppTest.from_function(_figure_cache_stats_script, default_timeout=timeout)
+    at.run()
+    return at.session_state["figure_cache_stats"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_FILE), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(out_path="benchmark.json", pages=None, repeats=5, cached=False):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.ExitStack() as patches:
+        # Both patches are undone when the run ends
+        trace_path = os.path.join(tmp, "trace.jsonl")
+        patches.enter_context(mock.patch.object(profiling, "TRACE_FILE", trace_path))
+        if not cached:
+            # Every lookup misses, so each rerun pays for its figures
+            patches.enter_context(mock.patch.object(figure_cache.FigureCache, "get", lambda self, key: None))
+        for label in PAGE_REGISTRY:
+            if pages is not None and label not in pages:
+                continue
+            start = time.perf_counter()
+            results[label] = benchmark_page(label, trace_path, repeats)
+            # Cumulative over the run: entries, bytes, hits and misses so far
+            results[label]["figure_cache"] = figure_cache_stats()
+            wall = results[label]["wall"]
+            print(f"{label}: p50 {wall['p50'] * 1000:.0f} ms, p95 {wall['p95'] * 1000:.0f} ms "
+                  f"over {results[label]['runs']} reruns ({time.perf_counter() - start:.1f}s)")
+        cache_stats = figure_cache_stats()
+    report = {
+        "commit": git_commit(),
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeats": repeats,
+        "figure_cache": cached,
+        "figure_cache_stats": cache_stats,
+        "pages": results,
+    }
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"-> {out_path}")
+    return report
+
+
+def compare(old, new):
+    """Print the p50/p95 change of every page and stage present in both reports."""
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for label, page in new["pages"].items():
+        before = old["pages"].get(label)
+        if before is None:
+            continue
+        rows = [("wall", before["wall"], page["wall"])]
+        rows += [(stage, before["stages"][stage], page["stages"][stage]) for stage in STAGES
+                 if stage in before["stages"]]
+        print(label)
+        for name, b, a in rows:
+            changes = []
+            for q in ("p50", "p95"):
+                if b[q] and a[q] is not None:
+                    changes.append(f"{q} {b[q] * 1000:.1f} -> {a[q] * 1000:.1f} ms ({(a[q] / b[q] - 1) * 100:+.0f}%)")
+            print(f"  {name:<10} " + ", ".join(changes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the rerun latency of every dashboard page.")
+    parser.add_argument("out", nargs="?", default="benchmark.json", help="results JSON (defaults to benchmark.json)")
+    parser.add_argument("--pages", nargs="+", help="page labels as listed in the sidebar (defaults to all)")
+    parser.add_argument("--repeats", type=int, default=5, help="reruns per widget state")
+    parser.add_argument("--cached", action="store_true", help="keep the figure cache on (reruns reuse figures)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    report = run_benchmark(args.out, args.pages, args.repeats, args.cached)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
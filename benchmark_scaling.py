@@ -0,0 +1,160 @@
+"""
+Description:
+-------------
+Scaling benchmark on synthetic Status-Quo exports.
+
+For each scale factor, a synthetic raw export (see Input/SQ_Synthetic.py)
+is run through process_SQ, loaded back with read_post_process (as the
+dataset registry loads it), turned into the data cube and aggregated by
+every energy page's <Page>_Data with its default selection. Wall time and
+peak resident memory of each stage (above the level it started from) are
+recorded against the row counts, written as JSON, and plotted to an HTML
+page (time and peak memory against rows, log-log) to show where a stage
+stops scaling.
+
+Usage:
+    python benchmark_scaling.py [OUT_DIR] [--scales 1 10 100] [--seed N] [--regions N] [--new-techs N] [--keep]
+"""
+
+import argparse
+import importlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+import psutil
+
+from data_cube import build_cube
+from load_csv import read_post_process
+from page_registry import PAGE_REGISTRY
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Input"))
+from SQ_Pre_Process import process_SQ  # noqa: E402
+from SQ_Synthetic import load_sample, write_SQ  # noqa: E402
+
+
+# Seconds between resident memory samples while a stage runs
+SAMPLE_INTERVAL = 0.005
+
+
+def measure(func, *args, **kwargs):
+    """
+    (result, seconds, peak MB of resident memory above the level at the
+    start of the call), with the memory sampled on a background thread.
+    """
+    process = psutil.Process()
+    baseline = process.memory_info().rss
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(SAMPLE_INTERVAL):
+            peak[0] = max(peak[0], process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        done.set()
+        sampler.join()
+    peak[0] = max(peak[0], process.memory_info().rss)
+    return result, seconds, (peak[0] - baseline) / 1e6
+
+
+def page_aggregations():
+    """(page label, <Page>_Data, extra args, takes the cube) for every energy page."""
+    pages = []
+    for label, (module_name, func_name, args) in PAGE_REGISTRY.items():
+        if func_name == "GHG_Graph":
+            # The GHG inventory is not a scenario export
+            continue
+        data = getattr(importlib.import_module(module_name), f"{func_name}_Data")
+        # Pie_Generator pages pass their sector pattern; the ring count is a display option
+        extra = args[:1] if func_name == "Pie_Generator" else ()
+        pages.append((label, data, extra, next(iter(inspect.signature(data).parameters)) == "cube"))
+    return pages
+
+
+def benchmark_scale(scale, work_dir, seed=0, sample=None, regions=1, new_techs=0):
+    """Stage timings and peak memory for one scale factor."""
+    raw_csv = write_SQ(work_dir, scale, seed, sample, regions, new_techs)
+    post_csv = os.path.join(work_dir, f"SQ_synthetic_x{scale:g}_Post_Process.csv")
+    with open(raw_csv) as f:
+        raw_rows = sum(1 for _ in f) - 1
+
+    stages = {}
+    _, seconds, mem = measure(process_SQ, raw_csv, post_csv)
+    stages["process_SQ"] = {"seconds": seconds, "peak_mb": mem}
+    df, seconds, mem = measure(read_post_process, post_csv)
+    stages["load_csv"] = {"seconds": seconds, "peak_mb": mem}
+    cube, seconds, mem = measure(build_cube, df)
+    stages["build_cube"] = {"seconds": seconds, "peak_mb": mem}
+    for label, data, extra, takes_cube in page_aggregations():
+        _, seconds, mem = measure(data, cube if takes_cube else df.copy(deep=False), *extra)
+        stages[label] = {"seconds": seconds, "peak_mb": mem}
+
+    for stage in stages.values():
+        stage["seconds"] = round(stage["seconds"], 4)
+        stage["peak_mb"] = round(stage["peak_mb"], 2)
+    return {"scale": scale, "raw_rows": raw_rows, "long_rows": len(df), "stages": stages}
+
+
+def plot_results(results, path):
+    """Time and peak memory of each stage against the long-format row count (log-log)."""
+    fig = make_subplots(rows=1, cols=2, subplot_titles=("Wall time (s)", "Peak memory increase (MB)"))
+    rows = [r["long_rows"] for r in results]
+    for stage in results[0]["stages"]:
+        for col, metric in ((1, "seconds"), (2, "peak_mb")):
+            fig.add_trace(go.Scatter(
+                x=rows, y=[r["stages"][stage][metric] for r in results], mode="lines+markers",
+                name=stage, legendgroup=stage, showlegend=col == 1,
+            ), row=1, col=col)
+    fig.update_xaxes(type="log", title_text="Post-processed rows")
+    fig.update_yaxes(type="log")
+    fig.update_layout(title="NZEST scaling benchmark", height=600)
+    fig.write_html(path, include_plotlyjs="cdn")
+
+
+def run_benchmark(out_dir="Benchmark", scales=(1, 10, 100), seed=0, keep=False, regions=1, new_techs=0):
+    work_dir = os.path.join(out_dir, "data")
+    sample = load_sample()
+    results = []
+    for scale in scales:
+        start = time.perf_counter()
+        result = benchmark_scale(scale, work_dir, seed, sample, regions, new_techs)
+        results.append(result)
+        slowest = max(result["stages"].items(), key=lambda item: item[1]["seconds"])
+        print(f"x{scale:g}: {result['raw_rows']} raw / {result['long_rows']} long rows in "
+              f"{time.perf_counter() - start:.1f}s (slowest: {slowest[0]} {slowest[1]['seconds']:.2f}s)")
+    if not keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"built": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": seed, "regions": regions,
+              "new_techs": new_techs, "scales": results}
+    with open(os.path.join(out_dir, "scaling.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    plot_results(results, os.path.join(out_dir, "scaling.html"))
+    print(f"-> {os.path.join(out_dir, 'scaling.json')}, {os.path.join(out_dir, 'scaling.html')}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark preprocessing, loading and aggregation against data size.")
+    parser.add_argument("out_dir", nargs="?", default="Benchmark", help="output directory (defaults to Benchmark)")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1, 10, 100],
+                        help="multiples of the sample's row count")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic data")
+    parser.add_argument("--regions", type=int, default=1, help="region codes per province (see SQ_Synthetic)")
+    parser.add_argument("--new-techs", type=int, default=0, help="technology codes beyond the catalog (see SQ_Synthetic)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated raw and post-processed files")
+    args = parser.parse_args()
+    run_benchmark(args.out_dir, args.scales, args.seed, args.keep, args.regions, args.new_techs)
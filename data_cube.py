@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+from profiling import profiled, stage
+
+
+# Dimensions encoded as integer codes, in cube order
+CUBE_DIMS = ['Province', 'Sector', 'Tech_subsector', 'Carrier', 'Tech_name']
+
+# Measures that only count where strictly positive (matches the Carbon Content page filter)
+POSITIVE_MEASURES = ['Carbon Content MT c']
+
+# Province label of the national rollup level (the "All Canada" filter option)
+NATIONAL = "All Canada"
+# Regions of the exports that already hold national figures (CA in the Net-Zero data)
+NATIONAL_REGIONS = ["Canada"]
+# Keys of a national rollup row
+ROLLUP_KEYS = ['Year', 'Sector', 'Tech_subsector', 'Carrier', 'Tech_name']
+
+
+class DataCube:
+    """
+    Pre-aggregated view of a post-processed dataset.
+
+    Every distinct (Province, Sector, Tech_subsector, Carrier, Tech_name)
+    combination is one coordinate; each measure is stored as a dense
+    (coordinate x year) float array. Filters are evaluated on the integer
+    codes and sums are reduced directly on the arrays, so a query costs
+    O(coordinates) instead of a pandas filter + groupby over the long table.
+    A fully dense tensor over all six axes would be mostly empty, hence the
+    coordinate axis.
+    """
+
+    def __init__(self, df: pd.DataFrame, measures, rollup=False):
+        self.dims = [d for d in CUBE_DIMS if d in df.columns]
+        self.measures = list(measures)
+        # A rollup cube holds the national totals only; every cube links to
+        # its national level (itself for a rollup, see build_cube otherwise)
+        self.rollup = rollup
+        self.national = self if rollup else None
+
+        self.labels = {}
+        dim_codes = {}
+        for dim in self.dims:
+            codes, uniques = pd.factorize(df[dim], sort=True)
+            dim_codes[dim] = codes
+            self.labels[dim] = np.asarray(uniques, dtype=object)
+
+        self.years, year_idx = np.unique(df['Year'].to_numpy(), return_inverse=True)
+
+        # One coordinate per observed combination of dimension codes
+        key = np.stack([dim_codes[d] for d in self.dims], axis=1)
+        coords, coord_idx = np.unique(key, axis=0, return_inverse=True)
+        coord_idx = coord_idx.ravel()
+        self.codes = {d: coords[:, i] for i, d in enumerate(self.dims)}
+
+        n_cells = len(coords) * len(self.years)
+        flat = coord_idx * len(self.years) + year_idx
+        shape = (len(coords), len(self.years))
+        self.values = {}
+        self.present = {}
+        # Column-major, so the cells of one year are contiguous and a
+        # single-year query reads that year only
+        for m in self.measures:
+            v = df[m].to_numpy(dtype=float)
+            keep = v > 0 if m in POSITIVE_MEASURES else ~np.isnan(v)
+            self.values[m] = np.asfortranarray(
+                np.bincount(flat[keep], weights=v[keep], minlength=n_cells).reshape(shape))
+            self.present[m] = np.asfortranarray(np.bincount(flat[keep], minlength=n_cells).reshape(shape) > 0)
+
+    def members(self, dim, measure=None):
+        """Sorted labels of a dimension (or 'Year'), optionally only where `measure` has data."""
+        if dim == 'Year':
+            if measure is None:
+                return list(self.years)
+            return list(self.years[self.present[measure].any(axis=0)])
+        if measure is None:
+            return list(self.labels[dim])
+        used = np.zeros(len(self.labels[dim]), dtype=bool)
+        used[self.codes[dim][self.present[measure].any(axis=1)]] = True
+        return list(self.labels[dim][used])
+
+    def _mask(self, where):
+        mask = np.ones(len(next(iter(self.codes.values()))), dtype=bool)
+        for dim, selected in (where or {}).items():
+            # Trailing False so missing labels (code -1) never match
+            lookup = np.append(np.isin(self.labels[dim], list(selected)), False)
+            mask &= lookup[self.codes[dim]]
+        return mask
+
+    def query(self, measure, by, where=None, years=None, name=None) -> pd.DataFrame:
+        """
+        Sum `measure` grouped by the dimensions in `by` (which may include 'Year').
+
+        `where` maps dimensions to the members to keep and `years` lists the
+        years to keep. The result matches
+        df[filters].groupby(by)[measure].sum().reset_index(), with the value
+        column renamed to `name` when given.
+        """
+        name = name or measure
+        with stage("filter"):
+            mask = self._mask(where)
+            year_sel = np.ones(len(self.years), dtype=bool) if years is None else np.isin(self.years, list(years))
+            rows = np.ix_(np.flatnonzero(mask), np.flatnonzero(year_sel))
+            values = self.values[measure][rows]
+            present = self.present[measure][rows]
+            sel_years = self.years[year_sel]
+
+        with stage("groupby"):
+            group_dims = [d for d in by if d != 'Year']
+            codes = [self.codes[d][mask] for d in group_dims]
+            # Rows with a missing label in a grouping dimension are dropped, like groupby
+            valid = np.ones(int(mask.sum()), dtype=bool)
+            for c in codes:
+                valid &= c >= 0
+            # Collapse the grouping codes into one integer key per coordinate
+            sizes = [len(self.labels[d]) for d in group_dims]
+            key = np.ravel_multi_index([c[valid] for c in codes], sizes) if group_dims \
+                else np.zeros(int(valid.sum()), dtype=np.intp)
+            group_keys, inverse = np.unique(key, return_inverse=True)
+            groups = np.stack(np.unravel_index(group_keys, sizes), axis=1) if group_dims \
+                else np.zeros((len(group_keys), 0), dtype=np.intp)
+
+            # Segment sums over coordinates sorted by group
+            order = np.argsort(inverse, kind='stable')
+            starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0]) if len(order) else order
+            sums = np.add.reduceat(values[valid][order], starts, axis=0) if len(order) \
+                else np.zeros((0, len(sel_years)))
+            seen = np.logical_or.reduceat(present[valid][order], starts, axis=0) if len(order) \
+                else np.zeros((0, len(sel_years)), dtype=bool)
+
+        if 'Year' in by:
+            g_idx, y_idx = np.nonzero(seen)
+            out = {d: self.labels[d][groups[g_idx, i]] for i, d in enumerate(group_dims)}
+            out['Year'] = sel_years[y_idx]
+            out[name] = sums[g_idx, y_idx]
+            sort_keys = {d: groups[g_idx, i] for i, d in enumerate(group_dims)}
+            sort_keys['Year'] = y_idx
+        else:
+            g_idx = np.nonzero(seen.any(axis=1))[0]
+            out = {d: self.labels[d][groups[g_idx, i]] for i, d in enumerate(group_dims)}
+            out[name] = sums[g_idx].sum(axis=1)
+            sort_keys = {d: groups[g_idx, i] for i, d in enumerate(group_dims)}
+
+        # Labels are factorized in sorted order, so sorting codes sorts like groupby
+        order = np.lexsort([sort_keys[d] for d in reversed(by)]) if by else slice(None)
+        df = pd.DataFrame({col: out[col] for col in list(by) + [name]})
+        return df.iloc[order].reset_index(drop=True)
+
+
+def _measures(df, schema=None):
+    # Additive measures only: the energy column detected at load and the
+    # carbon content. Per-carrier factors (HHV, Carbon Content (kgC/kg),
+    # Energy per kg C) are intensive and are never summed.
+    schema = schema if schema is not None else df.attrs.get('schema', {})
+    energy_col = schema.get('energy_col')
+    if energy_col not in df.columns:
+        raise ValueError("No detected energy column; load the frame with load_csv.read_post_process")
+    return [energy_col] + [c for c in POSITIVE_MEASURES if c in df.columns]
+
+
+@profiled("rollup")
+def national_rollup(df: pd.DataFrame, schema=None) -> pd.DataFrame:
+    """
+    National totals of a loaded post-processed frame, one row per
+    (Year, Sector, Tech_subsector, Carrier, Tech_name), flagged with the
+    NATIONAL province.
+
+    The totals sum the provincial rows. Rows of a national region (CA) only
+    count for the keys and years no province reports, so they are never
+    added on top of the provinces. Measures are summed like the cube does
+    (positive measures over their positive values) and stay NaN where no
+    row has a value. Only the additive measures are kept: the per-carrier
+    factors do not sum across provinces. schema is the detected layout
+    (load_csv.detect_schema), taken from df.attrs when not given, and is
+    kept in the attrs of the result.
+    """
+    schema = schema if schema is not None else df.attrs.get('schema', {})
+    keys = [k for k in ROLLUP_KEYS if k in df.columns]
+    measures = _measures(df, schema)
+    values = df[keys + measures].copy(deep=False)
+    for m in measures:
+        if m in POSITIVE_MEASURES:
+            values[m] = values[m].where(values[m] > 0)
+
+    regional = df['Province'].isin(NATIONAL_REGIONS).to_numpy() if 'Province' in df.columns \
+        else np.zeros(len(df), dtype=bool)
+    grouped = [
+        values[mask].groupby(keys, observed=True, dropna=False, sort=False)[measures].sum(min_count=1)
+        for mask in (~regional, regional)
+    ]
+    provincial, national = grouped
+    totals = pd.concat([provincial, national[~national.index.isin(provincial.index)]]) if len(national) \
+        else provincial
+    totals = totals.reset_index()
+    for k in keys:
+        if isinstance(df[k].dtype, pd.CategoricalDtype):
+            totals[k] = totals[k].astype(df[k].dtype)
+    totals.insert(0, 'Province', pd.Categorical([NATIONAL] * len(totals)))
+    totals = totals.sort_values(keys, kind='stable', ignore_index=True)
+    totals.attrs['schema'] = schema
+    return totals
+
+
+@profiled("build_cube")
+def build_cube(df: pd.DataFrame, national=None, schema=None) -> DataCube:
+    """
+    Cube of the energy and carbon content measures of a loaded post-processed
+    frame, linked to the cube of its national rollup (computed here unless
+    given). schema is the detected layout, taken from df.attrs when not given.
+    """
+    schema = schema if schema is not None else df.attrs.get('schema', {})
+    if national is None:
+        national = national_rollup(df, schema)
+    # Net-Zero placeholder sector rows are never charted
+    cube = DataCube(df[df['Sector'] != "-"], _measures(df, schema))
+    cube.national = DataCube(national[national['Sector'] != "-"], _measures(national, schema), rollup=True)
+    return cube
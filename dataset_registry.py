@@ -0,0 +1,138 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_cube import DataCube, build_cube, national_rollup
+from load_csv import columnar_path, read_ghg, read_post_process
+from profiling import profiled
+
+
+# Base directory for the post-processed scenario outputs
+base_dir = os.path.join(os.path.dirname(__file__), "Input")
+
+# Scenario label (as shown in the sidebar) -> post-processed CSV
+SCENARIO_FILES = {
+    "Status-Quo": "SQ_Post_Process.csv",
+    "Net-Zero (beta)": "NZ_Post_Process.csv",
+}
+
+# Historical GHG inventory shown on the GHG page
+GHG_FILE = "GHG_Data.csv"
+
+# Year column of the post-processed exports and of the melted GHG inventory
+YEAR_COLUMNS = ("Year", "year")
+
+
+def source_mtime(path):
+    """Latest mtime of a post-processed CSV and its Parquet companion, or None if neither exists."""
+    mtimes = [os.path.getmtime(p) for p in (path, columnar_path(path)) if os.path.exists(p)]
+    return max(mtimes) if mtimes else None
+
+
+class Dataset:
+    """
+    One loaded scenario, shared by every session of the server process.
+
+    The frame is never handed out directly: view() returns a shallow copy
+    that shares the column data, so callers may add columns to their view
+    but must not modify values in place. The cube is built on first use.
+
+    Rows are kept sorted by year, so each year is one contiguous slice:
+    year_view(year) costs O(rows in that year) and never reads the others.
+
+    national is the rollup level of the scenario, itself a Dataset (flagged
+    rollup) of national totals built on first use; pages read it for the
+    "All Canada" selection instead of summing the provinces.
+    """
+
+    def __init__(self, path, mtime, frame: pd.DataFrame, rollup=False):
+        self.path = path
+        self.mtime = mtime
+        self.rollup = rollup
+        # Column layout detected at load (load_csv.detect_schema); kept off the
+        # frame so that pandas does not copy it into every derived frame
+        self.schema = frame.attrs.pop("schema", {})
+
+        # Year partitions: sort once (exports are usually written year by year
+        # already) and record where each year starts and stops
+        year_col = next((c for c in YEAR_COLUMNS if c in frame.columns), None)
+        if year_col is not None and not frame[year_col].is_monotonic_increasing:
+            frame = frame.sort_values(year_col, kind="stable", ignore_index=True)
+        self._frame = frame
+        values = frame[year_col].to_numpy() if year_col is not None else np.array([])
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]]) if len(values) else np.array([], dtype=int)
+        self.years = values[starts].tolist()
+        self._year_slices = dict(zip(self.years, zip(starts.tolist(), starts[1:].tolist() + [len(frame)])))
+        self._cube = None
+        self._national = self if rollup else None
+        # Reentrant: building the cube builds the national level first
+        self._lock = threading.RLock()
+
+    def view(self) -> pd.DataFrame:
+        return self._frame.copy(deep=False)
+
+    def year_view(self, year) -> pd.DataFrame:
+        """view() restricted to one year (empty for a year the dataset does not have)."""
+        start, stop = self._year_slices.get(year, (0, 0))
+        return self._frame.iloc[start:stop].copy(deep=False)
+
+    @property
+    def national(self) -> "Dataset":
+        if self._national is None:
+            with self._lock:
+                if self._national is None:
+                    self._national = Dataset(self.path, self.mtime, national_rollup(self._frame, self.schema), rollup=True)
+        return self._national
+
+    @property
+    def cube(self) -> DataCube:
+        if self._cube is None:
+            with self._lock:
+                if self._cube is None:
+                    self._cube = build_cube(self._frame, self.national.view(), self.schema)
+        return self._cube
+
+
+class DatasetRegistry:
+    """Process-wide cache of loaded scenarios, reloaded when the source files change."""
+
+    def __init__(self):
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def get_path(self, path, reader=read_post_process):
+        mtime = source_mtime(path)
+        if mtime is None:
+            return None
+        dataset = self._datasets.get(path)
+        if dataset is not None and dataset.mtime == mtime:
+            return dataset
+        with self._lock:
+            dataset = self._datasets.get(path)
+            if dataset is None or dataset.mtime != mtime:
+                dataset = Dataset(path, mtime, reader(path))
+                self._datasets[path] = dataset
+        return dataset
+
+    def get(self, scenario):
+        return self.get_path(os.path.join(base_dir, SCENARIO_FILES[scenario]))
+
+
+@st.cache_resource(show_spinner=False)
+def get_registry() -> DatasetRegistry:
+    return DatasetRegistry()
+
+
+@profiled("load")
+def get_dataset(scenario):
+    """Shared Dataset for a scenario label, or None when its outputs have not been generated."""
+    return get_registry().get(scenario)
+
+
+@profiled("load")
+def get_ghg_dataset():
+    """Shared Dataset holding the melted GHG inventory, or None when the file is missing."""
+    return get_registry().get_path(os.path.join(base_dir, GHG_FILE), reader=read_ghg)
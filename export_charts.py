@@ -0,0 +1,269 @@
+"""
+Description:
+-------------
+Headless bulk export of the dashboard charts.
+
+Every page of PAGE_REGISTRY is rendered for each scenario and province
+("All Canada" plus every province), and for each year on the single-year
+pie and bar pages, with the page's default display options. The figures
+are built by the same <Page>_Data / <Page>_Figure functions the Plot/
+modules use, without a Streamlit session, on a process pool. Each view is
+written as Plotly HTML and/or JSON next to the CSV of its aggregated data,
+under OUT_DIR/<scenario>/<province>/, and a manifest.json lists the
+outputs with per-job timings and the overall throughput.
+
+Usage:
+    python export_charts.py [OUT_DIR] [--workers N] [--scenarios ...] [--pages ...]
+                            [--provinces ...] [--years ...] [--formats html json]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly.io as pio
+
+from dataset_registry import SCENARIO_FILES, get_dataset, get_ghg_dataset
+from page_registry import PAGE_REGISTRY
+from units import energy_unit
+
+
+MANIFEST_FILE = "manifest.json"
+# The GHG inventory does not depend on the scenario; its charts go here
+GHG_SCENARIO = "GHG Inventory"
+
+
+def slug(label):
+    return re.sub(r"\W+", "_", label).strip("_")
+
+
+def _base_unit(cube):
+    return energy_unit(next(c for c in cube.measures if c.startswith('Energy')))
+
+
+# Each exporter builds one view of a page with its default display options and
+# returns (aggregate, {file name: figure}), or None when the scenario lacks the data.
+
+def export_energy_demand(module, args, dataset, scenario, province, year):
+    cube = dataset.cube
+    grouped = module.Energy_Demand_Data(cube, provinces=[province])
+    return grouped, {"": module.Energy_Demand_Figure(grouped, scenario, display_unit=_base_unit(cube))}
+
+
+def export_energy_demand_grouped(module, args, dataset, scenario, province, year):
+    df = (dataset.national if province == "All Canada" else dataset).view()
+    if scenario.startswith("Net-Zero"):
+        df = df[df['Sector'] != "-"]
+    grouped = module.Energy_Demand_Grouped_Data(df, provinces=[province])
+    display_unit = energy_unit(next(c for c in df.columns if c.startswith('Energy')))
+    return grouped, {"": module.Energy_Demand_Grouped_Figure(grouped, scenario, display_unit=display_unit)}
+
+
+def export_energy_demand_bar(module, args, dataset, scenario, province, year):
+    cube = dataset.cube
+    grouped = module.Energy_Demand_Bar_Data(cube, provinces=[province], years=[year])
+    fig = module.Energy_Demand_Bar_Figure(grouped, scenario, cube.members('Sector'), display_unit=_base_unit(cube))
+    return grouped, {"": fig}
+
+
+def export_carbon_content_bar(module, args, dataset, scenario, province, year):
+    cube = dataset.cube
+    if 'Carbon Content MT c' not in cube.measures:
+        return None
+    grouped = module.Carbon_content_Bar_Data(cube, provinces=[province], years=[year])
+    sectors = cube.members('Sector', 'Carbon Content MT c')
+    return grouped, {"": module.Carbon_content_Bar_Figure(grouped, scenario, sectors)}
+
+
+def export_pie(module, args, dataset, scenario, province, year):
+    cube = dataset.cube
+    grouped = module.Pie_Generator_Data(cube, *args[:1], provinces=[province], year=year)
+    num_rings = args[1] if len(args) > 1 else 3
+    fig = module.Pie_Generator_Figure(grouped, scenario, num_rings=num_rings, display_unit=_base_unit(cube))
+    return grouped, {"": fig}
+
+
+def export_multi_sector_bar(module, args, dataset, scenario, province, year):
+    cube = dataset.cube
+    display_unit = _base_unit(cube)
+    grouped = module.Multi_Sector_Bar_Data(cube, provinces=[province], year=year)
+    figures = {}
+    for sec in grouped['Sector'].unique():
+        df_sec = grouped[grouped['Sector'] == sec]
+        figures[slug(sec)] = module.Multi_Sector_Bar_Figure(df_sec, sec, year, display_unit=display_unit)
+    return grouped, figures
+
+
+def export_industry_sector_bar(module, args, dataset, scenario, province, year):
+    cube = dataset.cube
+    categories = [next(iter(module.category_mapping))]
+    grouped = module.Industry_Sector_Bar_Data(cube, categories, provinces=[province], year=year)
+    fig = module.Industry_Sector_Bar_Figure(grouped, ", ".join(categories), year, display_unit=_base_unit(cube))
+    return grouped, {"": fig}
+
+
+def export_grouped_industry_bar(module, args, dataset, scenario, province, year):
+    df = (dataset.national if province == "All Canada" else dataset).year_view(year)
+    if scenario.startswith("Net-Zero"):
+        df = df[df['Sector'] != "-"]
+    grouped, group_order, _ = module.Grouped_Industry_Bar_Data(df, provinces=[province], year=year)
+    display_unit = energy_unit(next(c for c in df.columns if c.startswith('Energy')))
+    fig = module.Grouped_Industry_Bar_Figure(grouped, scenario, year, display_unit=display_unit, group_order=group_order)
+    return grouped, {"": fig}
+
+
+def export_ghg(module, args, dataset, scenario, province, year):
+    grouped = module.GHG_Graph_Data(dataset.view(), provinces=[province])
+    return grouped, {"": module.GHG_Graph_Figure(grouped)}
+
+
+# Page function -> (exporter, one view per year)
+EXPORTERS = {
+    "Energy_Demand": (export_energy_demand, False),
+    "Energy_Demand_Grouped": (export_energy_demand_grouped, False),
+    "Energy_Demand_Bar": (export_energy_demand_bar, True),
+    "Carbon_content_Bar": (export_carbon_content_bar, True),
+    "Pie_Generator": (export_pie, True),
+    "Multi_Sector_Bar": (export_multi_sector_bar, True),
+    "Industry_Sector_Bar": (export_industry_sector_bar, True),
+    "Grouped_Industry_Bar": (export_grouped_industry_bar, True),
+    "GHG_Graph": (export_ghg, False),
+}
+
+
+def load_dataset(scenario):
+    return get_ghg_dataset() if scenario == GHG_SCENARIO else get_dataset(scenario)
+
+
+def export_page(scenario, label, province, years, out_dir, formats):
+    """
+    Export one page of one scenario and province, for each of years (or once
+    when the page covers a year range); returns its manifest entry. Runs in a
+    worker process, where the dataset is loaded once and reused across jobs.
+    """
+    start = time.perf_counter()
+    module_name, func_name, args = PAGE_REGISTRY[label]
+    module = importlib.import_module(module_name)
+    exporter, per_year = EXPORTERS[func_name]
+    dataset = load_dataset(scenario)
+    page_dir = os.path.join(out_dir, slug(scenario), slug(province))
+    os.makedirs(page_dir, exist_ok=True)
+
+    files = []
+    figures_written = 0
+    for year in (years if per_year else [None]):
+        result = exporter(module, args, dataset, scenario, province, year)
+        if result is None:
+            continue
+        grouped, figures = result
+        base = slug(label) if year is None else f"{slug(label)}_{year}"
+        grouped.to_csv(os.path.join(page_dir, base + ".csv"), index=False)
+        files.append(base + ".csv")
+        for name, fig in figures.items():
+            if fig is None:
+                continue
+            stem = f"{base}_{name}" if name else base
+            figures_written += 1
+            if "html" in formats:
+                fig.write_html(os.path.join(page_dir, stem + ".html"), include_plotlyjs="cdn")
+                files.append(stem + ".html")
+            if "json" in formats:
+                with open(os.path.join(page_dir, stem + ".json"), "w") as f:
+                    f.write(pio.to_json(fig, validate=False))
+                files.append(stem + ".json")
+    return {
+        "scenario": scenario,
+        "page": label,
+        "province": province,
+        "dir": os.path.abspath(page_dir),
+        "files": files,
+        "figures": figures_written,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def plan_jobs(scenarios=None, pages=None, provinces=None, years=None):
+    """(scenario, page label, province, years) for every view to export."""
+    jobs = []
+    labels = [label for label in PAGE_REGISTRY if pages is None or label in pages]
+    energy_labels = [label for label in labels if PAGE_REGISTRY[label][1] != "GHG_Graph"]
+    for scenario in [s for s in SCENARIO_FILES if scenarios is None or s in scenarios]:
+        dataset = get_dataset(scenario)
+        if dataset is None:
+            print(f"skip   {scenario} (no post-processed data)")
+            continue
+        scenario_years = [y for y in dataset.cube.members('Year') if years is None or y in years]
+        scenario_provinces = ["All Canada"] + dataset.cube.members('Province')
+        for label in energy_labels:
+            for province in scenario_provinces:
+                if provinces is None or province in provinces:
+                    jobs.append((scenario, label, province, scenario_years))
+    if len(energy_labels) < len(labels) and (scenarios is None or GHG_SCENARIO in scenarios):
+        dataset = get_ghg_dataset()
+        if dataset is None:
+            print("skip   GHG Emissions (no GHG data)")
+        else:
+            ghg = dataset.view()
+            for province in ["All Canada"] + sorted(ghg['Province'].dropna().unique()):
+                if provinces is None or province in provinces:
+                    jobs.append((GHG_SCENARIO, "GHG Emissions", province, []))
+    return jobs
+
+
+def export_all(out_dir="Export", workers=None, scenarios=None, pages=None, provinces=None, years=None,
+               formats=("html", "json")):
+    """
+    Export every planned view concurrently and write the manifest. Failures
+    are recorded in the manifest instead of stopping the export.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = plan_jobs(scenarios, pages, provinces, years)
+
+    entries = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(export_page, *job, out_dir, formats): job for job in jobs}
+        for future in as_completed(futures):
+            scenario, label, province, _ = futures[future]
+            try:
+                entry = future.result()
+                print(f"done   {scenario} / {label} / {province}: {entry['figures']} figure(s) in {entry['seconds']:.2f}s")
+            except Exception as exc:
+                entry = {"scenario": scenario, "page": label, "province": province, "error": repr(exc)}
+                print(f"failed {scenario} / {label} / {province}: {exc!r}")
+            entries.append(entry)
+
+    wall = time.perf_counter() - start
+    figures = sum(entry.get("figures", 0) for entry in entries)
+    entries.sort(key=lambda e: (e["scenario"], e["page"], e["province"]))
+    manifest = {
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "formats": list(formats),
+        "wall_seconds": round(wall, 3),
+        "figures": figures,
+        "figures_per_second": round(figures / wall, 2) if wall > 0 else None,
+        "jobs": entries,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"{figures} figure(s) from {len(entries)} job(s) in {wall:.2f}s "
+          f"({manifest['figures_per_second']} figures/s) -> {os.path.join(out_dir, MANIFEST_FILE)}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every dashboard chart without a Streamlit session.")
+    parser.add_argument("out_dir", nargs="?", default="Export", help="output directory (defaults to Export)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (defaults to the core count)")
+    parser.add_argument("--scenarios", nargs="+", help=f"scenario labels, or '{GHG_SCENARIO}' (defaults to all)")
+    parser.add_argument("--pages", nargs="+", help="page labels as listed in the sidebar (defaults to all)")
+    parser.add_argument("--provinces", nargs="+", help="provinces, or 'All Canada' (defaults to all)")
+    parser.add_argument("--years", nargs="+", type=int, help="years of the single-year pages (defaults to all)")
+    parser.add_argument("--formats", nargs="+", choices=["html", "json"], default=["html", "json"],
+                        help="figure formats written next to each CSV")
+    args = parser.parse_args()
+    export_all(args.out_dir, args.workers, args.scenarios, args.pages, args.provinces, args.years, tuple(args.formats))
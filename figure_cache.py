@@ -0,0 +1,97 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+
+# Budget for cached figures, measured by their serialized JSON size
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def _canonical(value):
+    # JSON-able form in which equal views always serialize identically
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        digest = hashlib.sha256(",".join(map(str, frame.columns)).encode())
+        # Row hashes sorted, so the same rows in another order give the same key
+        digest.update(np.sort(pd.util.hash_pandas_object(frame, index=False).to_numpy()).tobytes())
+        return {"frame": digest.hexdigest(), "rows": len(frame)}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        # Selections whose order does not matter
+        return sorted((_canonical(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def figure_key(page, data=None, **options):
+    """
+    Canonical hash of a figure's inputs: the page, the aggregated data it
+    plots (which reflects every filter) and its display options.
+    """
+    payload = json.dumps([page, _canonical(data), _canonical(options)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FigureCache:
+    """
+    Thread-safe LRU of built Plotly figures, bounded by their JSON size.
+
+    Cached figures are shared between sessions, so callers must not modify
+    a figure returned by get().
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, fig):
+        size = len(pio.to_json(fig, validate=False))
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (fig, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> FigureCache:
+    return FigureCache()
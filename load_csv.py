@@ -1,48 +1,129 @@
-import streamlit as st
+import os
+
+import numpy as np
 import pandas as pd
 
-from nzest_constants import (
-    carrier_dict,
+from profiling import profiled
+from taxonomy import CATALOG
 
-)
 
-@st.cache_data
-def load_csv(path) -> pd.DataFrame:
-    df = pd.read_csv(path, low_memory=False)
-    df.columns = df.columns.str.strip()
+def columnar_path(path):
+    # Parquet companion written by the preprocessors next to the CSV
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+# Identifying columns (names after renaming), read as categoricals so that
+# renames and code -> name mappings touch each distinct value once
+CATEGORY_COLUMNS = ['prov', 'Province', 'Sector', 'Subsector', 'en_carrier', 'tech',
+                    'Carrier', 'Tech_name', 'Tech_subsector']
+
+
+def detect_schema(columns) -> dict:
+    """
+    Column layout of a post-processed export, from its header alone.
+
+    Returns the renames to the dashboard names (Province, Year, Sector,
+    Energy (<unit>/yr), Carrier, Tech_name, Tech_subsector), the energy
+    column and unit, and the source column of Carrier (Carrier or Carrier
+    group) and of the Tech_name / Tech_subsector variants.
+    """
+    columns = [c.strip() for c in columns]
     col_map = {}
     # Map Province, Year, Sector
-    for orig, name in [(c, 'Province') for c in df.columns if c.lower()=='province'] + \
-                       [(c, 'Year') for c in df.columns if c.lower()=='year'] + \
-                       [(c, 'Sector') for c in df.columns if c.lower()=='sector']:
-        col_map[orig] = name
+    for target in ['Province', 'Year', 'Sector']:
+        cols = [c for c in columns if c.lower() == target.lower()]
+        if cols:
+            col_map[cols[0]] = target
     # Energy demand (detect unit)
-    ed_cols = [c for c in df.columns if 'energy demand' in c.lower()]
+    energy_col, unit = None, None
+    ed_cols = [c for c in columns if 'energy demand' in c.lower()]
     if ed_cols:
-        orig = ed_cols[0]
-        unit = 'PJ' if 'pj' in orig.lower() else 'GJ'
-        col_map[orig] = f'Energy ({unit}/yr)'
+        unit = 'PJ' if 'pj' in ed_cols[0].lower() else 'GJ'
+        energy_col = f'Energy ({unit}/yr)'
+        col_map[ed_cols[0]] = energy_col
     # Carrier
-    carr = [c for c in df.columns if c.lower() in ['carrier','carrier group']]
+    carr = [c for c in columns if c.lower() in ['carrier', 'carrier group']]
     if carr:
         col_map[carr[0]] = 'Carrier'
     # Tech_name, Tech_subsector
-    for target in ['Tech_name','Tech_subsector']:
-        cols = [c for c in df.columns if c.lower().replace(' ','_')==target.lower()]
+    for target in ['Tech_name', 'Tech_subsector']:
+        cols = [c for c in columns if c.lower().replace(' ', '_') == target.lower()]
         if cols:
             col_map[cols[0]] = target
 
+    source = {name: orig for orig, name in col_map.items()}
+    return {
+        'renames': col_map,
+        'energy_col': energy_col,
+        'energy_unit': unit,
+        'carrier_source': source.get('Carrier'),
+        'tech_name_source': source.get('Tech_name'),
+        'tech_subsector_source': source.get('Tech_subsector'),
+    }
+
+
+def _read_source(path) -> pd.DataFrame:
+    # Prefer the Parquet artifact unless it is missing or older than the CSV
+    parquet = columnar_path(path)
+    if os.path.exists(parquet) and (
+        not os.path.exists(path) or os.path.getmtime(parquet) >= os.path.getmtime(path)
+    ):
+        return pd.read_parquet(parquet, engine="pyarrow")
+    # Read the header first so the identifying columns are parsed straight
+    # into categoricals (the Parquet artifact already stores them that way)
+    header = pd.read_csv(path, nrows=0).columns
+    renames = detect_schema(header)['renames']
+    dtype = {orig: 'category' for orig in header
+             if renames.get(orig.strip(), orig.strip()) in CATEGORY_COLUMNS}
+    return pd.read_csv(path, dtype=dtype, engine="pyarrow")
+
+
+def _map_categories(col: pd.Series, labels) -> pd.Series:
+    # Relabel a categorical through its categories only; categories that
+    # end up with the same label are merged
+    new = pd.Index(labels, dtype=object)
+    if new.equals(pd.Index(col.cat.categories, dtype=object)):
+        return col
+    positions, uniques = pd.factorize(new)
+    codes = np.append(positions, -1)[col.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, uniques), index=col.index, name=col.name)
+
+
+@profiled("load_csv")
+def read_post_process(path) -> pd.DataFrame:
+    # Post-processed export with dashboard column names, loaded once per file by the dataset registry
+    df = _read_source(path)
+    df.columns = df.columns.str.strip()
+    schema = detect_schema(df.columns)
+
     # Apply the column renaming
-    df = df.rename(columns=col_map)
+    df = df.rename(columns=schema['renames'])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
 
-    # Convert carrier short codes to full names if present
+    # Convert carrier codes and long names to the catalog names if present
     if 'Carrier' in df.columns:
-        df['Carrier'] = (
-            df['Carrier']
-            .astype(str)
-            .str.lower()
-            .map(carrier_dict)
-            .fillna(df['Carrier'])
-        )
-
-    return df
\ No newline at end of file
+        categories = df['Carrier'].cat.categories
+        names = CATALOG['carrier'].lookup(categories)
+        df['Carrier'] = _map_categories(df['Carrier'], np.where(pd.isna(names), categories, names))
+
+    df.attrs['schema'] = schema
+    return df
+
+
+# Identifier columns of the wide GHG inventory (one column per year after these)
+GHG_ID_COLUMNS = ['Sector', 'Sub-Sector', 'Use', 'Province']
+
+
+@profiled("load_csv")
+def read_ghg(path) -> pd.DataFrame:
+    # Tidy GHG table: one row per id/year, typed once so pages filter on integers
+    df = pd.read_csv(path)
+    year_cols = [c for c in df.columns if c.strip().isdigit()]
+    df = df.melt(id_vars=GHG_ID_COLUMNS, value_vars=year_cols, var_name='year', value_name='GHG')
+    df['year'] = df['year'].astype('int16')
+    df['GHG'] = pd.to_numeric(df['GHG'], errors='coerce').astype('float32')
+    for col in GHG_ID_COLUMNS:
+        df[col] = df[col].astype('category')
+    return df
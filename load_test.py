@@ -0,0 +1,233 @@
+"""
+Description:
+-------------
+Concurrent-session load test of the dashboard.
+
+For each session count N, N simulated analysts run Streamlit_App.py at the
+same time, each through its own AppTest session on a thread of this
+process (as a Streamlit server runs sessions on threads of one process,
+sharing the dataset registry and the figure cache). Every session opens
+the app and replays an interaction script (switch page, change provinces,
+group-by, unit or year) a number of times. Per N, the rerun latency
+percentiles, the throughput in reruns per second, the process resident
+memory (start, peak, end) and the figure cache statistics are written as JSON, and the capacity curve
+(latency and throughput against N) is plotted to an HTML page.
+
+Usage:
+    python load_test.py [OUT_DIR] [--sessions 1 2 4 8] [--loops N] [--think S] [--no-figure-cache]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+import psutil
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+
+import figure_cache
+from benchmark_pages import figure_cache_stats
+
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Streamlit_App.py")
+# Seconds between resident memory samples
+SAMPLE_INTERVAL = 0.05
+
+# Interaction scripts; session i replays SCRIPTS[i % len(SCRIPTS)]. Steps are
+# ("page", label), ("provinces", n) selecting the first n provinces (0 for
+# All Canada), or ("group_by",), ("unit",), ("year",) moving the widget to
+# its next option. Steps whose widget the current page lacks are skipped.
+SCRIPTS = [
+    [("page", "Energy Demand"), ("provinces", 2), ("group_by",), ("unit",), ("provinces", 0)],
+    [("page", "Pie Chart Building"), ("year",), ("unit",), ("provinces", 1), ("page", "Pie Chart Transport"), ("year",)],
+    [("page", "Multi Sector Bar Chart"), ("provinces", 3), ("year",), ("page", "Energy Demand (Bar Chart)"), ("group_by",)],
+    [("page", "GHG Emissions"), ("group_by",), ("provinces", 2), ("unit",), ("page", "Grouped Industry Bar Chart"), ("year",)],
+]
+
+# Step kind -> sidebar widget it changes
+STEP_WIDGETS = {
+    "group_by": ("selectbox", "Group by"),
+    "unit": ("selectbox", "Display unit"),
+    "year": ("selectbox", "Select Year"),
+    "provinces": ("multiselect", "Select Provinces"),
+}
+
+
+@contextlib.contextmanager
+def share_runtime():
+    """
+    Serve every session from one mock Runtime inside the block. AppTest
+    installs a fresh mock runtime for each run and clears it when the run
+    ends, which would pull it from under the sessions still running on other
+    threads. Runtime.instance and Runtime.exists are restored on exit.
+    """
+    runtime = mock.MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    with mock.patch.object(Runtime, "instance", classmethod(lambda cls: runtime)), \
+            mock.patch.object(Runtime, "exists", classmethod(lambda cls: True)):
+        yield runtime
+
+
+def apply_step(at, step):
+    """Change the widget of one script step; False when the page has no such widget."""
+    kind = step[0]
+    if kind == "page":
+        at.sidebar.selectbox(key="Go to").set_value(step[1])
+        return True
+    widget_type, label = STEP_WIDGETS[kind]
+    widget = next((w for w in getattr(at.sidebar, widget_type) if w.label == label), None)
+    if widget is None:
+        return False
+    if kind == "provinces":
+        provinces = [p for p in widget.options if p != "All Canada"]
+        widget.set_value(provinces[:step[1]] if step[1] else ["All Canada"])
+    else:
+        options = list(widget.options)
+        widget.set_value(options[(options.index(str(widget.value)) + 1) % len(options)])
+    return True
+
+
+def run_session(index, loops, think, latencies, errors, timeout):
+    """One simulated analyst: open the app, then replay its script loops times."""
+    script = SCRIPTS[index % len(SCRIPTS)]
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    at.session_state["intro_shown"] = True
+    steps = [("open",)] + script * loops
+    for step in steps:
+        if step[0] != "open" and not apply_step(at, step):
+            continue
+        start = time.perf_counter()
+        try:
+            at.run()
+        except Exception as exc:
+            errors.append(f"session {index} {step}: {exc!r}")
+            return
+        latencies.append(time.perf_counter() - start)
+        if at.exception:
+            errors.append(f"session {index} {step}: {at.exception[0].message}")
+        if think:
+            time.sleep(think)
+
+
+def run_level(sessions, loops=3, think=0.0, timeout=120):
+    """Latency, throughput and resident memory with `sessions` concurrent sessions."""
+    process = psutil.Process()
+    rss_start = process.memory_info().rss
+    peak = [rss_start]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(SAMPLE_INTERVAL):
+            peak[0] = max(peak[0], process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(target=run_session, args=(i, loops, think, latencies, errors, timeout))
+        for i in range(sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    rss_end = process.memory_info().rss
+    peak[0] = max(peak[0], rss_end)
+
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "reruns_per_second": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "latency": {
+            q: round(float(np.percentile(latencies, int(q[1:]))), 4) if latencies else None
+            for q in ("p50", "p95", "p99")
+        },
+        "rss_mb": {
+            "start": round(rss_start / 1e6, 1),
+            "peak": round(peak[0] / 1e6, 1),
+            "end": round(rss_end / 1e6, 1),
+        },
+        # Cumulative over the test: entries, bytes, hits and misses so far
+        "figure_cache": figure_cache_stats(),
+    }
+
+
+def plot_results(levels, path):
+    """Rerun latency and throughput against the number of concurrent sessions."""
+    fig = make_subplots(rows=1, cols=3, subplot_titles=("Rerun latency (s)", "Reruns per second", "Peak RSS (MB)"))
+    sessions = [level["sessions"] for level in levels]
+    for q in ("p50", "p95", "p99"):
+        fig.add_trace(go.Scatter(x=sessions, y=[level["latency"][q] for level in levels],
+                                 mode="lines+markers", name=q), row=1, col=1)
+    fig.add_trace(go.Scatter(x=sessions, y=[level["reruns_per_second"] for level in levels],
+                             mode="lines+markers", name="throughput"), row=1, col=2)
+    fig.add_trace(go.Scatter(x=sessions, y=[level["rss_mb"]["peak"] for level in levels],
+                             mode="lines+markers", name="peak RSS"), row=1, col=3)
+    fig.update_xaxes(title_text="Concurrent sessions")
+    fig.update_layout(title="NZEST load test", height=500)
+    fig.write_html(path, include_plotlyjs="cdn")
+
+
+def run_load_test(out_dir="LoadTest", sessions=(1, 2, 4, 8), loops=3, think=0.0, figure_cache_on=True):
+    os.makedirs(out_dir, exist_ok=True)
+    levels = []
+    # The shared runtime and the figure cache bypass only last for the test
+    with contextlib.ExitStack() as patches:
+        patches.enter_context(share_runtime())
+        if not figure_cache_on:
+            # Every lookup misses, so each rerun pays for its figures
+            patches.enter_context(mock.patch.object(figure_cache.FigureCache, "get", lambda self, key: None))
+        # Warm the dataset registry so the first level does not pay for loading alone
+        AppTest.from_file(APP_FILE, default_timeout=120).run()
+
+        for n in sessions:
+            level = run_level(n, loops, think)
+            levels.append(level)
+            lat = level["latency"]
+            print(f"{n} session(s): {level['reruns']} reruns in {level['wall_seconds']:.1f}s "
+                  f"({level['reruns_per_second']} /s), p50 {lat['p50'] * 1000:.0f} ms, "
+                  f"p95 {lat['p95'] * 1000:.0f} ms, peak RSS {level['rss_mb']['peak']:.0f} MB"
+                  + (f", {len(level['errors'])} error(s)" if level["errors"] else ""))
+
+    report = {
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "loops": loops,
+        "think_seconds": think,
+        "figure_cache": figure_cache_on,
+        "cpu_count": os.cpu_count(),
+        "levels": levels,
+    }
+    with open(os.path.join(out_dir, "load_test.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    plot_results(levels, os.path.join(out_dir, "load_test.html"))
+    print(f"-> {os.path.join(out_dir, 'load_test.json')}, {os.path.join(out_dir, 'load_test.html')}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure dashboard latency and memory under concurrent sessions.")
+    parser.add_argument("out_dir", nargs="?", default="LoadTest", help="output directory (defaults to LoadTest)")
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8],
+                        help="numbers of concurrent sessions to measure")
+    parser.add_argument("--loops", type=int, default=3, help="times each session replays its script")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds a session waits between interactions")
+    parser.add_argument("--no-figure-cache", action="store_true", help="bypass the figure cache (every rerun builds figures)")
+    args = parser.parse_args()
+    run_load_test(args.out_dir, args.sessions, args.loops, args.think, not args.no_figure_cache)
@@ -77,11 +77,18 @@ sector_activity_dict = {
     "p&p_pg": "p&p_pg",
     "p&p_ph": "p&p_ph",
     "p&p_tr": "p&p_tr",
-    "Alum_fs": "Alum_fs",
-    "Alum_md": "Alum_md",
-    "Alum_op": "Alum_op",
-    "Alum_ph": "Alum_ph",
-    "Alum_tr": "Alum_tr",
+    "ROth": "ROth",
+    "RSH": "RSH",
+    "RWH": "RWH",
+    "Air": "Air",
+    "HDV": "HDV",
+    "ICB": "ICB",
+    "LDV": "LDV",
+    "MDV": "MDV",
+    "Off-Road": "Off-Road",
+    "Rail": "Rail",
+    "SB": "SB",
+    "UB": "UB",
     "G&S mine_fs": "G&S mine_fs",
     "G&S mine_md": "G&S mine_md",
     "G&S mine_op": "G&S mine_op",
@@ -100,10 +107,17 @@ sector_activity_dict = {
     "O metal_pg": "O metal_pg",
     "O metal_ph": "O metal_ph",
     "O metal_tr": "O metal_tr",
+    "Marine": "Marine",
+    "Alum_fs": "Alum_fs",
+    "Alum_md": "Alum_md",
+    "Alum_op": "Alum_op",
+    "Alum_ph": "Alum_ph",
+    "Alum_tr": "Alum_tr",
     "K mine_fs": "K mine_fs",
     "K mine_md": "K mine_md",
     "K mine_ph": "K mine_ph",
-    "K mine_tr": "K mine_tr"
+    "K mine_tr": "K mine_tr",
+    "All": "All"
 }
 
 
@@ -125,6 +139,259 @@ carrier_dict = {
     "w":   "Wood"
 }
 
+# Long carrier names found in some exports -> carrier code
+carrier_aliases = {
+    "Electricity": "e",
+    "Natural Gas": "ng",
+    "Propane": "pro",
+    "Renewable Diesel": "dr",
+    "Heavy Fuel Oil": "hfo",
+    "Light Fuel Oil": "lfo"
+}
+
+
+carrier_tech_dict = {
+    "d_ice":    "Diesel ICE",
+    "db_ice":   "Biodiesel ICE",
+    "dr_ice":   "Renewable Diesel ICE",
+    "et_ice":   "Ethanol ICE",
+    "j_ice":    "Jet ICE",
+    "p_ice":    "Gasoline ICE",
+    "e_resht":  "Electric Resistive Heat",
+    "hfo_boil": "HFO Boiler",
+    "lfo_boil": "LFO Boiler",
+    "ng_mef":   "NG Mech. Furnace",
+    "pro_mef":  "Prop Mech. Furnace",
+    "st_HtXch": "Steam Exchanger",
+    "e_othbldg":"Elec. Other Bldg.",
+    "hfo_othbldg":"HFO Other Bldg.",
+    "lfo_othbldg":"LFO Other Bldg.",
+    "ng_cook":  "NG Cooking",
+    "pro_cook": "Prop Cooking",
+    "st_othbldg":"Steam Other Bldg.",
+    "ng_boil":  "NG Boiler",
+    "pro_boil": "Prop Boiler",
+    "e_hwt":    "Elec. Hot Water",
+    "hfo_hwt":  "HFO Hot Water",
+    "lfo_hwt":  "LFO Hot Water",
+    "ng_hwt":   "NG Hot Water",
+    "pro_hwt":  "Prop Hot Water",
+    "st_hwt":   "Steam Hot Water",
+    "e_fs":     "Elec. Facility Support",
+    "e_gridmd": "Elec. Grid Drive",
+    "ng_icemd": "NG Engine Drive",
+    "e_op":     "Elec. Other Processes",
+    "c_ph":     "Coal Proc. Heat",
+    "e_ph":     "Elec. Proc. Heat",
+    "ng_ph":    "NG Proc. Heat",
+    "pl_ph":    "Plastics Proc. Heat",
+    "st_ph":    "Steam Proc. Heat",
+    "d_icemd":  "Diesel Engine Drive",
+    "d_icepg":  "Diesel Power Gen",
+    "d_ph":     "Diesel Proc. Heat",
+    "hfo_ph":   "HFO Proc. Heat",
+    "ng_icepg": "NG Power Gen",
+    "hfo_icepg":"HFO Power Gen",
+    "w_ph":     "Wood Proc. Heat",
+    "e_bev":    "Battery EV",
+    "lfo_cook": "LFO Cooking",
+    "w_cook":   "Wood Cooking",
+    "e_ashp":   "Air-Source HP",
+    "lfo_hef":  "LFO HE Furnace",
+    "lfo_mef":  "LFO Mech. Furnace",
+    "lfo_nef":  "LFO Non-Eff. Furnace",
+    "ng_hef":   "NG HE Furnace",
+    "ng_nef":   "NG Non-Eff. Furnace",
+    "w_stove":  "Wood Stove",
+    "w_hwt":    "Wood Hot Water",
+    "ng_ice":   "NG ICE",
+    "pro_ice":  "Prop ICE",
+    "hfo_ice":  "HFO ICE",
+    "st_htXch": "Steam Heat Exch.",
+    # Net-Zero technologies
+    "Am_ice": "Ammonia Internal Combustion Engine",
+    "H2_fcev": "Hydrogen Fuel Cell Electric Vehicle",
+    "H2_ice": "Hydrogen Internal Combustion Engine",
+    "jr_ice": "Renewable Jet Fuel Internal Combustion Engine",
+    "pr_ice": "Renewable Propane Internal Combustion Engine",
+    "Am_boil": "Ammonia Boiler",
+    "H2_boil": "Hydrogen Boiler",
+    "H2_hef": "Hydrogen High-Efficiency Furnace",
+    "e_ccashp": "Cold Climate Air Source Heat Pump (Electric)",
+    "e_gshp": "Ground Source Heat Pump (Electric)",
+    "ngr_hef": "Renewable Natural Gas High-Efficiency Furnace",
+    "H2_cook": "Hydrogen Cooking",
+    "e_cook": "Electric Cooking",
+    "ngr_cook": "Renewable Natural Gas Cooking",
+    "e_solar": "Solar Thermal Heating (Electric Auxiliary)",
+    "ngr_boil": "Renewable Natural Gas Boiler",
+    "H2_hwt": "Hydrogen Hot Water Tank",
+    "e_hwod": "Electric Hot Water On Demand",
+    "ngr_hwt": "Renewable Natural Gas Hot Water Tank",
+    "Am_icemd": "Ammonia Internal Combustion Machine Drive",
+    "H2_fcmd": "Hydrogen Fuel Cell Machine Drive",
+    "H2_icemd": "Hydrogen Internal Combustion Machine Drive",
+    "dr_icemd": "Renewable Diesel Internal Combustion Machine Drive",
+    "Am_ph": "Ammonia Process Heat",
+    "H2_ph": "Hydrogen Process Heat",
+    "cCS_ph": "Coal with Carbon Capture Process Heat",
+    "dr_ph": "Renewable Diesel Process Heat",
+    "ngCS_ph": "Natural Gas with Carbon Capture Process Heat",
+    "Am_icepg": "Ammonia Internal Combustion Power Generation",
+    "H2_fcpg": "Hydrogen Fuel Cell Power Generation",
+    "H2_icepg": "Hydrogen Internal Combustion Power Generation",
+    "dr_icepg": "Renewable Diesel Internal Combustion Power Generation",
+    "e_grid": "Electric Grid Supply",
+    "wp_gasif": "Wood Pellets Gasification",
+    "wp_pellet": "Wood Pellet Combustion",
+    "e_solarw": "Solar Water Heating (Electric Backup)",
+    "H2_FCEV": "Hydrogen Fuel Cell Electric Vehicle",
+    "-": "-"
+}
+
+
+province_dict = {
+    "ab": "Alberta",
+    "qc": "Quebec",
+    "sk": "Saskatchewan",
+    "atl": "Atlantic Provinces",
+    "bct": "British-Columbia",
+    "on": "Ontario",
+    "mb": "Manitoba",
+    # Net-Zero national rows
+    "ca": "Canada"
+}
+
+# Province names found in some exports -> province code
+province_aliases = {
+    # Misspelling written by exports made before the name was corrected
+    "Sasktchewan": "sk"
+}
+
+
+# Descriptions of the sub-sector codes
+sector_activity_descriptions = {
+    "Mot": "Motive Power",
+    "Nmot": "Non-Motive Power",
+    "COth": "Commercial Other",
+    "CSH": "Commercial Space Heating",
+    "CWH": "Commercial Water Heating",
+    
+    "Cement_fs": "Cement Facility Support",
+    "Cement_md": "Cement Machine Drive",
+    "Cement_op": "Cement Other Processes",
+    "Cement_ph": "Cement Process Heat",
+    "Cement_tr": "Cement Transportation",
+    
+    "Chem_fs": "Chemicals Facility Support",
+    "Chem_md": "Chemicals Machine Drive",
+    "Chem_op": "Chemicals Other Processes",
+    "Chem_pg": "Chemicals Power Generation",
+    "Chem_ph": "Chemicals Process Heat",
+    "Chem_tr": "Chemicals Transportation",
+    
+    "Const_pg": "Construction Power Generation",
+    "Const_ph": "Construction Process Heat",
+    "Const_tr": "Construction Transportation",
+    
+    "Cu mine_fs": "Copper Mining Facility Support",
+    "Cu mine_md": "Copper Mining Machine Drive",
+    "Cu mine_op": "Copper Mining Other Processes",
+    "Cu mine_ph": "Copper Mining Process Heat",
+    "Cu mine_pg": "Copper Mining Power Generation",
+    "Cu mine_tr": "Copper Mining Transportation",
+    
+    "Forest_pg": "Forestry Power Generation",
+    "Forest_tr": "Forestry Transportation",
+    "Forest_ph": "Forestry Process Heat",
+    
+    "I&S_fs": "Iron and Steel Facility Support",
+    "I&S_md": "Iron and Steel Machine Drive",
+    "I&S_op": "Iron and Steel Other Processes",
+    "I&S_pg": "Iron and Steel Power Generation",
+    "I&S_ph": "Iron and Steel Process Heat",
+    "I&S_tr": "Iron and Steel Transportation",
+    
+    "Manuf_fs": "Manufacturing Facility Support",
+    "Manuf_md": "Manufacturing Machine Drive",
+    "Manuf_op": "Manufacturing Other Processes",
+    "Manuf_pg": "Manufacturing Power Generation",
+    "Manuf_ph": "Manufacturing Process Heat",
+    "Manuf_tr": "Manufacturing Transportation",
+    
+    "O non-met_fs": "Other Non-Metallic Facility Support",
+    "O non-met_md": "Other Non-Metallic Machine Drive",
+    "O non-met_pg": "Other Non-Metallic Power Generation",
+    "O non-met_ph": "Other Non-Metallic Process Heat",
+    "O non-met_tr": "Other Non-Metallic Transportation",
+    
+    "Salt_fs": "Salt Mining Facility Support",
+    "Salt_md": "Salt Mining Machine Drive",
+    "Salt_ph": "Salt Mining Process Heat",
+    "Salt_tr": "Salt Mining Transportation",
+    
+    "Smelt_fs": "Smelting Facility Support",
+    "Smelt_md": "Smelting Machine Drive",
+    "Smelt_op": "Smelting Other Processes",
+    "Smelt_ph": "Smelting Process Heat",
+    "Smelt_tr": "Smelting Transportation",
+    
+    "p&p_fs": "Pulp and Paper Facility Support",
+    "p&p_md": "Pulp and Paper Machine Drive",
+    "p&p_op": "Pulp and Paper Other Processes",
+    "p&p_pg": "Pulp and Paper Power Generation",
+    "p&p_ph": "Pulp and Paper Process Heat",
+    "p&p_tr": "Pulp and Paper Transportation",
+    
+    "ROth": "Residential Other",
+    "RSH": "Residential Space Heating",
+    "RWH": "Residential Water Heating",
+    
+    "Air": "Aviation",
+    "HDV": "Heavy Duty Vehicles",
+    "ICB": "Intercity Buses",
+    "LDV": "Light Duty Vehicles",
+    "MDV": "Medium Duty Vehicles",
+    "Off-Road": "Off-Road Vehicles and Equipment",
+    "Rail": "Rail Transportation",
+    "SB": "School Buses",
+    "UB": "Urban Buses",
+    
+    "G&S mine_fs": "Gold and Silver Mining Facility Support",
+    "G&S mine_md": "Gold and Silver Mining Machine Drive",
+    "G&S mine_op": "Gold and Silver Mining Other Processes",
+    "G&S mine_pg": "Gold and Silver Mining Power Generation",
+    "G&S mine_ph": "Gold and Silver Mining Process Heat",
+    "G&S mine_tr": "Gold and Silver Mining Transportation",
+    
+    "I mine_fs": "Iron Mining Facility Support",
+    "I mine_md": "Iron Mining Machine Drive",
+    "I mine_op": "Iron Mining Other Processes",
+    "I mine_pg": "Iron Mining Power Generation",
+    "I mine_ph": "Iron Mining Process Heat",
+    "I mine_tr": "Iron Mining Transportation",
+    
+    "O metal_fs": "Other Metals Facility Support",
+    "O metal_md": "Other Metals Machine Drive",
+    "O metal_op": "Other Metals Other Processes",
+    "O metal_pg": "Other Metals Power Generation",
+    "O metal_ph": "Other Metals Process Heat",
+    "O metal_tr": "Other Metals Transportation",
+    
+    "Alum_fs": "Aluminum Facility Support",
+    "Alum_md": "Aluminum Machine Drive",
+    "Alum_op": "Aluminum Other Processes",
+    "Alum_ph": "Aluminum Process Heat",
+    "Alum_tr": "Aluminum Transportation",
+    
+    "K mine_fs": "Potash Mining Facility Support",
+    "K mine_md": "Potash Mining Machine Drive",
+    "K mine_ph": "Potash Mining Process Heat",
+    "K mine_tr": "Potash Mining Transportation",
+    
+    "All": "All Sectors"
+}
+
 
 carrier_colors = {
     # Fossil liquids
@@ -488,6 +755,14 @@ group_colors = {
 
 
 group_order = ["Transport", "Building", "Industry"]
+# Sector -> group of the Energy Demand Grouped page; other sectors are left out
+sector_group_dict = {
+    "Transport":   "Transport",
+    "Residential": "Building",
+    "Commercial":  "Building",
+    "Industry":    "Industry",
+    "Agriculture": "Industry"
+}
 fossil_carriers = ["Coal", "HFO", "LFO",
                     "Diesel", "R-Diesel", "Gasoline", "Jet Fuel",
                     "Prop", "NG", "Plastics"]
@@ -0,0 +1,66 @@
+import importlib
+import time
+
+import psutil
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Page label (as listed in PAGES) -> (module, function, positional args).
+# Modules are imported the first time their page is selected.
+PAGE_REGISTRY = {
+    "GHG Emissions": ("Plot.GHG_Graph", "GHG_Graph", ()),
+    "Energy Demand": ("Plot.Energy_Demand", "Energy_Demand", ()),
+    "Energy Demand Grouped": ("Plot.Energy_Demand_Grouped", "Energy_Demand_Grouped", ()),
+    "Energy Demand (Bar Chart)": ("Plot.Energy_Demand_Bar", "Energy_Demand_Bar", ()),
+    "Carbon Content (Bar Chart)": ("Plot.Carbon_content_Bar", "Carbon_content_Bar", ()),
+    # "Pie Chart All Sectors": ("Plot.Pie_Generator", "Pie_Generator", ("All",)),
+    "Pie Chart Agriculture": ("Plot.Pie_Generator", "Pie_Generator", ("Agriculture", 2)),
+    "Pie Chart Transport": ("Plot.Pie_Generator", "Pie_Generator", ("Transport", 2)),
+    "Pie Chart Building": ("Plot.Pie_Generator", "Pie_Generator", ("Commercial|Residential", 2)),
+    "Pie Chart Industry": ("Plot.Pie_Generator", "Pie_Generator", ("Industry", 2)),
+    "Multi Sector Bar Chart": ("Plot.Multi_Sector_Bar", "Multi_Sector_Bar", ()),
+    "Industry Subsector Bar Chart": ("Plot.Industry_Sector_Bar", "Industry_Sector_Bar", ()),
+    "Grouped Industry Bar Chart": ("Plot.Grouped_Industry_Bar", "Grouped_Industry_Bar", ()),
+}
+
+# Seconds spent importing each page module, filled on first use
+import_times = {}
+# Timings of the first page rendered by this process (see startup_report)
+_startup = {}
+
+
+def load_page(label):
+    """Page callable for a PAGES label, importing its module on first use."""
+    module_name, func_name, args = PAGE_REGISTRY[label]
+    if module_name not in import_times:
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        import_times[module_name] = time.perf_counter() - start
+    func = getattr(importlib.import_module(module_name), func_name)
+    return lambda: func(*args)
+
+
+def render_page(label):
+    """Import (if needed) and render a page; the first render is reported once per process."""
+    if _startup:
+        load_page(label)()
+        return
+    start = time.perf_counter()
+    try:
+        load_page(label)()
+    finally:
+        # Recorded even when the page ends with st.stop()
+        if not _startup:
+            _startup.update(
+                page=label,
+                render_s=time.perf_counter() - start,
+                since_process_start_s=time.time() - psutil.Process().create_time(),
+                imports_s=dict(import_times),
+            )
+            logger.info("Startup report: %s", _startup)
+
+
+def startup_report():
+    """First-render timings of this process, or an empty dict before any page was shown."""
+    return dict(_startup)
@@ -0,0 +1,133 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+
+# JSONL file receiving one line per profiled rerun (override with NZEST_TRACE_FILE)
+TRACE_FILE = os.environ.get(
+    "NZEST_TRACE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_trace.jsonl")
+)
+
+# Stages recorded by the rerun being profiled in this thread, or None when profiling is off
+_records = contextvars.ContextVar("profile_records", default=None)
+_depth = contextvars.ContextVar("profile_depth", default=0)
+_trace_lock = threading.Lock()
+# Returned by stage() while profiling is off, so a disabled stage costs one lookup
+_OFF = contextlib.nullcontext()
+
+
+# pandas, psutil and the figure cache (plotly) are imported on the first
+# profiled rerun, so importing this module does not slow the app's cold start
+@functools.lru_cache(maxsize=None)
+def _process():
+    import psutil
+    return psutil.Process()
+
+
+@contextlib.contextmanager
+def _timed_stage(name, records):
+    depth = _depth.get()
+    # Appended on entry so nested stages are listed after the stage holding them
+    record = {"stage": name, "depth": depth}
+    records.append(record)
+    token = _depth.set(depth + 1)
+    rss = _process().memory_info().rss
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 6)
+        # Process-wide, so other sessions' work shows up here too
+        record["rss_delta_mb"] = round((_process().memory_info().rss - rss) / 1e6, 3)
+        _depth.reset(token)
+
+
+def stage(name):
+    """
+    Context manager timing a stage of the current rerun:
+
+        with stage("filter"):
+            ...
+
+    Does nothing unless the rerun is being profiled (see profile_rerun).
+    """
+    records = _records.get()
+    if records is None:
+        return _OFF
+    return _timed_stage(name, records)
+
+
+def profiled(name):
+    """Decorator form of stage()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            records = _records.get()
+            if records is None:
+                return func(*args, **kwargs)
+            with _timed_stage(name, records):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def profile_rerun(page, enabled=True):
+    """
+    Record the stages run inside the block, then show them in the sidebar
+    debug panel and append them to TRACE_FILE. A no-op when not enabled.
+    """
+    if not enabled:
+        yield
+        return
+    records = []
+    token = _records.set(records)
+    rss = _process().memory_info().rss
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        total = time.perf_counter() - start
+        _records.reset(token)
+        trace = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "page": page,
+            "seconds": round(total, 6),
+            "rss_mb": round(_process().memory_info().rss / 1e6, 1),
+            "rss_delta_mb": round((_process().memory_info().rss - rss) / 1e6, 3),
+            "stages": records,
+        }
+        write_trace(trace)
+        show_debug_panel(trace)
+
+
+def write_trace(trace, path=None):
+    # Sessions share the file, so lines are appended one at a time
+    with _trace_lock, open(path or TRACE_FILE, "a") as f:
+        f.write(json.dumps(trace) + "\n")
+
+
+def show_debug_panel(trace):
+    import pandas as pd
+    from figure_cache import get_figure_cache
+
+    with st.sidebar.expander("Stage timings (debug)", expanded=True):
+        st.caption(f"{trace['page']}: {trace['seconds'] * 1000:.0f} ms, "
+                   f"RSS {trace['rss_mb']:.0f} MB ({trace['rss_delta_mb']:+.1f} MB)")
+        if trace["stages"]:
+            # Nested stages are indented under the stage that contains them
+            st.dataframe(pd.DataFrame({
+                "stage": [" " * r["depth"] + r["stage"] for r in trace["stages"]],
+                "ms": [r["seconds"] * 1000 for r in trace["stages"]],
+                "RSS MB": [r["rss_delta_mb"] for r in trace["stages"]],
+            }), hide_index=True, use_container_width=True)
+        cache = get_figure_cache().stats()
+        st.caption(f"Figure cache: {cache['entries']} figures, "
+                   f"{cache['bytes'] / 2 ** 20:.1f} of {cache['max_bytes'] / 2 ** 20:.0f} MB, "
+                   f"{cache['hits']} hits, {cache['misses']} misses")
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+
+def band_matrix(grouped: pd.DataFrame, x, y, color, names):
+    """
+    Pivot aggregated chart data into (x values, x-by-band array).
+
+    Columns follow `names`, i.e. the stacking order of the figure traces;
+    missing combinations count as zero height.
+    """
+    wide = grouped.pivot_table(index=x, columns=color, values=y, aggfunc='sum', fill_value=0.0)
+    wide = wide.reindex(columns=names, fill_value=0.0)
+    return wide.index.to_numpy(), wide.to_numpy(dtype=float)
+
+
+def stacked_area_labels(x_vals, bands, names, label_x=None, min_height_ratio=0.02,
+                        manual=False, show_for=(), text_colors=None, font_size=16,
+                        window=3, offset_frac=0.2, y_offset=0.0, yshift=0, slope_x=None):
+    """
+    Annotation dicts labelling each band of a stacked area chart.
+
+    Labels sit at `label_x` (the middle x value when it is absent). Bands of
+    at least `min_height_ratio` of the stack there are labelled inside; in
+    manual mode the bands in `show_for` are always labelled, small ones just
+    above the band in grey. Text is tilted by the band slope over +/- `window`
+    x steps around `slope_x` (the label's x value when it is absent), between
+    -12 and 0 degrees; without both ends of the window the text stays flat.
+    """
+    x_vals = np.asarray(x_vals)
+    bands = np.asarray(bands, dtype=float)
+    if not len(x_vals) or not len(names):
+        return []
+    text_colors = text_colors or {}
+
+    hits = np.flatnonzero(x_vals == label_x) if label_x is not None else []
+    idx = hits[0] if len(hits) else len(x_vals) // 2
+
+    heights = bands[idx]
+    tops = np.cumsum(heights)
+    bottoms = np.concatenate(([0.0], tops[:-1]))
+    total = tops[-1]
+    ratio = heights / total if total != 0 else np.zeros_like(heights)
+
+    inside = ratio >= min_height_ratio
+    shown = np.isin(np.asarray(names, dtype=object), list(show_for)) if manual else inside
+    y_pos = np.where(
+        inside,
+        (bottoms + tops) / 2 + y_offset + offset_frac * heights,
+        tops + 0.01 * total,
+    )
+
+    # Relative change of each band across the slope window
+    center = x_vals[idx] if slope_x is None else slope_x
+    start = np.flatnonzero(x_vals == center - window)
+    end = np.flatnonzero(x_vals == center + window)
+    if len(start) and len(end):
+        start_y, end_y = bands[start[0]], bands[end[0]]
+        denom = (np.abs(start_y) + np.abs(end_y)) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(denom != 0, (end_y - start_y) / denom, 0.0)
+    else:
+        slope = np.zeros_like(heights)
+    angles = np.clip(-slope * 12, -12, 0)
+
+    x_pos = x_vals[idx].item()
+    annotations = []
+    for i in np.flatnonzero(shown):
+        name = names[i]
+        annotations.append(dict(
+            x=x_pos,
+            y=float(y_pos[i]),
+            text=name,
+            showarrow=False,
+            xanchor="left",
+            yanchor="middle" if inside[i] else "bottom",
+            font=dict(size=font_size, color=text_colors.get(name, "white") if inside[i] else "#666"),
+            yshift=yshift,
+            textangle=float(angles[i]),
+        ))
+    return annotations
+
+
+def stacked_bar_labels(fig, grouped: pd.DataFrame, x, y, color, manual=False, show_for=(),
+                       text_colors=None, font_size=16, threshold=0.05, inside_threshold=0.10,
+                       min_inside=1.0):
+    """
+    Per-trace text, textposition and textfont for the bars of a stacked bar chart.
+
+    A bar is labelled when it is at least `threshold` of its stack (or, in
+    manual mode, when its trace is in `show_for`). Labels stay inside bars of
+    at least `inside_threshold` of the stack and `min_inside` in data units,
+    and go outside otherwise. Hidden labels keep a space so hover still works.
+    The results line up with fig.data and can be assigned with trace.update().
+    """
+    names = [trace.name for trace in fig.data]
+    if grouped.empty:
+        return [{} for _ in names]
+    x_vals, bands = band_matrix(grouped, x, y, color, names)
+    # Stack height per x, summed in trace order
+    stacks = np.cumsum(bands, axis=1)[:, -1]
+    rows = pd.Index(x_vals)
+    text_colors = text_colors or {}
+
+    updates = []
+    for trace in fig.data:
+        values = np.asarray(trace.y, dtype=float)
+        stack = stacks[rows.get_indexer(list(trace.x))]
+        rel = np.divide(values, stack, out=np.zeros_like(values), where=stack > 0)
+        shown = np.full(len(values), trace.name in show_for) if manual else rel >= threshold
+        inside = (values >= min_inside) & (rel >= inside_threshold)
+        updates.append(dict(
+            text=np.where(shown, trace.name, " ").tolist(),
+            textposition=np.where(shown, np.where(inside, "inside", "outside"), "none").tolist(),
+            textfont=dict(size=font_size, color=text_colors.get(trace.name, "white")),
+        ))
+    return updates
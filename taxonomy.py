@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from nzest_constants import (
+    carrier_aliases,
+    carrier_colors,
+    carrier_dict,
+    carrier_tech_colors,
+    carrier_tech_dict,
+    category_mapping,
+    group_colors,
+    group_order,
+    province_aliases,
+    province_dict,
+    sector_activity_colors,
+    sector_activity_descriptions,
+    sector_activity_dict,
+    sector_group_dict,
+    stack_order,
+    tech_subsector_to_group,
+)
+
+
+class Dimension:
+    """
+    Members of one taxonomy dimension, keyed by their integer position.
+
+    Each member has a code (as found in the scenario exports), a display
+    name and optional attributes (color, stack rank, parent category, ...),
+    all stored as arrays indexed by the member key. A code column is
+    resolved to keys once per distinct value (see keys), after which any
+    attribute of the whole column is a single take.
+    """
+
+    def __init__(self, name, codes, names, aliases=None, **attrs):
+        self.name = name
+        self.codes = np.asarray(codes, dtype=object)
+        self.names = np.asarray(names, dtype=object)
+        self.attrs = {attr: np.asarray(values, dtype=object) for attr, values in attrs.items()}
+        self._codes = pd.Index(self.codes)
+
+        # Fallback for values that are not exact codes: case-insensitive code,
+        # display name or alias (first match wins)
+        labels = [str(c).lower() for c in self.codes] + [str(n).lower() for n in self.names]
+        keys = list(range(len(self))) * 2
+        for alias, code in (aliases or {}).items():
+            labels.append(alias.lower())
+            keys.append(self._codes.get_loc(code))
+        fallback = pd.Series(keys, index=labels)
+        fallback = fallback[~fallback.index.duplicated()]
+        self._fallback = fallback.index
+        self._fallback_keys = fallback.to_numpy()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def keys(self, values) -> np.ndarray:
+        """Integer key of each value (a code, display name or alias); -1 where unknown or missing."""
+        if not isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+            values = np.asarray(values, dtype=object)
+        positions, uniques = pd.factorize(values)
+        uniques = np.asarray(uniques, dtype=object)
+        unique_keys = self._codes.get_indexer(uniques)
+        missing = unique_keys < 0
+        if missing.any():
+            hit = self._fallback.get_indexer([str(u).lower() for u in uniques[missing]])
+            unique_keys[missing] = np.where(hit >= 0, self._fallback_keys[hit], -1)
+        # -1 (missing value) picks the trailing -1
+        return np.append(unique_keys, -1)[positions]
+
+    def take(self, keys, attr="name") -> np.ndarray:
+        """Attribute ('name', 'code' or one of attrs) of each key; NaN where the key is -1."""
+        values = {"name": self.names, "code": self.codes}.get(attr)
+        if values is None:
+            values = self.attrs[attr]
+        return np.append(values, np.nan)[keys]
+
+    def lookup(self, values, attr="name"):
+        """take(keys(values)), as a Series aligned with values when given one."""
+        result = self.take(self.keys(values), attr)
+        if isinstance(values, pd.Series):
+            return pd.Series(result, index=values.index, name=values.name)
+        return result
+
+    def mapping(self, attr="name"):
+        """Code -> attribute of every member that has the attribute."""
+        return {code: value for code, value in zip(self.codes, self.take(np.arange(len(self)), attr))
+                if not pd.isna(value)}
+
+
+def _attr(mapping, keys):
+    return [mapping.get(key, np.nan) for key in keys]
+
+
+def build_catalog():
+    """One Dimension per taxonomy level, compiled from the dictionaries of nzest_constants."""
+    stack_rank = {name: rank for rank, name in enumerate(stack_order)}
+    category_of = {code: category for category, codes in category_mapping.items() for code in codes}
+    carrier_names = list(carrier_dict.values())
+    return {
+        "province": Dimension("province", list(province_dict), list(province_dict.values()), aliases=province_aliases),
+        "sector": Dimension(
+            "sector", list(sector_group_dict), list(sector_group_dict),
+            group=list(sector_group_dict.values()),
+        ),
+        "group": Dimension(
+            "group", group_order, group_order,
+            color=_attr(group_colors, group_order), rank=list(range(len(group_order))),
+        ),
+        "carrier": Dimension(
+            "carrier", list(carrier_dict), carrier_names, aliases=carrier_aliases,
+            color=_attr(carrier_colors, carrier_names), rank=_attr(stack_rank, carrier_names),
+        ),
+        "tech": Dimension(
+            "tech", list(carrier_tech_dict), list(carrier_tech_dict.values()),
+            color=_attr(carrier_tech_colors, carrier_tech_dict),
+            # Technology codes start with their carrier code (d_ice -> d)
+            carrier=[code.split("_")[0] for code in carrier_tech_dict],
+        ),
+        "subsector": Dimension(
+            "subsector", list(sector_activity_dict), list(sector_activity_dict.values()),
+            description=_attr(sector_activity_descriptions, sector_activity_dict),
+            color=_attr(sector_activity_colors, sector_activity_dict),
+            category=_attr(category_of, sector_activity_dict),
+            industry_group=_attr(tech_subsector_to_group, sector_activity_dict),
+        ),
+        "category": Dimension(
+            "category", list(category_mapping), list(category_mapping),
+            industry_group=[tech_subsector_to_group.get(codes[0], np.nan) for codes in category_mapping.values()],
+        ),
+    }
+
+
+# Compiled once per process; the dimensions are read-only
+CATALOG = build_catalog()
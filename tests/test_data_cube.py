@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_cube import NATIONAL, POSITIVE_MEASURES, ROLLUP_KEYS, build_cube, national_rollup  # noqa: E402
+from load_csv import read_post_process  # noqa: E402
+
+
+@pytest.fixture
+def post_process(tmp_path):
+    # Two provinces and the Net-Zero CA region, with the per-carrier factors
+    # of a real export next to the energy and carbon content
+    rows = [
+        ("ab", "Alberta", "ng_boil", 2000, 10.0, 1.0),
+        ("on", "Ontario", "ng_boil", 2000, 5.0, 0.5),
+        ("ca", "Canada", "ng_boil", 2000, 99.0, 9.9),
+        ("ca", "Canada", "ng_furn", 2000, 7.0, 0.7),
+    ]
+    df = pd.DataFrame([
+        {"prov": p, "Sector": "Industry", "Subsector": "Cement_ph", "en_carrier": "ng",
+         "tech": t, "Year": y, "Energy demand (PJ/yr)": e, "Carrier": "ng",
+         "Tech_name": t, "Tech_subsector": "Cement_ph", "Province": name,
+         "HHV (MJ/kg)": 52.2, "Carbon Content (kgC/kg)": 0.72,
+         "Energy per kg C (MJ/kgC)": 72.5, "Carbon Content MT c": c}
+        for p, name, t, y, e, c in rows
+    ])
+    path = tmp_path / "post.csv"
+    df.to_csv(path, index=False)
+    return read_post_process(str(path))
+
+
+def test_rollup_holds_only_additive_measures(post_process):
+    energy_col = post_process.attrs["schema"]["energy_col"]
+    totals = national_rollup(post_process)
+
+    measures = [c for c in totals.columns if c != "Province" and c not in ROLLUP_KEYS]
+    assert measures == [energy_col] + POSITIVE_MEASURES
+    assert totals.attrs["schema"]["energy_col"] == energy_col
+    assert (totals["Province"] == NATIONAL).all()
+
+    # Provinces sum; CA only counts for the technology no province reports
+    by_tech = totals.set_index("Tech_name")
+    assert by_tech.loc["ng_boil", energy_col] == 15.0
+    assert by_tech.loc["ng_furn", energy_col] == 7.0
+
+
+def test_cube_measures_skip_per_carrier_factors(post_process):
+    energy_col = post_process.attrs["schema"]["energy_col"]
+    cube = build_cube(post_process)
+    assert cube.measures == [energy_col] + POSITIVE_MEASURES
+    assert cube.national.measures == cube.measures
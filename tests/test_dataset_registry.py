@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Input"))
+import SQ_Pre_Process as sq  # noqa: E402
+from dataset_registry import Dataset, DatasetRegistry  # noqa: E402
+from load_csv import columnar_path, read_post_process  # noqa: E402
+
+
+@pytest.fixture
+def post_process_csv(tmp_path):
+    # A slice of the sample Status-Quo export, post-processed with its Parquet companion
+    raw = pd.read_csv(os.path.join(os.path.dirname(sq.__file__), "Status-quo scenario data.csv")).head(60)
+    raw_csv = tmp_path / "raw.csv"
+    raw.to_csv(raw_csv, index=False)
+    out_csv = str(tmp_path / "SQ_Post_Process.csv")
+    sq.process_SQ(str(raw_csv), out_csv)
+    return out_csv
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_year_view_matches_year_filter(post_process_csv, shuffle):
+    frame = read_post_process(post_process_csv)
+    if shuffle:
+        frame = frame.sample(frac=1, random_state=0)
+    dataset = Dataset(post_process_csv, 0, frame)
+    view = dataset.view()
+    assert dataset.years == sorted(view["Year"].unique())
+    for year in dataset.years + [1999]:
+        pd.testing.assert_frame_equal(dataset.year_view(year), view[view["Year"] == year])
+    assert dataset.year_view(1999).empty
+
+
+def _touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+def test_registry_reloads_when_sources_change(post_process_csv):
+    registry = DatasetRegistry()
+    first = registry.get_path(post_process_csv)
+    assert registry.get_path(post_process_csv) is first
+
+    mtime = max(os.path.getmtime(post_process_csv), os.path.getmtime(columnar_path(post_process_csv)))
+    _touch(post_process_csv, mtime + 10)
+    second = registry.get_path(post_process_csv)
+    assert second is not first
+    assert registry.get_path(post_process_csv) is second
+
+    _touch(columnar_path(post_process_csv), mtime + 20)
+    third = registry.get_path(post_process_csv)
+    assert third is not second
+    pd.testing.assert_frame_equal(third.view(), first.view())
+
+
+def test_registry_returns_none_without_outputs(tmp_path):
+    assert DatasetRegistry().get_path(str(tmp_path / "missing.csv")) is None
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from figure_cache import FIGURE_CACHE_BYTES, FigureCache, figure_key  # noqa: E402
+
+
+def _figure(n):
+    return go.Figure(go.Bar(x=list(range(n)), y=list(range(n))))
+
+
+def test_eviction_drops_least_recently_used():
+    figs = {k: _figure(50) for k in "abc"}
+    size = len(pio.to_json(figs["a"], validate=False))
+    cache = FigureCache(max_bytes=2 * size)
+    cache.put("a", figs["a"])
+    cache.put("b", figs["b"])
+    # "a" becomes the most recently used, so "b" goes first
+    assert cache.get("a") is figs["a"]
+    cache.put("c", figs["c"])
+    assert cache.get("b") is None
+    assert cache.get("a") is figs["a"]
+    assert cache.get("c") is figs["c"]
+    assert cache.stats()["bytes"] == 2 * size
+
+
+def test_default_budget():
+    assert FigureCache().max_bytes == FIGURE_CACHE_BYTES
+
+
+def test_oversized_figure_is_not_cached():
+    cache = FigureCache(max_bytes=10)
+    cache.put("a", _figure(5))
+    assert cache.stats()["entries"] == 0
+
+
+def test_figure_key_ignores_row_and_option_order():
+    df = pd.DataFrame({"Year": [2020, 2025, 2030], "Carrier": ["Gas", "Oil", "Gas"], "E": [1.0, 2.0, 3.0]})
+    shuffled = df.iloc[[2, 0, 1]].reset_index(drop=True)
+    key = figure_key("Energy Demand", df, unit="PJ", show_labels=True)
+    assert figure_key("Energy Demand", shuffled, show_labels=True, unit="PJ") == key
+    assert figure_key("Energy Demand", df, unit="TJ", show_labels=True) != key
+    assert figure_key("Energy Demand", df.assign(E=df["E"] * 2), unit="PJ", show_labels=True) != key
+
+
+def test_stats_counts_hits_and_misses():
+    cache = FigureCache()
+    assert cache.get("a") is None
+    cache.put("a", _figure(3))
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 1)
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Input"))
+import SQ_Pre_Process as sq  # noqa: E402
+
+
+def test_chunked_columnar_output_grows_past_int8_categories(tmp_path):
+    # First chunk: one technology; second chunk: 200 distinct ones, more than
+    # an int8 dictionary index can hold
+    n = 200
+    raw = pd.DataFrame({
+        "prov": "ab",
+        "Sector": "Industry",
+        "Subsector": "Cement_ph",
+        "en_carrier": "ng",
+        "tech": ["ng_boil"] * n + [f"t{i}" for i in range(n)],
+        "Year": 2000,
+        "Energy demand (PJ/yr)": 1.0,
+    })
+    raw_csv = tmp_path / "raw.csv"
+    raw.to_csv(raw_csv, index=False)
+    out_csv = tmp_path / "out.csv"
+
+    sq.run_pipeline(str(raw_csv), str(out_csv), lambda df, df_CC: df, chunksize=n)
+
+    parquet = sq.columnar_path(str(out_csv))
+    for col in sq.CATEGORICAL_COLUMNS:
+        if col in raw.columns:
+            assert pq.read_schema(parquet).field(col).type.index_type.bit_width == 32
+    df = pd.read_parquet(parquet)
+    assert len(df) == 2 * n
+    assert df["tech"].nunique() == n + 1
+    assert df["tech"].astype(object).tolist() == raw["tech"].tolist()
+
+
+RAW_SQ = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Input", "Status-quo scenario data.csv")
+
+
+def _sorted(df):
+    return df.sort_values(list(df.columns), kind="stable", ignore_index=True)
+
+
+def test_incremental_rebuilds_only_changed_partition(tmp_path):
+    raw = pd.read_csv(RAW_SQ)
+    raw_csv = tmp_path / "raw.csv"
+    raw.to_csv(raw_csv, index=False)
+    out_csv = str(tmp_path / "inc.csv")
+
+    first = sq.process_SQ(str(raw_csv), out_csv, incremental=True)
+    assert sorted(first) == sorted(raw["prov"].astype(str).unique())
+    assert sq.process_SQ(str(raw_csv), out_csv, incremental=True) == []
+
+    # Change one province's raw rows
+    raw.loc[raw["prov"] == "on", "2030"] *= 2
+    raw.to_csv(raw_csv, index=False)
+    assert sq.process_SQ(str(raw_csv), out_csv, incremental=True) == ["on"]
+
+    full_csv = str(tmp_path / "full.csv")
+    sq.process_SQ(str(raw_csv), full_csv)
+    pd.testing.assert_frame_equal(_sorted(pd.read_csv(out_csv)), _sorted(pd.read_csv(full_csv)))
+    incremental = pd.read_parquet(sq.columnar_path(out_csv))
+    full = pd.read_parquet(sq.columnar_path(full_csv))
+    pd.testing.assert_frame_equal(
+        _sorted(incremental.astype(object)), _sorted(full[incremental.columns].astype(object))
+    )
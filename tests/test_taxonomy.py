@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from taxonomy import CATALOG, Dimension  # noqa: E402
+
+
+def _dimension():
+    # "b" is the lower-case form of code "B" and the name of code "a"
+    return Dimension("test", ["a", "B"], ["b", "Xname"], aliases={"Alias": "a"}, color=["red", np.nan])
+
+
+def test_exact_code():
+    assert _dimension().keys(["a", "B"]).tolist() == [0, 1]
+
+
+def test_case_insensitive_code_before_name():
+    assert _dimension().keys(["A", "b"]).tolist() == [0, 1]
+
+
+def test_display_name():
+    assert _dimension().keys(["Xname", "XNAME"]).tolist() == [1, 1]
+
+
+def test_alias():
+    assert _dimension().keys(["Alias", "alias"]).tolist() == [0, 0]
+
+
+def test_unknown_and_missing():
+    dim = _dimension()
+    assert dim.keys(["zzz", None, np.nan]).tolist() == [-1, -1, -1]
+    names = dim.lookup(pd.Series(["a", "zzz"], index=[5, 7]))
+    assert names.index.tolist() == [5, 7]
+    assert names[5] == "b" and pd.isna(names[7])
+    assert pd.isna(dim.lookup(["B"], "color")[0])
+
+
+def test_catalog_provinces():
+    provinces = CATALOG["province"]
+    assert provinces.lookup(["sk", "SK", "Saskatchewan", "Sasktchewan"]).tolist() == ["Saskatchewan"] * 4
+    assert provinces.lookup(["ab", "Alberta"]).tolist() == ["Alberta"] * 2
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from taxonomy import CATALOG  # noqa: E402
+from trace_colors import _color_map, color_map, hash_color  # noqa: E402
+
+
+def test_hash_color_is_stable():
+    color = hash_color("carrier", "Unobtainium")
+    assert color == hash_color("carrier", "Unobtainium")
+    assert color != hash_color("tech", "Unobtainium")
+    # Same color in another process, whatever its string hash seed
+    script = "from trace_colors import hash_color; print(hash_color('carrier', 'Unobtainium'))"
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True,
+                         env={**os.environ, "PYTHONHASHSEED": "123"})
+    assert out.stdout.strip() == color
+
+
+def test_color_map_is_stable_across_calls_and_label_order():
+    labels = ["Diesel", "Unobtainium", "ng", "Biodiesel"]
+    first = color_map("Carrier", labels)
+    _color_map.cache_clear()
+    assert color_map("Carrier", list(reversed(labels))) == first
+
+
+def test_catalog_colors_win_over_hash():
+    carriers = CATALOG["carrier"]
+    diesel = carriers.lookup(["d"], "color")[0]
+    colors = color_map("Carrier", ["Diesel", "d", "Unobtainium"])
+    assert colors["Diesel"] == colors["d"] == diesel != hash_color("carrier", "Diesel")
+    assert colors["Unobtainium"] == hash_color("carrier", "Unobtainium")
+    # A label of another dimension falls back to that dimension's palette before the hash
+    tech = CATALOG["tech"]
+    assert color_map("carrier", ["d_ice"])["d_ice"] == tech.lookup(["d_ice"], "color")[0]
+
+
+def test_palette_overrides():
+    colors = color_map("Carrier", ["Diesel", "Unobtainium"], palette={"Diesel": "#000000"})
+    assert colors["Diesel"] == "#000000"
+    assert colors["Unobtainium"] == hash_color("carrier", "Unobtainium")
@@ -0,0 +1,74 @@
+import colorsys
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from taxonomy import CATALOG
+
+
+# Catalog dimensions with curated colors, in fallback order (carrier_colors,
+# carrier_tech_colors, sector_activity_colors, group_colors)
+PALETTE_DIMENSIONS = ["carrier", "tech", "subsector", "group"]
+
+# Chart column -> color dimension
+COLUMN_DIMENSIONS = {
+    "Carrier": "carrier",
+    "Tech_name": "tech",
+    "Tech_subsector": "subsector",
+    "Tech_subsector_display": "subsector",
+    "Group": "group",
+}
+
+# Label sets whose color maps are kept
+CACHE_SIZE = 1024
+
+
+def hash_color(dimension, label) -> str:
+    """Color of a label without a curated one, derived from a hash of (dimension, label)."""
+    digest = hashlib.blake2b(f"{dimension}\0{label}".encode(), digest_size=8).digest()
+    hue = int.from_bytes(digest[:4], "big") / 2 ** 32
+    # Mid lightness and saturation, so white and black labels stay readable
+    lightness = 0.40 + 0.20 * digest[4] / 255
+    saturation = 0.55 + 0.30 * digest[5] / 255
+    r, g, b = colorsys.hls_to_rgb(hue, lightness, saturation)
+    return "#{:02x}{:02x}{:02x}".format(round(r * 255), round(g * 255), round(b * 255))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _color_map(dimension, labels):
+    # Curated color of the label's own dimension first, then of the others
+    order = [dimension] + [d for d in PALETTE_DIMENSIONS if d != dimension]
+    values = np.asarray(labels, dtype=object)
+    colors = np.full(len(values), np.nan, dtype=object)
+    for dim in order:
+        if dim not in CATALOG:
+            continue
+        missing = pd.isna(colors)
+        if not missing.any():
+            break
+        colors[missing] = CATALOG[dim].lookup(values[missing], "color")
+    return tuple(
+        (label, color if isinstance(color, str) else hash_color(dimension, label))
+        for label, color in zip(labels, colors)
+    )
+
+
+def color_map(dimension, labels, palette=None) -> dict:
+    """
+    Label -> color for a set of chart labels, identical on every rerun, in
+    every session and process.
+
+    dimension is a catalog dimension or a chart column (see
+    COLUMN_DIMENSIONS). A label takes the entry of palette when given, else
+    the curated color of its dimension, else of the other palette dimensions
+    (codes and display names both match, through the taxonomy catalog),
+    else hash_color. The map of a label set is computed once per process.
+    """
+    dimension = COLUMN_DIMENSIONS.get(dimension, dimension)
+    labels = tuple(sorted({label for label in labels if not pd.isna(label)}, key=str))
+    colors = dict(_color_map(dimension, labels))
+    if palette:
+        colors.update((label, palette[label]) for label in labels if label in palette)
+    return colors
@@ -0,0 +1,25 @@
+import pandas as pd
+
+
+# Energy display units offered by the pages, with their size in GJ
+ENERGY_UNITS = {'GJ': 1, 'TJ': 1e3, 'PJ': 1e6}
+
+
+def energy_unit(energy_col):
+    """Unit of an 'Energy (<unit>/yr)' column name, e.g. 'PJ'."""
+    return energy_col.split('(')[1].split('/')[0]
+
+
+def conversion_factor(from_unit, to_unit):
+    return ENERGY_UNITS[from_unit] / ENERGY_UNITS[to_unit]
+
+
+def to_display_unit(grouped: pd.DataFrame, col, from_unit, to_unit) -> pd.DataFrame:
+    """
+    Convert an aggregated energy column in place and return the frame.
+
+    Conversion is a single scalar multiply, so it is only applied to
+    grouped results, never to the full dataset.
+    """
+    grouped[col] = grouped[col] * conversion_factor(from_unit, to_unit)
+    return grouped